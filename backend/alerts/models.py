@@ -1,6 +1,16 @@
+from datetime import datetime, timezone as dt_timezone
+from types import SimpleNamespace
 from django.db import models
 from django.contrib.auth.models import User
+from django.db import transaction
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django_redis import get_redis_connection
+from analytics.cardinality import DistinctCounts
+from analytics.dashboard import DashboardSnapshot
+from analytics.heavy_hitters import HeavyHitters
+from analytics.response_times import ResponseTimes
+from analytics.rollups import AlertRollups
 from frameworks.models import (
     MitreTechnique, MitreSubTechnique, OwaspCategory, 
     StrideCategory, KillChainStage, DiamondAdversary,
@@ -79,12 +89,111 @@ class Alert(models.Model):
     def __str__(self):
         return f"{self.alert_id} - {self.title}"
     
+    # What the analytics in Redis count an alert under (see analytics.rollups
+    # and analytics.response_times)
+    ROLLUP_FIELDS = ('detected_at', 'severity', 'status', 'source_system')
+    RESPONSE_TIME_FIELDS = (
+        'detected_at', 'severity', 'source_system', 'time_to_detect', 'time_to_respond', 'time_to_resolve'
+    )
+    
+    # raw_log keys holding when the underlying event happened, for time_to_detect
+    EVENT_TIME_KEYS = ('@timestamp', 'timestamp', 'event_time')
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Kept as loaded; save() works out what the alert was counted under only if it is saved
+        instance._loaded = (field_names, values)
+        return instance
+    
+    def counted_as(self):
+        """
+        (rollup key, response time samples) the alert is currently counted
+        under, each None when unknown because those fields were deferred
+        """
+        if hasattr(self, '_counted'):
+            return self._counted
+        if not hasattr(self, '_loaded'):
+            return None, None
+        
+        loaded = dict(zip(*self._loaded))
+        rollup_key = None
+        if all(field in loaded for field in self.ROLLUP_FIELDS):
+            rollup_key = tuple(loaded[field] for field in self.ROLLUP_FIELDS)
+        times = None
+        if all(field in loaded for field in self.RESPONSE_TIME_FIELDS):
+            times = ResponseTimes.samples(SimpleNamespace(**loaded))
+        return rollup_key, times
+    
+    def rollup_key(self):
+        return tuple(getattr(self, field) for field in self.ROLLUP_FIELDS)
+    
+    def event_time(self):
+        """When the logged event happened, from raw_log, None if it doesn't say"""
+        raw_log = self.raw_log if isinstance(self.raw_log, dict) else {}
+        value = next((raw_log[key] for key in self.EVENT_TIME_KEYS if raw_log.get(key)), None)
+        try:
+            if isinstance(value, (int, float)):
+                # Epoch seconds, or milliseconds as most log shippers send
+                return datetime.fromtimestamp(value / 1000 if value > 1e11 else value, tz=dt_timezone.utc)
+            parsed = parse_datetime(value) if isinstance(value, str) else None
+        except (ValueError, OverflowError, OSError):
+            return None
+        if parsed and timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed, dt_timezone.utc)
+        return parsed
+    
     def save(self, *args, **kwargs):
+        adding = self._state.adding
+        if adding and self.time_to_detect is None and self.detected_at:
+            event_time = self.event_time()
+            if event_time and event_time <= self.detected_at:
+                self.time_to_detect = self.detected_at - event_time
+        
+        # First response is the alert leaving NEW or being assigned
+        if self.time_to_respond is None and self.detected_at and (self.status != 'NEW' or self.assigned_to_id):
+            self.time_to_respond = timezone.now() - self.detected_at
+        
         if self.status == 'RESOLVED' and self.resolved_at is None:
             self.resolved_at = timezone.now()
             if self.detected_at:
                 self.time_to_resolve = self.resolved_at - self.detected_at
+        
+        previous, previous_times = self.counted_as()
         super().save(*args, **kwargs)
+        
+        current = self.rollup_key()
+        times = ResponseTimes.samples(self)
+        self._counted = (current, times)
+        
+        rollup_moved = adding or (previous is not None and previous != current)
+        times_changed = (adding or previous_times is not None) and times != (previous_times or {})
+        if not (rollup_moved or times_changed):
+            return
+        
+        detected_at, source_system = self.detected_at, self.source_system
+        values = {field: getattr(self, field) for field in HeavyHitters.FIELDS}
+        
+        def record_analytics():
+            pipe = get_redis_connection('default').pipeline(transaction=False)
+            if rollup_moved:
+                AlertRollups().record(pipe, current, None if adding else previous)
+                DashboardSnapshot.mark_dirty(pipe)
+            if times_changed:
+                ResponseTimes().record(pipe, times, previous_times)
+            if adding:
+                HeavyHitters().record(pipe, detected_at, values)
+                DistinctCounts().record(pipe, detected_at, source_system, values)
+            pipe.execute()
+        
+        # Volume rollups, response time histograms, top values and distinct
+        # counts (see analytics) are updated in Redis in one round trip once
+        # the alert is committed. A Redis error is logged, not raised: the
+        # alert is saved, and rebuild() reconciles the rollups and histograms.
+        # Queryset update() and bulk_create() skip save() and so all of this;
+        # callers reconcile the range with AlertRollups().rebuild() and
+        # ResponseTimes().rebuild() (backfill_metrics --rebuild-rollups).
+        transaction.on_commit(record_analytics, robust=True)
 
 
 class AlertComment(models.Model):
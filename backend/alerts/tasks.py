@@ -2,6 +2,8 @@ from celery import shared_task
 from alerts.models import Alert
 from alerts.services import AlertClassifier
 from playbooks.services import PlaybookOrchestrator
+from integrations.tasks import send_alert_notification, send_slack_notification
+from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
 
@@ -20,6 +22,12 @@ def process_alert(alert_id):
         orchestrator = PlaybookOrchestrator()
         orchestrator.trigger_playbooks(alert)
         
+        # Notify recipients (digested per recipient and severity)
+        if settings.NOTIFICATION_RECIPIENTS:
+            send_alert_notification.delay(alert.id)
+        if settings.SLACK_WEBHOOK_URL:
+            send_slack_notification.delay(alert.id)
+        
         return f"Alert {alert.alert_id} processed successfully"
     except Alert.DoesNotExist:
         return f"Alert {alert_id} not found"
@@ -30,8 +38,6 @@ def process_alert(alert_id):
 @shared_task
 def cleanup_old_alerts():
     """Clean up old resolved alerts"""
-    from django.conf import settings
-    
     cutoff_date = timezone.now() - timedelta(days=settings.ALERT_RETENTION_DAYS)
     
     old_alerts = Alert.objects.filter(
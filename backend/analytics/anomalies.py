@@ -0,0 +1,208 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import numpy as np
+from django.conf import settings
+from django.db.models import Q, Sum
+from django.utils import timezone
+from django_redis import get_redis_connection
+from analytics.models import AlertMinuteRollup
+
+ANOMALY_SOURCE = 'soc-platform:volume-anomaly'
+
+
+class VolumeAnomalyDetector:
+    """
+    Flags alert volume spikes and silences per source system and severity
+    
+    The last ALERT_ANOMALY_BUCKET_MINUTES of alerts for every (source_system,
+    severity) series, and for each source system as a whole, are compared
+    with two baselines:
+    
+    - an EWMA mean and variance over the ALERT_ANOMALY_EWMA_BUCKETS buckets
+      before it, so sudden changes stand out against the recent level
+    - the same window on each of the previous ALERT_ANOMALY_SEASONAL_DAYS
+      days, so a daily peak is not mistaken for a spike
+    
+    A bucket is anomalous when both z-scores pass ALERT_ANOMALY_Z_THRESHOLD
+    in the same direction. Counts come from the minute rollups (see
+    analytics.rollups) and every series is scored in one NumPy pass, so
+    thousands of series take milliseconds. Each anomaly raises a synthetic
+    Alert, at most once per series and direction per cooldown.
+    """
+    
+    COOLDOWN_KEY = 'volume-anomaly:{source_system}:{severity}:{direction}'
+    
+    def __init__(self):
+        self.redis = get_redis_connection('default')
+        self.bucket = timedelta(minutes=settings.ALERT_ANOMALY_BUCKET_MINUTES)
+        self.ewma_buckets = settings.ALERT_ANOMALY_EWMA_BUCKETS
+        self.seasonal_days = settings.ALERT_ANOMALY_SEASONAL_DAYS
+        self.alpha = settings.ALERT_ANOMALY_EWMA_ALPHA
+        self.threshold = settings.ALERT_ANOMALY_Z_THRESHOLD
+    
+    def detect(self, end: Optional[datetime] = None) -> List[Dict]:
+        """Score the bucket ending at `end` (default: this minute) and return its anomalies"""
+        end = end or timezone.now().replace(second=0, microsecond=0)
+        series, recent, seasonal = self.load(end)
+        if not series:
+            return []
+        return self.score(series, recent, seasonal)
+    
+    def run(self, end: Optional[datetime] = None) -> List[Dict]:
+        """detect(), raising an Alert for every anomaly not in its cooldown"""
+        end = end or timezone.now().replace(second=0, microsecond=0)
+        anomalies = self.detect(end)
+        for anomaly in anomalies:
+            key = self.COOLDOWN_KEY.format(
+                source_system=anomaly['source_system'],
+                severity=anomaly['severity'] or 'ALL',
+                direction=anomaly['direction'],
+            )
+            if self.redis.set(key, end.isoformat(), nx=True, ex=settings.ALERT_ANOMALY_COOLDOWN_MINUTES * 60):
+                self.raise_alert(anomaly, end)
+        return anomalies
+    
+    def load(self, end: datetime):
+        """
+        Counts as arrays: recent[series, bucket] for the EWMA window ending at
+        `end`, seasonal[series, day] for the same bucket on earlier days
+        """
+        recent_start = end - self.bucket * (self.ewma_buckets + 1)
+        windows = Q(bucket__gte=recent_start, bucket__lt=end)
+        for day in range(1, self.seasonal_days + 1):
+            shift = timedelta(days=day)
+            windows |= Q(bucket__gte=end - shift - self.bucket, bucket__lt=end - shift)
+        
+        rows = list(
+            AlertMinuteRollup.objects.filter(windows)
+            .exclude(source_system=ANOMALY_SOURCE)
+            .values('source_system', 'severity', 'bucket')
+            .annotate(total=Sum('count'))
+            .values_list('source_system', 'severity', 'bucket', 'total')
+            .order_by()
+        )
+        if not rows:
+            return [], None, None
+        
+        sources, severities, buckets, counts = zip(*rows)
+        keys = list(zip(sources, severities))
+        series = sorted(set(keys))
+        index = {key: position for position, key in enumerate(series)}
+        rows_series = np.fromiter((index[key] for key in keys), dtype=np.int64, count=len(keys))
+        # Only a few hundred distinct minutes, shared by every series
+        ages_by_bucket = {bucket: end.timestamp() - bucket.timestamp() for bucket in set(buckets)}
+        ages = np.fromiter((ages_by_bucket[bucket] for bucket in buckets), dtype=np.float64, count=len(buckets))
+        counts = np.asarray(counts, dtype=np.float64)
+        
+        # Minutes before `end`: [0, recent window) is recent, whole days back are seasonal
+        bucket_seconds = self.bucket.total_seconds()
+        recent = np.zeros((len(series), self.ewma_buckets + 1))
+        in_recent = ages <= bucket_seconds * (self.ewma_buckets + 1)
+        recent_column = self.ewma_buckets - ((ages[in_recent] - 1) // bucket_seconds).astype(np.int64)
+        np.add.at(recent, (rows_series[in_recent], recent_column), counts[in_recent])
+        
+        seasonal = np.zeros((len(series), self.seasonal_days))
+        seasonal_day = ((ages[~in_recent] - 1) // 86400).astype(np.int64) - 1
+        np.add.at(seasonal, (rows_series[~in_recent], seasonal_day), counts[~in_recent])
+        
+        # Whole-source totals as extra series, so a source going quiet across
+        # every severity is seen even if no single severity looks anomalous
+        source_names = sorted(set(sources))
+        source_position = {source: position for position, source in enumerate(source_names)}
+        source_index = np.array([source_position[source] for source, _ in series])
+        source_recent = np.zeros((len(source_names), recent.shape[1]))
+        source_seasonal = np.zeros((len(source_names), seasonal.shape[1]))
+        np.add.at(source_recent, source_index, recent)
+        np.add.at(source_seasonal, source_index, seasonal)
+        
+        series = series + [(source, None) for source in source_names]
+        return series, np.vstack([recent, source_recent]), np.vstack([seasonal, source_seasonal])
+    
+    def score(self, series: List[tuple], recent: np.ndarray, seasonal: np.ndarray) -> List[Dict]:
+        """Vectorized EWMA and seasonal z-scores of the last recent bucket, one row per series"""
+        observed = recent[:, -1]
+        
+        # EWMA mean and variance over the buckets before the one scored
+        mean = recent[:, 0].copy()
+        variance = np.zeros(len(series))
+        for column in range(1, recent.shape[1] - 1):
+            diff = recent[:, column] - mean
+            increment = self.alpha * diff
+            mean += increment
+            variance = (1 - self.alpha) * (variance + diff * increment)
+        # Counts are at least Poisson-noisy, which also keeps flat series from dividing by zero
+        ewma_z = (observed - mean) / np.sqrt(np.maximum(variance, np.maximum(mean, 1.0)))
+        
+        seasonal_mean = seasonal.mean(axis=1)
+        seasonal_std = seasonal.std(axis=1)
+        seasonal_z = (observed - seasonal_mean) / np.sqrt(
+            np.maximum(seasonal_std ** 2, np.maximum(seasonal_mean, 1.0))
+        )
+        
+        expected = (mean + seasonal_mean) / 2
+        spikes = (
+            (ewma_z > self.threshold) & (seasonal_z > self.threshold)
+            & (observed >= settings.ALERT_ANOMALY_MIN_COUNT)
+        )
+        drops = (
+            (ewma_z < -self.threshold) & (seasonal_z < -self.threshold)
+            & (np.minimum(mean, seasonal_mean) >= settings.ALERT_ANOMALY_MIN_EXPECTED)
+        )
+        
+        # A source-wide anomaly stands for its severities, which are not raised again
+        totals = {source: position for position, (source, severity) in enumerate(series) if severity is None}
+        parent = np.array([-1 if severity is None else totals.get(source, -1) for source, severity in series])
+        has_parent = parent >= 0
+        for flagged in (spikes, drops):
+            flagged[has_parent] &= ~flagged[parent[has_parent]]
+        
+        anomalies = []
+        for direction, flagged in (('spike', spikes), ('drop', drops)):
+            for position in np.flatnonzero(flagged):
+                source_system, severity = series[position]
+                anomalies.append({
+                    'source_system': source_system,
+                    'severity': severity,
+                    'direction': direction,
+                    'observed': int(observed[position]),
+                    'expected': round(float(expected[position]), 2),
+                    'ewma_mean': round(float(mean[position]), 2),
+                    'seasonal_mean': round(float(seasonal_mean[position]), 2),
+                    'ewma_z': round(float(ewma_z[position]), 2),
+                    'seasonal_z': round(float(seasonal_z[position]), 2),
+                })
+        return anomalies
+    
+    def raise_alert(self, anomaly: Dict, end: datetime):
+        from alerts.models import Alert
+        
+        scope = anomaly['source_system'] + (f" {anomaly['severity']}" if anomaly['severity'] else '')
+        minutes = settings.ALERT_ANOMALY_BUCKET_MINUTES
+        if anomaly['direction'] == 'spike':
+            title = f"Alert volume spike from {scope}"
+            description = (
+                f"{anomaly['observed']} {scope} alerts in the {minutes} minutes to {end.isoformat()}, "
+                f"against about {anomaly['expected']:g} expected."
+            )
+        else:
+            title = f"{scope} alerts have gone quiet"
+            description = (
+                f"{anomaly['observed']} {scope} alerts in the {minutes} minutes to {end.isoformat()}, "
+                f"against about {anomaly['expected']:g} expected. The source may have stopped reporting."
+            )
+        
+        # A source going quiet, or a spike of high or critical alerts, needs a look first
+        severity = 'HIGH' if anomaly['direction'] == 'drop' or anomaly['severity'] in ('HIGH', 'CRITICAL') else 'MEDIUM'
+        
+        Alert.objects.get_or_create(
+            alert_id=f"ANOMALY-{anomaly['direction']}-{scope.replace(' ', '-')}-{int(end.timestamp())}",
+            defaults={
+                'title': title,
+                'description': description,
+                'severity': severity,
+                'source_system': ANOMALY_SOURCE,
+                'detected_at': end,
+                'raw_log': dict(anomaly, bucket_minutes=minutes, window_end=end.isoformat()),
+                'tags': ['volume-anomaly', anomaly['direction']],
+            }
+        )
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, Iterable, List, Optional
+from django.conf import settings
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+
+class DistinctCounts:
+    """
+    Approximate distinct source/destination IPs, users and assets over any range
+    
+    Each new alert adds its field values to Redis HyperLogLogs for its hour
+    and its day, overall and for its source_system. PFCOUNT over several
+    HyperLogLogs counts their union, so a range is answered by merging its
+    whole days with the hours at either end: at most a few dozen keys, with
+    Redis's 0.81% standard error, however many alerts the range holds.
+    """
+    
+    FIELDS = ('source_ip', 'destination_ip', 'affected_user', 'affected_asset')
+    KEY = 'distinct:{field}:{period}:{bucket}'
+    STANDARD_ERROR = 0.0081
+    
+    def __init__(self):
+        self.redis = get_redis_connection('default')
+    
+    @staticmethod
+    def bucket(period: str, at: datetime) -> str:
+        return at.astimezone(dt_timezone.utc).strftime('%Y%m%d%H' if period == 'hour' else '%Y%m%d')
+    
+    def key(self, field: str, period: str, bucket: str, source_system: Optional[str] = None) -> str:
+        key = self.KEY.format(field=field, period=period, bucket=bucket)
+        return f"{key}:source:{source_system}" if source_system else key
+    
+    def record(self, pipe, detected_at: datetime, source_system: str, values: Dict[str, Optional[str]]):
+        """Queue on `pipe` adding one alert's non-empty field values to its hour and day HyperLogLogs"""
+        ttls = {
+            'hour': int(timedelta(days=settings.DISTINCT_COUNT_HOURLY_RETENTION_DAYS).total_seconds()),
+            'day': int(timedelta(days=settings.DISTINCT_COUNT_DAILY_RETENTION_DAYS).total_seconds()),
+        }
+        for field in self.FIELDS:
+            if not values.get(field):
+                continue
+            for period, ttl in ttls.items():
+                for source in (None, source_system):
+                    key = self.key(field, period, self.bucket(period, detected_at), source)
+                    pipe.pfadd(key, str(values[field]))
+                    pipe.expire(key, ttl)
+    
+    def buckets(self, start: datetime, end: datetime) -> List[tuple]:
+        """(period, bucket) pairs covering [start, end): whole days, and hours at the edges"""
+        start = start.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+        end = end.astimezone(dt_timezone.utc)
+        if end.replace(minute=0, second=0, microsecond=0) != end:
+            end = end.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        
+        # Hours older than their retention fall back to the whole day
+        hours_kept_since = timezone.now() - timedelta(days=settings.DISTINCT_COUNT_HOURLY_RETENTION_DAYS)
+        
+        buckets = []
+        cursor = start
+        while cursor < end:
+            next_day = cursor.replace(hour=0) + timedelta(days=1)
+            if (cursor.hour == 0 and next_day <= end) or cursor < hours_kept_since:
+                buckets.append(('day', self.bucket('day', cursor)))
+                cursor = next_day
+            else:
+                buckets.append(('hour', self.bucket('hour', cursor)))
+                cursor += timedelta(hours=1)
+        return buckets
+    
+    def count(
+        self,
+        start: datetime,
+        end: datetime,
+        fields: Iterable[str] = FIELDS,
+        source_systems: Iterable[Optional[str]] = (None,),
+    ) -> Dict:
+        """Distinct values of each field over [start, end), overall or per source system"""
+        if end <= start:
+            raise ValueError("'to' must be after 'from'")
+        fields = list(fields)
+        unknown = [field for field in fields if field not in self.FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown field {unknown[0]}, expected one of {', '.join(self.FIELDS)}")
+        
+        buckets = self.buckets(start, end)
+        source_systems = list(source_systems)
+        pipe = self.redis.pipeline(transaction=False)
+        for source in source_systems:
+            for field in fields:
+                pipe.pfcount(*[self.key(field, period, bucket, source) for period, bucket in buckets])
+        counts = iter(pipe.execute())
+        
+        return {
+            source: {field: next(counts) for field in fields}
+            for source in source_systems
+        }
@@ -0,0 +1,101 @@
+from typing import Dict
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from frameworks.models import MitreTechnique
+
+
+class DashboardSnapshot:
+    """
+    The dashboard payload, served from the cache and rebuilt in the background
+    
+    Readers always get the last snapshot straight away. A rebuild is queued
+    when the snapshot is older than DASHBOARD_SNAPSHOT_MAX_AGE, or when
+    alert ingestion or a status change has marked it dirty, but never more
+    than once per DASHBOARD_SNAPSHOT_MIN_INTERVAL however many analysts are
+    polling. Only a cold cache is built inline.
+    """
+    
+    KEY = 'dashboard-snapshot'
+    DIRTY_KEY = 'dashboard-snapshot:dirty'
+    SCHEDULED_KEY = 'dashboard-snapshot:scheduled'
+    
+    def get(self) -> Dict:
+        snapshot = cache.get(self.KEY)
+        if snapshot is None:
+            return self.build()
+        
+        age = (timezone.now() - parse_datetime(snapshot['generated_at'])).total_seconds()
+        if age >= settings.DASHBOARD_SNAPSHOT_MAX_AGE or cache.get(self.DIRTY_KEY):
+            self.schedule_rebuild()
+        return snapshot
+    
+    def schedule_rebuild(self):
+        # The scheduled key doubles as the rate limit on rebuilds
+        if cache.add(self.SCHEDULED_KEY, 1, timeout=settings.DASHBOARD_SNAPSHOT_MIN_INTERVAL):
+            from analytics.tasks import rebuild_dashboard_snapshot
+            rebuild_dashboard_snapshot.delay()
+    
+    @classmethod
+    def mark_dirty(cls, pipe=None):
+        """Flag the snapshot for a rebuild, as part of a Redis pipeline on the cache's server if given"""
+        if pipe is None:
+            cache.set(cls.DIRTY_KEY, 1, timeout=None)
+        else:
+            pipe.set(cache.make_key(cls.DIRTY_KEY), 1)
+    
+    def build(self) -> Dict:
+        """Compute the payload and store it; changes from here on mark it dirty again"""
+        # Imported here: alerts.models marks the snapshot dirty on save
+        from alerts.models import Alert
+        from incidents.models import Incident
+        from playbooks.models import PlaybookExecution
+        
+        cache.delete(self.DIRTY_KEY)
+        generated_at = timezone.now()
+        
+        # Alert statistics
+        alerts = Alert.objects.aggregate(
+            total=Count('id'),
+            new=Count('id', filter=Q(status='NEW')),
+            critical=Count('id', filter=Q(severity='CRITICAL')),
+        )
+        alerts_by_severity = Alert.objects.values('severity').annotate(
+            count=Count('id')
+        ).order_by('severity')
+        
+        # Incident statistics
+        incidents = Incident.objects.aggregate(
+            total=Count('id'),
+            open=Count('id', filter=Q(status='OPEN')),
+        )
+        
+        # Playbook statistics
+        executions = PlaybookExecution.objects.aggregate(
+            total_executions=Count('id', filter=~Q(status='CACHED')),
+            successful=Count('id', filter=Q(status='SUCCESS')),
+            cached=Count('id', filter=Q(status='CACHED')),
+        )
+        total_executions = executions['total_executions']
+        executions['success_rate'] = (
+            (executions['successful'] / total_executions * 100) if total_executions > 0 else 0
+        )
+        
+        # Top MITRE techniques across all alerts; the 24h/7d/30d rankings are
+        # served by the frequency views (see analytics.frequency)
+        top_techniques = [
+            {'technique_id': technique.technique_id, 'name': technique.name, 'count': technique.alert_count}
+            for technique in MitreTechnique.objects.annotate(alert_count=Count('alerts')).order_by('-alert_count')[:5]
+        ]
+        
+        snapshot = {
+            'alerts': dict(alerts, by_severity=list(alerts_by_severity)),
+            'incidents': incidents,
+            'playbooks': executions,
+            'top_mitre_techniques': top_techniques,
+            'generated_at': generated_at.isoformat(),
+        }
+        cache.set(self.KEY, snapshot, timeout=None)
+        return snapshot
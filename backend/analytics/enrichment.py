@@ -0,0 +1,145 @@
+import json
+import time
+from datetime import timedelta
+from typing import Dict, List, Tuple
+from django.conf import settings
+from django.utils import timezone
+from django_redis import get_redis_connection
+from analytics.iocs import collect_iocs
+from analytics.models import ThreatIntelligence
+
+
+class EnrichmentCache:
+    """
+    Shared cache in front of the threat intelligence providers
+    
+    Lookups check Redis first, then fresh ThreatIntelligence rows, and only
+    what is still missing is sent to the providers by the enrichment script.
+    Fresh provider results are written back to both tiers; misses and errors
+    are kept in Redis only, for a shorter TTL. Both tiers are keyed by
+    (ioc_type, ioc_value); values too long for ThreatIntelligence are only
+    cached in Redis.
+    """
+    
+    KEY = 'enrichment:{ioc_type}:{value}'
+    STATS_KEY = 'enrichment-stats'
+    MAX_DB_VALUE_LENGTH = ThreatIntelligence._meta.get_field('ioc_value').max_length
+    
+    def __init__(self):
+        self.redis = get_redis_connection('default')
+    
+    @staticmethod
+    def iocs(alerts: List[Dict]) -> List[Tuple[str, str]]:
+        """Normalized (type, value) indicators carried by a set of alerts, deduplicated across them"""
+        return list(dict.fromkeys(
+            ioc for alert_data in alerts for ioc in collect_iocs(alert_data)
+        ))
+    
+    def lookup(self, alerts: List[Dict]) -> Dict:
+        """Known results for the alerts' IOCs as {value: {provider: result}}"""
+        iocs = self.iocs(alerts)
+        if not iocs:
+            return {}
+        
+        known: Dict[Tuple[str, str], Dict] = {}
+        now = time.time()
+        pipe = self.redis.pipeline(transaction=False)
+        for ioc_type, value in iocs:
+            pipe.hgetall(self.KEY.format(ioc_type=ioc_type, value=value))
+        
+        # Tier 1: Redis
+        for ioc, entries in zip(iocs, pipe.execute()):
+            for provider, entry in entries.items():
+                entry = json.loads(entry)
+                if entry.pop('expires_at') > now:
+                    entry['cached'] = True
+                    known.setdefault(ioc, {})[provider.decode()] = entry
+                    self._count(provider.decode(), 'redis_hits')
+        
+        # Tier 2: ThreatIntelligence rows refreshed within the DB TTL
+        fresh_since = timezone.now() - timedelta(seconds=settings.ENRICHMENT_DB_TTL)
+        wanted = {ioc for ioc in iocs if len(ioc[1]) <= self.MAX_DB_VALUE_LENGTH}
+        intel = ThreatIntelligence.objects.filter(
+            ioc_value__in={value for _, value in wanted},
+            last_seen__gte=fresh_since
+        ).exclude(enrichment_data={})
+        for row in intel:
+            ioc = (row.ioc_type, row.ioc_value)
+            if ioc not in wanted or row.source in known.get(ioc, {}):
+                continue
+            entry = {'success': True, 'data': row.enrichment_data, 'score': row.confidence_score}
+            self._cache(ioc, row.source, entry, settings.ENRICHMENT_CACHE_TTL)
+            known.setdefault(ioc, {})[row.source] = dict(entry, cached=True)
+            self._count(row.source, 'db_hits')
+        
+        # The enrichment script reads results by value
+        return {value: results for (_, value), results in known.items()}
+    
+    def store(self, enrichment: Dict):
+        """Write fresh provider results from the enrichment script back to the cache"""
+        now = timezone.now()
+        
+        for value, results in enrichment.items():
+            ioc_type = results.get('type')
+            if not ioc_type:
+                continue
+            for provider, result in results.items():
+                if provider == 'type' or result.get('cached') or result.get('success') is None:
+                    continue
+                self._count(provider, 'misses')
+                
+                if not result.get('success'):
+                    # Negative cache: misses and errors back off for a shorter TTL
+                    self._cache((ioc_type, value), provider, result, settings.ENRICHMENT_NEGATIVE_TTL)
+                    continue
+                
+                self._cache((ioc_type, value), provider, result, settings.ENRICHMENT_CACHE_TTL)
+                if len(value) > self.MAX_DB_VALUE_LENGTH:
+                    continue
+                
+                score = result.get('score') or 0
+                fields = {
+                    'threat_type': 'Malicious' if score >= 50 else 'Suspicious' if score > 0 else 'Benign',
+                    'confidence_score': score,
+                    'severity': 'HIGH' if score >= 75 else 'MEDIUM' if score >= 25 else 'LOW',
+                    'enrichment_data': result.get('data') or {},
+                    'last_seen': now,
+                }
+                ThreatIntelligence.objects.update_or_create(
+                    ioc_type=ioc_type,
+                    ioc_value=value,
+                    source=provider,
+                    defaults=fields,
+                    create_defaults=dict(fields, first_seen=now)
+                )
+    
+    def stats(self) -> Dict:
+        """Hit counts and hit ratio per provider"""
+        stats = {}
+        for field, count in self.redis.hgetall(self.STATS_KEY).items():
+            provider, counter = field.decode().split(':')
+            stats.setdefault(provider, {'redis_hits': 0, 'db_hits': 0, 'misses': 0})[counter] = int(count)
+        
+        for provider_stats in stats.values():
+            hits = provider_stats['redis_hits'] + provider_stats['db_hits']
+            total = hits + provider_stats['misses']
+            provider_stats['hit_ratio'] = (hits / total) if total else 0
+        
+        return stats
+    
+    def _cache(self, ioc: Tuple[str, str], provider: str, result: Dict, ttl: int):
+        key = self.KEY.format(ioc_type=ioc[0], value=ioc[1])
+        entry = {
+            'success': result.get('success'),
+            'data': result.get('data'),
+            'score': result.get('score'),
+            'expires_at': time.time() + ttl,
+        }
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hset(key, provider, json.dumps(entry))
+        # The hash lives as long as its longest-lived provider entry
+        pipe.expire(key, max(settings.ENRICHMENT_CACHE_TTL, ttl))
+        pipe.execute()
+    
+    def _count(self, provider: str, counter: str):
+        self.redis.hincrby(self.STATS_KEY, f"{provider}:{counter}", 1)
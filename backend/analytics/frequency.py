@@ -0,0 +1,118 @@
+from datetime import timedelta
+from typing import Dict, List
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+from analytics.models import TacticFrequency, TechniqueFrequency
+
+WINDOWS = ('24h', '7d', '30d')
+
+# One pass over the last 30 days of alerts per view; the three windows are
+# conditional counts. {since_*} are the window starts. Migration 0004 holds
+# a frozen copy of each as a view (see materialized_query): changing them
+# takes a new migration that recreates the views.
+TECHNIQUE_QUERY = """
+    SELECT am.mitretechnique_id AS technique_id,
+           COUNT(*) FILTER (WHERE a.detected_at >= {since_24h}) AS count_24h,
+           COUNT(*) FILTER (WHERE a.detected_at >= {since_7d}) AS count_7d,
+           COUNT(*) AS count_30d
+    FROM alerts_alert a
+    JOIN alerts_alert_mitre_techniques am ON am.alert_id = a.id
+    WHERE a.detected_at >= {since_30d}
+    GROUP BY am.mitretechnique_id
+"""
+
+# An alert with several techniques in one tactic counts once for it
+TACTIC_QUERY = """
+    SELECT mt.mitretactic_id AS tactic_id,
+           COUNT(DISTINCT a.id) FILTER (WHERE a.detected_at >= {since_24h}) AS count_24h,
+           COUNT(DISTINCT a.id) FILTER (WHERE a.detected_at >= {since_7d}) AS count_7d,
+           COUNT(DISTINCT a.id) AS count_30d
+    FROM alerts_alert a
+    JOIN alerts_alert_mitre_techniques am ON am.alert_id = a.id
+    JOIN frameworks_mitretechnique_tactics mt ON mt.mitretechnique_id = am.mitretechnique_id
+    WHERE a.detected_at >= {since_30d}
+    GROUP BY mt.mitretactic_id
+"""
+
+
+def materialized_query(query: str) -> str:
+    """A frequency query with windows relative to now(), as the materialized views run it on each refresh"""
+    return query.format(
+        since_24h="now() - interval '24 hours'",
+        since_7d="now() - interval '7 days'",
+        since_30d="now() - interval '30 days'",
+    )
+
+
+class FrequencyViews:
+    """
+    Alert counts per MITRE technique and tactic over the last 24h, 7d and 30d
+    
+    On PostgreSQL these are materialized views refreshed CONCURRENTLY, so
+    readers are never blocked and the cost of a read does not depend on how
+    much alert history is kept. Other databases get plain tables of the same
+    shape, repopulated in a transaction.
+    """
+    
+    VIEWS = (
+        (TechniqueFrequency, 'technique_id', TECHNIQUE_QUERY),
+        (TacticFrequency, 'tactic_id', TACTIC_QUERY),
+    )
+    REFRESHED_AT_KEY = 'frequency-views:refreshed-at'
+    
+    def refresh(self):
+        for model, key_column, query in self.VIEWS:
+            if connection.vendor == 'postgresql':
+                self._refresh_materialized(model._meta.db_table)
+            else:
+                self._refresh_table(model._meta.db_table, key_column, query)
+        cache.set(self.REFRESHED_AT_KEY, timezone.now().isoformat(), timeout=None)
+    
+    def top(self, model, window: str, limit: int = 10) -> Dict:
+        if window not in WINDOWS:
+            raise ValueError(f"window must be one of {', '.join(WINDOWS)}")
+        
+        related = 'technique' if model is TechniqueFrequency else 'tactic'
+        rows = (
+            model.objects.select_related(related)
+            .filter(**{f"count_{window}__gt": 0})
+            .order_by(f"-count_{window}", f"{related}_id")[:limit]
+        )
+        results: List[Dict] = []
+        for row in rows:
+            framework = getattr(row, related)
+            results.append({
+                f"{related}_id": getattr(framework, f"{related}_id"),
+                'name': framework.name,
+                'count': getattr(row, f"count_{window}"),
+            })
+        
+        return {
+            'window': window,
+            'refreshed_at': cache.get(self.REFRESHED_AT_KEY),
+            'results': results,
+        }
+    
+    @staticmethod
+    def _refresh_materialized(view: str):
+        with connection.cursor() as cursor:
+            # CONCURRENTLY needs the view populated once; the migration creates it empty
+            cursor.execute("SELECT ispopulated FROM pg_matviews WHERE matviewname = %s", [view])
+            populated = cursor.fetchone()[0]
+            cursor.execute(f"REFRESH MATERIALIZED VIEW {'CONCURRENTLY ' if populated else ''}{view}")
+    
+    @staticmethod
+    def _refresh_table(table: str, key_column: str, query: str):
+        now = timezone.now()
+        since = [
+            connection.ops.adapt_datetimefield_value(now - span)
+            for span in (timedelta(hours=24), timedelta(days=7), timedelta(days=30))
+        ]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table}")
+            cursor.execute(
+                f"INSERT INTO {table} ({key_column}, count_24h, count_7d, count_30d) "
+                + query.format(since_24h='%s', since_7d='%s', since_30d='%s'),
+                since
+            )
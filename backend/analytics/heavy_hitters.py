@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, Optional
+from django.conf import settings
+from django_redis import get_redis_connection
+
+# Space-Saving update of every summary an alert belongs to, in one round trip.
+# KEYS come in (summary, errors, total) triples, ARGV[1] is the capacity and
+# each triple takes an (item, ttl) pair from the rest of ARGV.
+RECORD_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+for i = 1, #KEYS / 3 do
+    local summary, errors, total = KEYS[3 * i - 2], KEYS[3 * i - 1], KEYS[3 * i]
+    local item, ttl = ARGV[2 * i], tonumber(ARGV[2 * i + 1])
+    
+    if redis.call('ZSCORE', summary, item) then
+        redis.call('ZINCRBY', summary, 1, item)
+    elseif redis.call('ZCARD', summary) < capacity then
+        redis.call('ZADD', summary, 1, item)
+    else
+        -- Evict the smallest counter; the newcomer inherits its count as error
+        local smallest = redis.call('ZRANGE', summary, 0, 0, 'WITHSCORES')
+        local floor = tonumber(smallest[2])
+        redis.call('ZREM', summary, smallest[1])
+        redis.call('HDEL', errors, smallest[1])
+        redis.call('ZADD', summary, floor + 1, item)
+        redis.call('HSET', errors, item, floor)
+    end
+    redis.call('INCR', total)
+    
+    redis.call('EXPIRE', summary, ttl)
+    redis.call('EXPIRE', errors, ttl)
+    redis.call('EXPIRE', total, ttl)
+end
+return 1
+"""
+
+
+class HeavyHitters:
+    """
+    Most frequent source/destination IPs, users and assets per hour and per day
+    
+    Each (field, period, bucket) is a Space-Saving summary of at most
+    HEAVY_HITTER_CAPACITY counters in a Redis sorted set, updated as alerts
+    are ingested. A reported count can overestimate the true one by at most
+    its recorded error, and any value seen more than total / capacity times
+    is guaranteed to be in the summary. Reading the top K is one ZREVRANGE.
+    """
+    
+    FIELDS = ('source_ip', 'destination_ip', 'affected_user', 'affected_asset')
+    PERIODS = ('hour', 'day')
+    KEY = 'heavy-hitters:{field}:{period}:{bucket}'
+    
+    def __init__(self):
+        self.redis = get_redis_connection('default')
+        self.capacity = settings.HEAVY_HITTER_CAPACITY
+        self._record = self.redis.register_script(RECORD_SCRIPT)
+    
+    @staticmethod
+    def bucket(period: str, at: datetime) -> str:
+        return at.astimezone(dt_timezone.utc).strftime('%Y%m%d%H' if period == 'hour' else '%Y%m%d')
+    
+    def ttl(self, period: str) -> int:
+        if period == 'hour':
+            return int(timedelta(days=settings.HEAVY_HITTER_HOURLY_RETENTION_DAYS).total_seconds())
+        return int(timedelta(days=settings.HEAVY_HITTER_DAILY_RETENTION_DAYS).total_seconds())
+    
+    def record(self, pipe, detected_at: datetime, values: Dict[str, Optional[str]]):
+        """Queue on `pipe` counting one alert's non-empty field values in its hour and day summaries"""
+        keys, args = [], [self.capacity]
+        for field in self.FIELDS:
+            if not values.get(field):
+                continue
+            for period in self.PERIODS:
+                key = self.KEY.format(field=field, period=period, bucket=self.bucket(period, detected_at))
+                keys += [key, f"{key}:errors", f"{key}:total"]
+                args += [str(values[field]), self.ttl(period)]
+        
+        if keys:
+            self._record(keys=keys, args=args, client=pipe)
+    
+    def top(self, field: str, period: str, at: datetime, k: int = 10) -> Dict:
+        """The k most frequent values of `field` in the bucket containing `at`, with error bounds"""
+        if field not in self.FIELDS:
+            raise ValueError(f"field must be one of {', '.join(self.FIELDS)}")
+        if period not in self.PERIODS:
+            raise ValueError(f"period must be one of {', '.join(self.PERIODS)}")
+        
+        key = self.KEY.format(field=field, period=period, bucket=self.bucket(period, at))
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zrevrange(key, 0, max(1, min(k, self.capacity)) - 1, withscores=True)
+        pipe.zcard(key)
+        pipe.zrange(key, 0, 0, withscores=True)
+        pipe.get(f"{key}:total")
+        top, tracked, smallest, total = pipe.execute()
+        
+        errors = dict(zip(
+            [value for value, _ in top],
+            self.redis.hmget(f"{key}:errors", [value for value, _ in top]) if top else []
+        ))
+        total = int(total or 0)
+        
+        return {
+            'field': field,
+            'period': period,
+            'bucket': self.bucket(period, at),
+            'total': total,
+            'capacity': self.capacity,
+            # Below capacity nothing has been evicted and every count is exact;
+            # otherwise no count is off by more than the smallest counter,
+            # itself at most total / capacity
+            'exact': tracked < self.capacity,
+            'max_error': 0 if tracked < self.capacity else int(smallest[0][1]),
+            'items': [
+                {
+                    'value': value.decode(),
+                    'count': int(count),
+                    'error': int(errors[value] or 0),
+                    'min_count': int(count) - int(errors[value] or 0),
+                }
+                for value, count in top
+            ],
+        }
@@ -0,0 +1,26 @@
+import importlib.util
+import sys
+from django.conf import settings
+
+
+def _load_ioc_utils():
+    """
+    playbook_scripts/ioc_utils.py, the IOC normalization the enrichment
+    script uses, so cache keys match the values it reports results under
+    """
+    if 'ioc_utils' in sys.modules:
+        return sys.modules['ioc_utils']
+    
+    spec = importlib.util.spec_from_file_location('ioc_utils', settings.PLAYBOOK_SCRIPTS_DIR / 'ioc_utils.py')
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['ioc_utils'] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+_ioc_utils = _load_ioc_utils()
+
+IOC_TYPES = _ioc_utils.IOC_TYPES
+detect_ioc_type = _ioc_utils.detect_ioc_type
+normalize_ioc = _ioc_utils.normalize_ioc
+collect_iocs = _ioc_utils.collect_iocs
@@ -0,0 +1,93 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from django_redis import get_redis_connection
+from analytics.metrics import day_bounds, store_daily_metrics
+from analytics.response_times import ResponseTimes
+from analytics.rollups import AlertRollups
+
+# Days already backfilled, so an interrupted run picks up where it stopped
+PROGRESS_KEY = 'metrics-backfill:{start}:{end}'
+PROGRESS_TTL = 7 * 24 * 3600
+
+
+def backfill_day(day: date, rebuild_rollups: bool = False) -> str:
+    if rebuild_rollups:
+        AlertRollups().rebuild(*day_bounds(day))
+        ResponseTimes().rebuild(day, day)
+    store_daily_metrics(day)
+    return day.isoformat()
+
+
+class Command(BaseCommand):
+    help = 'Recompute DailyMetrics for a range of days, several days at a time in worker processes'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--from', dest='start', type=date.fromisoformat, required=True, help='First day (YYYY-MM-DD)'
+        )
+        parser.add_argument(
+            '--to', dest='end', type=date.fromisoformat, help='Last day, inclusive (default: yesterday)'
+        )
+        parser.add_argument('--workers', type=int, default=4, help='Worker processes, 1 runs in this process')
+        parser.add_argument('--restart', action='store_true', help='Recompute days an earlier run already finished')
+        parser.add_argument(
+            '--rebuild-rollups', action='store_true',
+            help=(
+                'Recount the alert rollups and response time histograms from Alert first, '
+                'e.g. after importing historical alerts'
+            )
+        )
+    
+    def handle(self, *args, **options):
+        start = options['start']
+        end = options['end'] or timezone.localdate() - timedelta(days=1)
+        if end < start:
+            raise CommandError('--to is before --from')
+        
+        redis = get_redis_connection('default')
+        progress_key = PROGRESS_KEY.format(start=start, end=end)
+        if options['restart']:
+            redis.delete(progress_key)
+        
+        finished = {day.decode() for day in redis.smembers(progress_key)}
+        days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+        pending = [day for day in days if day.isoformat() not in finished]
+        self.stdout.write(
+            f"Backfilling {len(pending)} of {len(days)} days from {start} to {end} "
+            f"with {options['workers']} workers"
+        )
+        
+        failed = []
+        
+        def record(day, error=None):
+            if error:
+                failed.append(day)
+                self.stdout.write(self.style.ERROR(f"  {day}: {error}"))
+            else:
+                redis.sadd(progress_key, day.isoformat())
+                redis.expire(progress_key, PROGRESS_TTL)
+                self.stdout.write(f"  {day}")
+        
+        if options['workers'] <= 1:
+            for day in pending:
+                try:
+                    backfill_day(day, options['rebuild_rollups'])
+                except Exception as e:
+                    record(day, e)
+                else:
+                    record(day)
+        else:
+            # Forked workers must open their own database connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=connections.close_all) as pool:
+                futures = {pool.submit(backfill_day, day, options['rebuild_rollups']): day for day in pending}
+                for future in as_completed(futures):
+                    error = future.exception()
+                    record(futures[future], error)
+        
+        if failed:
+            raise CommandError(f"{len(failed)} days failed; rerun the same command to retry only those")
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {len(pending)} days"))
@@ -0,0 +1,197 @@
+import random
+import time as clock
+from contextlib import contextmanager
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Avg
+from alerts.models import Alert
+from analytics.metrics import compute_daily_metrics, day_bounds
+from analytics.models import AlertHourRollup, AlertMinuteRollup, ResponseTimeHistogram
+from analytics.response_times import ResponseTimes
+from analytics.rollups import AlertRollups
+from frameworks.models import MitreTechnique
+from incidents.models import Incident
+from playbooks.models import PlaybookExecution
+
+SEVERITIES = ['CRITICAL', 'HIGH', 'MEDIUM', 'MEDIUM', 'LOW', 'LOW', 'LOW', 'INFO']
+STATUSES = ['NEW', 'NEW', 'INVESTIGATING', 'IN_PROGRESS', 'RESOLVED', 'RESOLVED', 'FALSE_POSITIVE']
+ALERT_ID_PREFIX = 'BENCH-'
+
+
+def legacy_daily_metrics(day: date):
+    """The per-field COUNTs and per-alert loops compute_daily_metrics replaced"""
+    alerts = Alert.objects.filter(detected_at__date=day)
+    metrics = {
+        'total_alerts': alerts.count(),
+        'critical_alerts': alerts.filter(severity='CRITICAL').count(),
+        'high_alerts': alerts.filter(severity='HIGH').count(),
+        'medium_alerts': alerts.filter(severity='MEDIUM').count(),
+        'low_alerts': alerts.filter(severity='LOW').count(),
+        'resolved_alerts': alerts.filter(status='RESOLVED').count(),
+        'false_positives': alerts.filter(status='FALSE_POSITIVE').count(),
+    }
+    
+    incidents = Incident.objects.filter(detected_at__date=day)
+    metrics['total_incidents'] = incidents.count()
+    metrics['open_incidents'] = incidents.filter(status='OPEN').count()
+    metrics['closed_incidents'] = incidents.filter(status='CLOSED').count()
+    
+    executions = PlaybookExecution.objects.filter(created_at__date=day).exclude(status='CACHED')
+    metrics['playbooks_executed'] = executions.count()
+    metrics['playbooks_successful'] = executions.filter(status='SUCCESS').count()
+    
+    resolved_alerts = alerts.filter(status='RESOLVED', time_to_resolve__isnull=False)
+    if resolved_alerts.exists():
+        metrics['avg_time_to_resolve'] = resolved_alerts.aggregate(
+            avg=Avg('time_to_resolve')
+        )['avg'].total_seconds()
+    
+    top_techniques = {}
+    for alert in alerts:
+        for technique in alert.mitre_techniques.all():
+            key = f"{technique.technique_id} - {technique.name}"
+            top_techniques[key] = top_techniques.get(key, 0) + 1
+    metrics['top_mitre_techniques'] = dict(sorted(top_techniques.items(), key=lambda x: x[1], reverse=True)[:10])
+    
+    top_ips = {}
+    for alert in alerts:
+        if alert.source_ip:
+            top_ips[str(alert.source_ip)] = top_ips.get(str(alert.source_ip), 0) + 1
+    metrics['top_source_ips'] = dict(sorted(top_ips.items(), key=lambda x: x[1], reverse=True)[:10])
+    
+    return metrics
+
+
+class Command(BaseCommand):
+    help = 'Seed a day of synthetic alerts and time generate_daily_metrics against the old per-query version'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--alerts', type=int, default=1_000_000, help='Alerts to seed for the day')
+        parser.add_argument(
+            '--date', type=date.fromisoformat, default=date(2000, 1, 1), help='Day to seed (YYYY-MM-DD)'
+        )
+        parser.add_argument('--skip-legacy', action='store_true', help='Only time the current query')
+        parser.add_argument('--keep', action='store_true', help='Leave the seeded alerts in place')
+        parser.add_argument('--batch-size', type=int, default=10_000)
+    
+    def handle(self, *args, **options):
+        day = options['date']
+        random.seed(day.toordinal())
+        
+        seeded = Alert.objects.filter(alert_id__startswith=f"{ALERT_ID_PREFIX}{day}-").count()
+        if seeded < options['alerts']:
+            self.stdout.write(f"Seeding {options['alerts'] - seeded} alerts on {day}...")
+            self.seed(day, seeded, options['alerts'], options['batch_size'])
+            # bulk_create skips Alert.save(), so count the seeded day into
+            # the rollups and response time histograms directly
+            AlertRollups().rebuild(*day_bounds(day))
+            ResponseTimes().rebuild(day, day)
+        
+        try:
+            with self.measure() as current:
+                result = compute_daily_metrics(day)
+            self.stdout.write(f"compute_daily_metrics: {current['seconds']:.2f}s, {current['queries']} queries")
+            
+            if not options['skip_legacy']:
+                with self.measure() as legacy:
+                    expected = legacy_daily_metrics(day)
+                self.stdout.write(f"legacy: {legacy['seconds']:.2f}s, {legacy['queries']} queries")
+                self.stdout.write(self.style.SUCCESS(
+                    f"{legacy['seconds'] / current['seconds']:.1f}x faster, "
+                    f"{legacy['queries'] / current['queries']:.0f}x fewer queries"
+                ))
+                
+                mismatched = [
+                    field for field, value in expected.items()
+                    if not self.same(field, value, result.get(field))
+                ]
+                if mismatched:
+                    self.stdout.write(self.style.ERROR(f"Results differ in: {', '.join(mismatched)}"))
+        finally:
+            if not options['keep']:
+                self.cleanup(day, options['batch_size'])
+    
+    def seed(self, day, first, count, batch_size):
+        techniques = list(MitreTechnique.objects.values_list('id', flat=True)[:200])
+        if not techniques:
+            techniques = [
+                MitreTechnique.objects.create(
+                    technique_id=f"{ALERT_ID_PREFIX}T{index:04d}", name=f"Benchmark technique {index}",
+                    description='', url='https://attack.mitre.org/'
+                ).id
+                for index in range(50)
+            ]
+        
+        # A skewed pool of source IPs, so the top 10 means something
+        ips = [f"10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}" for index in range(5000)]
+        weights = [1 / (rank + 1) for rank in range(len(ips))]
+        start, _ = day_bounds(day)
+        through = Alert.mitre_techniques.through
+        
+        for offset in range(first, count, batch_size):
+            size = min(batch_size, count - offset)
+            statuses = random.choices(STATUSES, k=size)
+            source_ips = random.choices(ips, weights=weights, k=size)
+            with transaction.atomic():
+                alerts = Alert.objects.bulk_create([
+                    Alert(
+                        alert_id=f"{ALERT_ID_PREFIX}{day}-{offset + index}",
+                        title='Benchmark alert',
+                        description='',
+                        severity=random.choice(SEVERITIES),
+                        status=statuses[index],
+                        source_system='benchmark',
+                        source_ip=source_ips[index] if index % 10 else None,
+                        detected_at=start + timedelta(seconds=random.randrange(86400)),
+                        time_to_resolve=(
+                            timedelta(minutes=random.randrange(1, 600)) if statuses[index] == 'RESOLVED' else None
+                        ),
+                    )
+                    for index in range(size)
+                ], batch_size=2000)
+                through.objects.bulk_create([
+                    through(alert_id=alert.id, mitretechnique_id=technique_id)
+                    for alert in alerts
+                    for technique_id in random.sample(techniques, random.choice([0, 1, 1, 2]))
+                ], batch_size=5000)
+            self.stdout.write(f"  {offset + size}/{count}")
+    
+    def cleanup(self, day, batch_size):
+        self.stdout.write('Removing seeded alerts...')
+        seeded = Alert.objects.filter(alert_id__startswith=f"{ALERT_ID_PREFIX}{day}-")
+        while True:
+            ids = list(seeded.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            Alert.mitre_techniques.through.objects.filter(alert_id__in=ids).delete()
+            Alert.objects.filter(id__in=ids).delete()
+        MitreTechnique.objects.filter(technique_id__startswith=ALERT_ID_PREFIX).delete()
+        start, end = day_bounds(day)
+        for model in (AlertMinuteRollup, AlertHourRollup):
+            model.objects.filter(bucket__gte=start, bucket__lt=end).delete()
+        ResponseTimeHistogram.objects.filter(date=day).delete()
+    
+    @staticmethod
+    def same(field, expected, actual):
+        if isinstance(expected, float) and actual is not None:
+            return abs(expected - actual) < 1e-6 * max(1, abs(expected))
+        if field.startswith('top_'):
+            # Ties at the cut-off can be broken differently; compare the counts
+            return sorted(expected.values()) == sorted(actual.values())
+        return expected == actual
+    
+    @staticmethod
+    @contextmanager
+    def measure():
+        """Wall time and number of queries run inside the block"""
+        stats = {'queries': 0}
+        
+        def count(execute, sql, params, many, context):
+            stats['queries'] += 1
+            return execute(sql, params, many, context)
+        
+        started = clock.perf_counter()
+        with connection.execute_wrapper(count):
+            yield stats
+        stats['seconds'] = clock.perf_counter() - started
@@ -0,0 +1,111 @@
+from datetime import date, datetime, time, timedelta
+from typing import Dict
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from alerts.models import Alert
+from analytics.models import AlertHourRollup, DailyMetrics
+from analytics.response_times import ResponseTimes
+from incidents.models import Incident
+from playbooks.models import PlaybookExecution
+
+# DailyMetrics alert count fields and the alerts each counts
+ALERT_COUNTS = {
+    'total_alerts': Q(),
+    'critical_alerts': Q(severity='CRITICAL'),
+    'high_alerts': Q(severity='HIGH'),
+    'medium_alerts': Q(severity='MEDIUM'),
+    'low_alerts': Q(severity='LOW'),
+    'resolved_alerts': Q(status='RESOLVED'),
+    'false_positives': Q(status='FALSE_POSITIVE'),
+}
+
+
+def day_bounds(day: date):
+    """Start and end of a day in the current time zone, so filters can use the detected_at index"""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def compute_daily_metrics(day: date) -> Dict:
+    """
+    DailyMetrics field values for one day
+    
+    Alert counts are summed from the day's hourly rollups (see
+    analytics.rollups), or counted from Alert for a day that has none, and
+    response times from its histograms (see analytics.response_times);
+    incidents and playbook executions take one conditional-aggregation
+    query each, plus grouped queries for the top techniques and source IPs,
+    so the cost is a handful of queries however many alerts the day had.
+    """
+    start, end = day_bounds(day)
+    alerts = Alert.objects.filter(detected_at__gte=start, detected_at__lt=end)
+    
+    # Alert counts from the day's 24 hourly rollups rather than the alerts;
+    # days from before the rollups existed have no rows, so their alerts
+    # are counted directly instead of being stored as zeros
+    hours = AlertHourRollup.objects.filter(bucket__gte=start, bucket__lt=end)
+    if hours.exists():
+        counts = hours.aggregate(**{field: Sum('count', filter=q) for field, q in ALERT_COUNTS.items()})
+    else:
+        counts = alerts.aggregate(**{field: Count('id', filter=q) for field, q in ALERT_COUNTS.items()})
+    metrics = {field: count or 0 for field, count in counts.items()}
+    
+    # Response time means (in seconds), from the day's histograms (see analytics.response_times)
+    for metric, average in ResponseTimes().averages(day).items():
+        metrics[f"avg_{metric}"] = average
+    
+    # Incident metrics
+    metrics.update(Incident.objects.filter(detected_at__gte=start, detected_at__lt=end).aggregate(
+        total_incidents=Count('id'),
+        open_incidents=Count('id', filter=Q(status='OPEN')),
+        closed_incidents=Count('id', filter=Q(status='CLOSED')),
+    ))
+    
+    # Playbook metrics
+    metrics.update(
+        PlaybookExecution.objects.filter(created_at__gte=start, created_at__lt=end)
+        .exclude(status='CACHED')
+        .aggregate(
+            playbooks_executed=Count('id'),
+            playbooks_successful=Count('id', filter=Q(status='SUCCESS')),
+        )
+    )
+    
+    # Top MITRE techniques, counted on the M2M table rather than per alert
+    top_techniques = (
+        Alert.mitre_techniques.through.objects
+        .filter(alert__detected_at__gte=start, alert__detected_at__lt=end)
+        .values('mitretechnique__technique_id', 'mitretechnique__name')
+        .annotate(count=Count('id'))
+        .order_by('-count', 'mitretechnique__technique_id')[:10]
+    )
+    metrics['top_mitre_techniques'] = {
+        f"{row['mitretechnique__technique_id']} - {row['mitretechnique__name']}": row['count']
+        for row in top_techniques
+    }
+    
+    # Top source IPs
+    top_ips = (
+        alerts.filter(source_ip__isnull=False)
+        .values('source_ip')
+        .annotate(count=Count('id'))
+        .order_by('-count', 'source_ip')[:10]
+    )
+    metrics['top_source_ips'] = {str(row['source_ip']): row['count'] for row in top_ips}
+    
+    return metrics
+
+
+def store_daily_metrics(day: date) -> DailyMetrics:
+    """Compute a day's metrics and upsert its DailyMetrics row, so reruns refresh every field"""
+    metrics = DailyMetrics(date=day, **compute_daily_metrics(day))
+    DailyMetrics.objects.bulk_create(
+        [metrics],
+        update_conflicts=True,
+        unique_fields=['date'],
+        update_fields=[
+            field.name for field in DailyMetrics._meta.concrete_fields
+            if field.name not in ('id', 'date', 'created_at')
+        ],
+    )
+    return metrics
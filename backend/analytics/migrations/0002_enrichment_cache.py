@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-19 17:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analytics", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="threatintelligence",
+            name="enrichment_data",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
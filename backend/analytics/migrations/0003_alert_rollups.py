@@ -0,0 +1,61 @@
+# Generated by Django 5.0.1 on 2026-10-19 18:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analytics", "0002_enrichment_cache"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AlertHourRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("bucket", models.DateTimeField()),
+                ("severity", models.CharField(max_length=10)),
+                ("status", models.CharField(max_length=20)),
+                ("source_system", models.CharField(max_length=100)),
+                ("count", models.IntegerField(default=0)),
+            ],
+            options={
+                "ordering": ["bucket"],
+                "abstract": False,
+                "unique_together": {("bucket", "severity", "status", "source_system")},
+            },
+        ),
+        migrations.CreateModel(
+            name="AlertMinuteRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("bucket", models.DateTimeField()),
+                ("severity", models.CharField(max_length=10)),
+                ("status", models.CharField(max_length=20)),
+                ("source_system", models.CharField(max_length=100)),
+                ("count", models.IntegerField(default=0)),
+            ],
+            options={
+                "ordering": ["bucket"],
+                "abstract": False,
+                "unique_together": {("bucket", "severity", "status", "source_system")},
+            },
+        ),
+    ]
@@ -0,0 +1,118 @@
+# Generated by Django 5.0.1 on 2026-10-19 18:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Frozen copies of analytics.frequency's queries with now()-relative windows
+TECHNIQUE_VIEW = """
+    CREATE MATERIALIZED VIEW analytics_technique_frequency AS
+    SELECT am.mitretechnique_id AS technique_id,
+           COUNT(*) FILTER (WHERE a.detected_at >= now() - interval '24 hours') AS count_24h,
+           COUNT(*) FILTER (WHERE a.detected_at >= now() - interval '7 days') AS count_7d,
+           COUNT(*) AS count_30d
+    FROM alerts_alert a
+    JOIN alerts_alert_mitre_techniques am ON am.alert_id = a.id
+    WHERE a.detected_at >= now() - interval '30 days'
+    GROUP BY am.mitretechnique_id
+    WITH NO DATA
+"""
+
+TACTIC_VIEW = """
+    CREATE MATERIALIZED VIEW analytics_tactic_frequency AS
+    SELECT mt.mitretactic_id AS tactic_id,
+           COUNT(DISTINCT a.id) FILTER (WHERE a.detected_at >= now() - interval '24 hours') AS count_24h,
+           COUNT(DISTINCT a.id) FILTER (WHERE a.detected_at >= now() - interval '7 days') AS count_7d,
+           COUNT(DISTINCT a.id) AS count_30d
+    FROM alerts_alert a
+    JOIN alerts_alert_mitre_techniques am ON am.alert_id = a.id
+    JOIN frameworks_mitretechnique_tactics mt ON mt.mitretechnique_id = am.mitretechnique_id
+    WHERE a.detected_at >= now() - interval '30 days'
+    GROUP BY mt.mitretactic_id
+    WITH NO DATA
+"""
+
+# REFRESH ... CONCURRENTLY requires a unique index on each view
+VIEWS = (
+    ("analytics_technique_frequency", "technique_id", TECHNIQUE_VIEW),
+    ("analytics_tactic_frequency", "tactic_id", TACTIC_VIEW),
+)
+
+
+def create_views(apps, schema_editor):
+    for name, key_column, view in VIEWS:
+        if schema_editor.connection.vendor == "postgresql":
+            schema_editor.execute(view)
+            schema_editor.execute(f"CREATE UNIQUE INDEX {name}_key ON {name} ({key_column})")
+        else:
+            schema_editor.execute(
+                f"CREATE TABLE {name} ({key_column} integer PRIMARY KEY, "
+                "count_24h integer NOT NULL, count_7d integer NOT NULL, count_30d integer NOT NULL)"
+            )
+
+
+def drop_views(apps, schema_editor):
+    for name, key_column, view in VIEWS:
+        if schema_editor.connection.vendor == "postgresql":
+            schema_editor.execute(f"DROP MATERIALIZED VIEW IF EXISTS {name}")
+        else:
+            schema_editor.execute(f"DROP TABLE IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("alerts", "0001_initial"),
+        ("analytics", "0003_alert_rollups"),
+        ("frameworks", "0001_initial"),
+    ]
+    
+    operations = [
+        migrations.CreateModel(
+            name="TacticFrequency",
+            fields=[
+                (
+                    "tactic",
+                    models.OneToOneField(
+                        db_column="tactic_id",
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        primary_key=True,
+                        related_name="frequency",
+                        serialize=False,
+                        to="frameworks.mitretactic",
+                    ),
+                ),
+                ("count_24h", models.IntegerField()),
+                ("count_7d", models.IntegerField()),
+                ("count_30d", models.IntegerField()),
+            ],
+            options={
+                "db_table": "analytics_tactic_frequency",
+                "managed": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="TechniqueFrequency",
+            fields=[
+                (
+                    "technique",
+                    models.OneToOneField(
+                        db_column="technique_id",
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        primary_key=True,
+                        related_name="frequency",
+                        serialize=False,
+                        to="frameworks.mitretechnique",
+                    ),
+                ),
+                ("count_24h", models.IntegerField()),
+                ("count_7d", models.IntegerField()),
+                ("count_30d", models.IntegerField()),
+            ],
+            options={
+                "db_table": "analytics_technique_frequency",
+                "managed": False,
+            },
+        ),
+        migrations.RunPython(create_views, drop_views),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.0.1 on 2026-10-19 18:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analytics", "0004_frequency_views"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ResponseTimeHistogram",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                (
+                    "metric",
+                    models.CharField(
+                        choices=[
+                            ("time_to_detect", "Time to detect"),
+                            ("time_to_respond", "Time to respond"),
+                            ("time_to_resolve", "Time to resolve"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("severity", models.CharField(max_length=10)),
+                ("source_system", models.CharField(max_length=100)),
+                ("bucket", models.SmallIntegerField()),
+                ("count", models.IntegerField(default=0)),
+                ("total_seconds", models.FloatField(default=0)),
+            ],
+            options={
+                "ordering": ["date", "metric", "bucket"],
+                "unique_together": {
+                    ("date", "metric", "severity", "source_system", "bucket")
+                },
+            },
+        ),
+    ]
@@ -42,6 +42,87 @@ class DailyMetrics(models.Model):
         return f"Metrics for {self.date}"
 
 
+class AlertRollup(models.Model):
+    """Alerts detected in a time bucket, by severity, current status and source system"""
+    bucket = models.DateTimeField()
+    severity = models.CharField(max_length=10)
+    status = models.CharField(max_length=20)
+    source_system = models.CharField(max_length=100)
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        abstract = True
+        ordering = ['bucket']
+        unique_together = ['bucket', 'severity', 'status', 'source_system']
+    
+    def __str__(self):
+        return f"{self.bucket} {self.severity}/{self.status}/{self.source_system}: {self.count}"
+
+
+class AlertMinuteRollup(AlertRollup):
+    class Meta(AlertRollup.Meta):
+        pass
+
+
+class AlertHourRollup(AlertRollup):
+    class Meta(AlertRollup.Meta):
+        pass
+
+
+class ResponseTimeHistogram(models.Model):
+    """One bucket of a day's response time histogram (see analytics.response_times)"""
+    METRICS = [
+        ('time_to_detect', 'Time to detect'),
+        ('time_to_respond', 'Time to respond'),
+        ('time_to_resolve', 'Time to resolve'),
+    ]
+    
+    date = models.DateField()
+    metric = models.CharField(max_length=20, choices=METRICS)
+    severity = models.CharField(max_length=10)
+    source_system = models.CharField(max_length=100)
+    bucket = models.SmallIntegerField()
+    count = models.IntegerField(default=0)
+    total_seconds = models.FloatField(default=0)
+    
+    class Meta:
+        ordering = ['date', 'metric', 'bucket']
+        unique_together = ['date', 'metric', 'severity', 'source_system', 'bucket']
+    
+    def __str__(self):
+        return f"{self.date} {self.metric} {self.severity}/{self.source_system} #{self.bucket}: {self.count}"
+
+
+class TechniqueFrequency(models.Model):
+    """Alerts per MITRE technique over rolling windows, a materialized view (see analytics.frequency)"""
+    technique = models.OneToOneField(
+        'frameworks.MitreTechnique', primary_key=True, on_delete=models.DO_NOTHING,
+        db_column='technique_id', related_name='frequency'
+    )
+    count_24h = models.IntegerField()
+    count_7d = models.IntegerField()
+    count_30d = models.IntegerField()
+    
+    class Meta:
+        managed = False
+        db_table = 'analytics_technique_frequency'
+
+
+class TacticFrequency(models.Model):
+    """Alerts per MITRE tactic over rolling windows, a materialized view (see analytics.frequency)"""
+    tactic = models.OneToOneField(
+        'frameworks.MitreTactic', primary_key=True, on_delete=models.DO_NOTHING,
+        db_column='tactic_id', related_name='frequency'
+    )
+    count_24h = models.IntegerField()
+    count_7d = models.IntegerField()
+    count_30d = models.IntegerField()
+    
+    class Meta:
+        managed = False
+        db_table = 'analytics_tactic_frequency'
+
+
 class ThreatIntelligence(models.Model):
     IOC_TYPES = [
         ('IP', 'IP Address'),
@@ -59,6 +140,7 @@ class ThreatIntelligence(models.Model):
     source = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     tags = models.JSONField(default=list, blank=True)
+    enrichment_data = models.JSONField(default=dict, blank=True)
     first_seen = models.DateTimeField()
     last_seen = models.DateTimeField()
     is_active = models.BooleanField(default=True)
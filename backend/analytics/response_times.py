@@ -0,0 +1,271 @@
+import json
+import math
+from datetime import date
+from typing import Dict, Iterable, Optional, Tuple
+from django.db import connection, transaction
+from django.db.models import Avg, Sum
+from django.utils import timezone
+from django_redis import get_redis_connection
+from redis.exceptions import ResponseError
+from analytics.models import ResponseTimeHistogram
+from analytics.rollups import hold_lock
+
+METRICS = ('time_to_detect', 'time_to_respond', 'time_to_resolve')
+GROUP_FIELDS = ('severity', 'source_system')
+
+# Bucket 0 holds durations under a second, bucket i >= 1 holds
+# [GROWTH ** (i - 1), GROWTH ** i) seconds. Reporting a bucket's geometric
+# midpoint keeps any percentile within ~2.5% of the true value, and a year
+# fits in ~350 buckets. Changing GROWTH invalidates stored histograms.
+GROWTH = 1.05
+
+# (day, metric, severity, source_system, bucket)
+SampleKey = Tuple[str, str, str, str, int]
+
+
+def bucket_for(seconds: float) -> int:
+    if seconds < 1:
+        return 0
+    return int(math.log(seconds) / math.log(GROWTH)) + 1
+
+
+def bucket_value(bucket: int) -> float:
+    """Representative duration of a bucket, in seconds"""
+    if bucket == 0:
+        return 0.0
+    return GROWTH ** (bucket - 0.5)
+
+
+def quantile(buckets: Dict[int, int], q: float) -> Optional[float]:
+    """Nearest-rank quantile of a merged histogram {bucket: count}"""
+    total = sum(buckets.values())
+    if not total:
+        return None
+    rank = max(1, math.ceil(q * total))
+    seen = 0
+    for bucket in sorted(buckets):
+        seen += buckets[bucket]
+        if seen >= rank:
+            return round(bucket_value(bucket), 3)
+
+
+class ResponseTimes:
+    """
+    Histograms of time to detect, respond and resolve, per day, severity and source
+    
+    Every duration falls in a fixed log-scale bucket, so a day's histogram
+    is a set of (bucket, count) rows and histograms merge by adding counts:
+    percentiles over any range of days, severities or sources come from
+    summing rows, never from rescanning Alert. Each row also carries the
+    exact total of its durations, so averages are exact.
+    
+    Alert.save() records a duration when it is first set, against the day
+    the alert was detected, through a Redis hash that flush() folds into
+    ResponseTimeHistogram with additive upserts (as analytics.rollups does
+    for alert counts). Writes that bypass save() are not counted: whoever
+    makes them reconciles the days with rebuild().
+    """
+    
+    PENDING_KEY = 'response-times:pending'
+    FLUSHING_KEY = 'response-times:flushing'
+    LOCK_KEY = 'response-times:lock'
+    LOCK_TTL = 300
+    # A rebuild holds the lock throughout, for up to this long
+    REBUILD_LOCK_TTL = 3600
+    
+    def __init__(self):
+        self.redis = get_redis_connection('default')
+    
+    @staticmethod
+    def samples(alert) -> Dict[SampleKey, float]:
+        """The histogram buckets an alert's durations fall in, with the durations in seconds"""
+        day = timezone.localtime(alert.detected_at).date().isoformat()
+        samples = {}
+        for metric in METRICS:
+            duration = getattr(alert, metric)
+            if duration is None:
+                continue
+            seconds = max(duration.total_seconds(), 0.0)
+            samples[(day, metric, alert.severity, alert.source_system, bucket_for(seconds))] = seconds
+        return samples
+    
+    def record(self, pipe, current: Dict[SampleKey, float], previous: Optional[Dict[SampleKey, float]] = None):
+        """Queue on `pipe` counting the samples in `current`, removing those in `previous` that changed"""
+        previous = previous or {}
+        for samples, sign in ((current, 1), (previous, -1)):
+            for key, seconds in samples.items():
+                if (sign > 0 and previous.get(key) == seconds) or (sign < 0 and current.get(key) == seconds):
+                    continue
+                pipe.hincrby(self.PENDING_KEY, json.dumps([*key, 'count']), sign)
+                pipe.hincrbyfloat(self.PENDING_KEY, json.dumps([*key, 'seconds']), sign * seconds)
+    
+    def flush(self, wait: float = 0) -> Optional[int]:
+        """
+        Upsert pending samples into ResponseTimeHistogram, returns how many
+        counters were applied, or None if another flush kept the lock for
+        longer than `wait` seconds
+        """
+        with hold_lock(self.redis, self.LOCK_KEY, self.LOCK_TTL, wait=wait) as locked:
+            return self._flush() if locked else None
+    
+    def rebuild(self, start: date, end: date):
+        """Recompute the histograms of days [start, end] from Alert"""
+        from alerts.models import Alert
+        from analytics.metrics import day_bounds
+        
+        # No flush may run until the rows are re-created, or it would add
+        # its samples to rows that are about to be recounted from Alert
+        with hold_lock(self.redis, self.LOCK_KEY, self.REBUILD_LOCK_TTL, wait=self.LOCK_TTL) as locked:
+            if not locked:
+                raise TimeoutError("Response times are still being flushed, rebuild again later")
+            
+            self._flush()
+            fields = ('detected_at', 'severity', 'source_system') + METRICS
+            alerts = Alert.objects.filter(
+                detected_at__gte=day_bounds(start)[0], detected_at__lt=day_bounds(end)[1]
+            ).only(*fields)
+            
+            rows: Dict[SampleKey, list] = {}
+            for alert in alerts.iterator(chunk_size=5000):
+                for key, seconds in self.samples(alert).items():
+                    row = rows.setdefault(key, [0, 0.0])
+                    row[0] += 1
+                    row[1] += seconds
+            
+            with transaction.atomic():
+                ResponseTimeHistogram.objects.filter(date__gte=start, date__lte=end).delete()
+                ResponseTimeHistogram.objects.bulk_create(
+                    (
+                        ResponseTimeHistogram(
+                            date=day, metric=metric, severity=severity, source_system=source_system,
+                            bucket=bucket, count=count, total_seconds=total_seconds
+                        )
+                        for (day, metric, severity, source_system, bucket), (count, total_seconds) in rows.items()
+                    ),
+                    batch_size=5000
+                )
+    
+    def averages(self, day: date) -> Dict[str, Optional[float]]:
+        """Exact mean of each metric over a day's alerts, in seconds"""
+        from alerts.models import Alert
+        from analytics.metrics import day_bounds
+        
+        totals = {
+            row['metric']: row
+            for row in ResponseTimeHistogram.objects.filter(date=day)
+            .values('metric')
+            .annotate(count=Sum('count'), total_seconds=Sum('total_seconds'))
+            .order_by()
+        }
+        if not totals:
+            # Days from before the histograms existed have no rows; average their alerts directly
+            start, end = day_bounds(day)
+            averages = Alert.objects.filter(detected_at__gte=start, detected_at__lt=end).aggregate(
+                **{metric: Avg(metric) for metric in METRICS}
+            )
+            return {
+                metric: average.total_seconds() if average is not None else None
+                for metric, average in averages.items()
+            }
+        
+        return {
+            metric: (totals[metric]['total_seconds'] / totals[metric]['count'])
+            if totals.get(metric, {}).get('count') else None
+            for metric in METRICS
+        }
+    
+    def summary(
+        self,
+        start: date,
+        end: date,
+        metrics: Iterable[str] = METRICS,
+        quantiles: Iterable[float] = (0.5, 0.9, 0.99),
+        group_by: Optional[str] = None,
+        filters: Optional[Dict[str, str]] = None,
+    ) -> Dict:
+        """Count, mean and quantiles of each metric over days [start, end], merged from the daily histograms"""
+        metrics, quantiles = list(metrics), list(quantiles)
+        if unknown := set(metrics) - set(METRICS):
+            raise ValueError(f"Unknown metric(s): {', '.join(sorted(unknown))}")
+        if any(not 0 < q < 1 for q in quantiles):
+            raise ValueError('Quantiles must be between 0 and 1')
+        if group_by and group_by not in GROUP_FIELDS:
+            raise ValueError(f"group_by must be one of {', '.join(GROUP_FIELDS)}")
+        
+        group_fields = ['metric'] + ([group_by] if group_by else [])
+        rows = (
+            ResponseTimeHistogram.objects
+            .filter(date__gte=start, date__lte=end, metric__in=metrics, **(filters or {}))
+            .values(*group_fields, 'bucket')
+            .annotate(count=Sum('count'), total_seconds=Sum('total_seconds'))
+            .order_by()
+        )
+        
+        histograms: Dict[Tuple, Dict] = {}
+        for row in rows:
+            group = tuple(row[field] for field in group_fields)
+            histogram = histograms.setdefault(group, {'buckets': {}, 'total_seconds': 0.0})
+            histogram['buckets'][row['bucket']] = row['count']
+            histogram['total_seconds'] += row['total_seconds']
+        
+        results = []
+        for group, histogram in sorted(histograms.items()):
+            count = sum(histogram['buckets'].values())
+            if count <= 0:
+                continue
+            result = dict(zip(group_fields, group))
+            result['count'] = count
+            result['avg_seconds'] = round(histogram['total_seconds'] / count, 3)
+            for q in quantiles:
+                result[f"p{q * 100:g}"] = quantile(histogram['buckets'], q)
+            results.append(result)
+        
+        return {
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'results': results,
+        }
+    
+    def _flush(self) -> int:
+        """flush() with LOCK_KEY already held"""
+        # A leftover flushing hash is from a run that died before finishing
+        if not self.redis.exists(self.FLUSHING_KEY):
+            try:
+                self.redis.rename(self.PENDING_KEY, self.FLUSHING_KEY)
+            except ResponseError:
+                return 0
+        
+        counters = self.redis.hgetall(self.FLUSHING_KEY)
+        rows: Dict[SampleKey, list] = {}
+        for field, value in counters.items():
+            *key, kind = json.loads(field)
+            row = rows.setdefault(tuple(key), [0, 0.0])
+            if kind == 'count':
+                row[0] += int(value)
+            else:
+                row[1] += float(value)
+        
+        with transaction.atomic():
+            # A duration that changed within its bucket nets out its
+            # count but not its seconds
+            self._upsert({key: row for key, row in rows.items() if row[0] or row[1]})
+        self.redis.delete(self.FLUSHING_KEY)
+        return len(counters)
+    
+    @staticmethod
+    def _upsert(rows: Dict[SampleKey, list]):
+        if not rows:
+            return
+        table = connection.ops.quote_name(ResponseTimeHistogram._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {table} (date, metric, severity, source_system, bucket, count, total_seconds) "
+                f"VALUES (%s, %s, %s, %s, %s, %s, %s) "
+                f"ON CONFLICT (date, metric, severity, source_system, bucket) "
+                f"DO UPDATE SET count = {table}.count + EXCLUDED.count, "
+                f"total_seconds = {table}.total_seconds + EXCLUDED.total_seconds",
+                [
+                    (day, metric, severity, source_system, bucket, count, total_seconds)
+                    for (day, metric, severity, source_system, bucket), (count, total_seconds) in rows.items()
+                ]
+            )
@@ -0,0 +1,149 @@
+import json
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, Optional, Tuple
+from django.db import connection, transaction
+from django.db.models import Count
+from django.db.models.functions import TruncHour, TruncMinute
+from django_redis import get_redis_connection
+from redis.exceptions import ResponseError
+from analytics.models import AlertHourRollup, AlertMinuteRollup
+
+# (detected_at, severity, status, source_system)
+RollupKey = Tuple[datetime, str, str, str]
+
+
+@contextmanager
+def hold_lock(redis, key: str, ttl: int, wait: float = 0):
+    """Hold a Redis lock, waiting up to `wait` seconds for it; yields whether it was acquired"""
+    deadline = time.monotonic() + wait
+    while not redis.set(key, 1, nx=True, ex=ttl):
+        if time.monotonic() >= deadline:
+            yield False
+            return
+        time.sleep(0.1)
+    try:
+        yield True
+    finally:
+        redis.delete(key)
+
+
+class AlertRollups:
+    """
+    Alert counts per minute and per hour, by severity, status and source system
+    
+    Alert.save() records +1 for a new alert, and -1/+1 when an alert moves
+    between severities or statuses, as counters in a Redis hash. flush()
+    folds them into AlertMinuteRollup and AlertHourRollup with additive
+    upserts, so volume queries read O(buckets) rows instead of scanning
+    Alert. Rows count alerts by when they were detected and what they are
+    now; deleting old alerts does not rewrite history. Writes that bypass
+    save() (bulk_create, queryset update) are not counted: whoever makes
+    them reconciles the range with rebuild().
+    """
+    
+    PENDING_KEY = 'alert-rollup:pending'
+    FLUSHING_KEY = 'alert-rollup:flushing'
+    LOCK_KEY = 'alert-rollup:lock'
+    LOCK_TTL = 300
+    # A rebuild holds the lock throughout, for up to this long
+    REBUILD_LOCK_TTL = 3600
+    MODELS = ((AlertMinuteRollup, TruncMinute), (AlertHourRollup, TruncHour))
+    
+    def __init__(self):
+        self.redis = get_redis_connection('default')
+    
+    def record(self, pipe, current: RollupKey, previous: Optional[RollupKey] = None):
+        """Queue on `pipe` counting an alert under `current`, moving it out of `previous` if it was counted before"""
+        pipe.hincrby(self.PENDING_KEY, self._field(current), 1)
+        if previous:
+            pipe.hincrby(self.PENDING_KEY, self._field(previous), -1)
+    
+    def flush(self, wait: float = 0) -> Optional[int]:
+        """
+        Upsert pending counters into the rollup tables, returns how many
+        counters were applied, or None if another flush kept the lock for
+        longer than `wait` seconds
+        """
+        with hold_lock(self.redis, self.LOCK_KEY, self.LOCK_TTL, wait=wait) as locked:
+            return self._flush() if locked else None
+    
+    def rebuild(self, start: datetime, end: datetime):
+        """Recompute both rollup tables for [start, end) from Alert"""
+        from alerts.models import Alert
+        
+        # No flush may run until the rows are re-created, or it would add
+        # its counters to rows that are about to be recounted from Alert
+        with hold_lock(self.redis, self.LOCK_KEY, self.REBUILD_LOCK_TTL, wait=self.LOCK_TTL) as locked:
+            if not locked:
+                raise TimeoutError("Alert rollups are still being flushed, rebuild again later")
+            
+            self._flush()
+            alerts = Alert.objects.filter(detected_at__gte=start, detected_at__lt=end)
+            with transaction.atomic():
+                for model, trunc in self.MODELS:
+                    model.objects.filter(bucket__gte=start, bucket__lt=end).delete()
+                    rows = (
+                        alerts.order_by()
+                        .annotate(bucket=trunc('detected_at'))
+                        .values('bucket', 'severity', 'status', 'source_system')
+                        .annotate(count=Count('id'))
+                    )
+                    model.objects.bulk_create((model(**row) for row in rows.iterator()), batch_size=5000)
+    
+    def prune(self, before: datetime) -> int:
+        """Drop minute rollups older than `before`; hour rollups are kept"""
+        return AlertMinuteRollup.objects.filter(bucket__lt=before).delete()[0]
+    
+    def _flush(self) -> int:
+        """flush() with LOCK_KEY already held"""
+        # A leftover flushing hash is from a run that died before
+        # finishing; apply it before taking new counters
+        if not self.redis.exists(self.FLUSHING_KEY):
+            try:
+                self.redis.rename(self.PENDING_KEY, self.FLUSHING_KEY)
+            except ResponseError:
+                return 0
+        
+        counters = self.redis.hgetall(self.FLUSHING_KEY)
+        minutes: Dict[Tuple, int] = {}
+        hours: Dict[Tuple, int] = {}
+        for field, delta in counters.items():
+            if not int(delta):
+                continue
+            timestamp, severity, status, source_system = json.loads(field)
+            bucket = datetime.fromtimestamp(timestamp, tz=dt_timezone.utc)
+            minute_key = (bucket, severity, status, source_system)
+            hour_key = (bucket.replace(minute=0), severity, status, source_system)
+            minutes[minute_key] = minutes.get(minute_key, 0) + int(delta)
+            hours[hour_key] = hours.get(hour_key, 0) + int(delta)
+        
+        with transaction.atomic():
+            self._upsert(AlertMinuteRollup, minutes)
+            self._upsert(AlertHourRollup, hours)
+        self.redis.delete(self.FLUSHING_KEY)
+        return len(counters)
+    
+    @staticmethod
+    def _field(key: RollupKey) -> str:
+        detected_at, severity, status, source_system = key
+        minute = int(detected_at.timestamp()) // 60 * 60
+        return json.dumps([minute, severity, status, source_system])
+    
+    @staticmethod
+    def _upsert(model, counts: Dict[Tuple, int]):
+        if not counts:
+            return
+        table = connection.ops.quote_name(model._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {table} (bucket, severity, status, source_system, count) "
+                f"VALUES (%s, %s, %s, %s, %s) "
+                f"ON CONFLICT (bucket, severity, status, source_system) "
+                f"DO UPDATE SET count = {table}.count + EXCLUDED.count",
+                [
+                    (connection.ops.adapt_datetimefield_value(bucket), severity, status, source_system, count)
+                    for (bucket, severity, status, source_system), count in counts.items()
+                ]
+            )
@@ -0,0 +1,223 @@
+import json
+import os
+from collections import defaultdict
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.db.models.fields.json import KT
+from django.utils import timezone
+
+# Alert columns copied as they are, with their Arrow types
+SCALAR_FIELDS = [
+    ('id', pa.int64()),
+    ('alert_id', pa.string()),
+    ('title', pa.string()),
+    ('description', pa.string()),
+    ('severity', pa.string()),
+    ('status', pa.string()),
+    ('source_system', pa.string()),
+    ('source_ip', pa.string()),
+    ('destination_ip', pa.string()),
+    ('affected_user', pa.string()),
+    ('affected_asset', pa.string()),
+    ('assigned_to_id', pa.int64()),
+    ('detected_at', pa.timestamp('us', tz='UTC')),
+    ('created_at', pa.timestamp('us', tz='UTC')),
+    ('updated_at', pa.timestamp('us', tz='UTC')),
+    ('resolved_at', pa.timestamp('us', tz='UTC')),
+]
+
+# Durations as seconds, like DailyMetrics
+DURATION_FIELDS = ['time_to_detect', 'time_to_respond', 'time_to_resolve']
+
+# Single-valued framework tags, read through a join: column -> lookup
+RELATED_FIELDS = [
+    ('kill_chain_stage', 'kill_chain_stage__stage_number', pa.int8()),
+    ('diamond_adversary', 'diamond_adversary__name', pa.string()),
+    ('diamond_capability', 'diamond_capability__name', pa.string()),
+]
+
+# Multi-valued framework tags as lists of identifiers: column -> identifier on the tag model
+TAG_FIELDS = [
+    ('mitre_techniques', 'technique_id'),
+    ('mitre_sub_techniques', 'sub_technique_id'),
+    ('owasp_categories', 'category_id'),
+    ('stride_categories', 'stride_type'),
+]
+
+# JSON list fields, each item as a string
+LIST_FIELDS = ['tags', 'indicators_of_compromise']
+
+
+def raw_log_column(path: str) -> str:
+    return 'raw_' + path.replace('.', '_')
+
+
+def snapshot_schema(raw_log_fields: List[str]) -> pa.Schema:
+    fields = [pa.field(name, type_) for name, type_ in SCALAR_FIELDS]
+    fields += [pa.field(f"{name}_seconds", pa.float64()) for name in DURATION_FIELDS]
+    fields += [pa.field(name, type_) for name, _, type_ in RELATED_FIELDS]
+    fields += [pa.field(name, pa.list_(pa.string())) for name, _ in TAG_FIELDS]
+    fields += [pa.field(name, pa.list_(pa.string())) for name in LIST_FIELDS]
+    fields += [pa.field(raw_log_column(path), pa.string()) for path in raw_log_fields]
+    return pa.schema(fields, metadata={'raw_log_fields': json.dumps(raw_log_fields)})
+
+
+class AlertSnapshots:
+    """
+    Daily Parquet snapshots of alerts for offline analysis
+    
+    Each day of detected_at becomes ALERT_SNAPSHOT_DIR/date=YYYY-MM-DD/alerts.parquet
+    (Hive-style, so pyarrow.dataset, pandas, DuckDB and Spark read the
+    directory as one partitioned table). A row holds the alert's scalar
+    fields, its framework tags flattened to identifiers and the raw_log
+    values listed in ALERT_SNAPSHOT_RAW_LOG_FIELDS (dotted paths, extracted
+    by the database). Alerts are streamed through a server-side cursor and
+    written one record batch, and row group, at a time, so memory is
+    bounded by ALERT_SNAPSHOT_BATCH_SIZE whatever the day's volume.
+    A snapshot records alerts as they were when it was exported; exporting
+    a day again replaces its file.
+    """
+    
+    FILENAME = 'alerts.parquet'
+    
+    def __init__(self, directory=None, batch_size: int = None, raw_log_fields: Iterable[str] = None):
+        self.directory = Path(directory or settings.ALERT_SNAPSHOT_DIR)
+        self.batch_size = batch_size or settings.ALERT_SNAPSHOT_BATCH_SIZE
+        self.raw_log_fields = list(
+            settings.ALERT_SNAPSHOT_RAW_LOG_FIELDS if raw_log_fields is None else raw_log_fields
+        )
+        self.schema = snapshot_schema(self.raw_log_fields)
+    
+    def path(self, day: date) -> Path:
+        return self.directory / f"date={day.isoformat()}" / self.FILENAME
+    
+    def export(self, start: date, end: date) -> Dict[str, int]:
+        """Export days [start, end], returns rows written per day"""
+        return {
+            day.isoformat(): self.export_day(day)
+            for day in (start + timedelta(days=offset) for offset in range((end - start).days + 1))
+        }
+    
+    def export_day(self, day: date) -> int:
+        """Write one day's snapshot, returns how many alerts it holds"""
+        path = self.path(day)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        
+        # Written aside and renamed, so readers never see a partial file
+        partial = path.with_suffix('.parquet.partial')
+        schema = self.schema.with_metadata({
+            **self.schema.metadata, b'exported_at': timezone.now().isoformat().encode()
+        })
+        rows = 0
+        with pq.ParquetWriter(partial, schema, compression='zstd') as writer:
+            for batch in self._batches(day):
+                writer.write_batch(batch)
+                rows += batch.num_rows
+        os.replace(partial, path)
+        return rows
+    
+    def _batches(self, day: date) -> Iterator[pa.RecordBatch]:
+        from alerts.models import Alert
+        from analytics.metrics import day_bounds
+        
+        start, end = day_bounds(day)
+        raw_columns = {
+            raw_log_column(path): KT('raw_log__' + path.replace('.', '__'))
+            for path in self.raw_log_fields
+        }
+        fields = (
+            [name for name, _ in SCALAR_FIELDS] + DURATION_FIELDS
+            + [lookup for _, lookup, _ in RELATED_FIELDS] + LIST_FIELDS + list(raw_columns)
+        )
+        # iterator() reads through a server-side cursor on PostgreSQL
+        rows = (
+            Alert.objects.filter(detected_at__gte=start, detected_at__lt=end)
+            .annotate(**raw_columns)
+            .order_by('id')
+            .values_list(*fields)
+            .iterator(chunk_size=self.batch_size)
+        )
+        
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == self.batch_size:
+                yield self._record_batch(fields, batch)
+                batch = []
+        if batch:
+            yield self._record_batch(fields, batch)
+    
+    def _record_batch(self, fields: List[str], rows: List[tuple]) -> pa.RecordBatch:
+        from alerts.models import Alert
+        
+        columns = dict(zip(fields, map(list, zip(*rows))))
+        ids = columns['id']
+        
+        for name in ('source_ip', 'destination_ip'):
+            columns[name] = [str(value) if value is not None else None for value in columns[name]]
+        for name in DURATION_FIELDS:
+            columns[f"{name}_seconds"] = [
+                value.total_seconds() if value is not None else None for value in columns.pop(name)
+            ]
+        for name, lookup, _ in RELATED_FIELDS:
+            columns[name] = columns.pop(lookup)
+        for path in self.raw_log_fields:
+            # Text on PostgreSQL, but SQLite's json_extract keeps numbers as numbers
+            name = raw_log_column(path)
+            columns[name] = [
+                value if value is None or isinstance(value, str) else str(value) for value in columns[name]
+            ]
+        for name in LIST_FIELDS:
+            columns[name] = [
+                [item if isinstance(item, str) else json.dumps(item) for item in value]
+                if isinstance(value, list) else [] for value in columns[name]
+            ]
+        
+        # One query per tag relation for the whole batch
+        for name, identifier in TAG_FIELDS:
+            relation = getattr(Alert, name)
+            through = relation.through
+            target = relation.field.m2m_reverse_field_name()
+            tags = defaultdict(list)
+            links = (
+                through.objects.filter(alert_id__in=ids)
+                .order_by(f"{target}__{identifier}")
+                .values_list('alert_id', f"{target}__{identifier}")
+            )
+            for alert_id, value in links:
+                tags[alert_id].append(value)
+            columns[name] = [tags.get(alert_id, []) for alert_id in ids]
+        
+        return pa.RecordBatch.from_pydict(columns, schema=self.schema)
+
+
+def load_alert_snapshots(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    columns: Optional[List[str]] = None,
+    directory=None,
+) -> pa.Table:
+    """
+    Read the snapshots of days [start, end] as one Arrow table
+    
+    Files are memory-mapped, so only the pages of the requested columns are
+    read. Pass `directory` to use a copy of the snapshots outside Django;
+    call .to_pandas() on the result for a DataFrame.
+    """
+    directory = Path(directory or settings.ALERT_SNAPSHOT_DIR)
+    tables = []
+    for path in sorted(directory.glob(f"date=*/{AlertSnapshots.FILENAME}")):
+        day = date.fromisoformat(path.parent.name.split('=', 1)[1])
+        if (start and day < start) or (end and day > end):
+            continue
+        tables.append(pq.read_table(path, columns=columns, memory_map=True))
+    
+    if not tables:
+        empty = snapshot_schema([]).empty_table()
+        return empty.select([name for name in columns if name in empty.column_names]) if columns else empty
+    # Days exported with different raw_log fields get null-filled columns
+    return pa.concat_tables(tables, promote_options='default')
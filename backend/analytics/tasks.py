@@ -1,11 +1,14 @@
 from celery import shared_task
-from analytics.models import DailyMetrics
-from alerts.models import Alert
-from incidents.models import Incident
-from playbooks.models import PlaybookExecution
+from analytics.anomalies import VolumeAnomalyDetector
+from analytics.dashboard import DashboardSnapshot
+from analytics.frequency import FrequencyViews
+from analytics.metrics import store_daily_metrics
+from analytics.response_times import ResponseTimes
+from analytics.rollups import AlertRollups
+from analytics.snapshots import AlertSnapshots
+from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
-from django.db.models import Count, Avg
 
 
 @shared_task
@@ -13,68 +16,71 @@ def generate_daily_metrics():
     """Generate daily metrics for analytics"""
     yesterday = (timezone.now() - timedelta(days=1)).date()
     
-    # Get alerts from yesterday
-    alerts = Alert.objects.filter(
-        detected_at__date=yesterday
-    )
+    # Alert counts and response times come from the rollups and histograms,
+    # which must include the day's last minutes
+    AlertRollups().flush()
+    ResponseTimes().flush()
+    store_daily_metrics(yesterday)
     
-    # Calculate metrics
-    metrics, created = DailyMetrics.objects.get_or_create(
-        date=yesterday,
-        defaults={
-            'total_alerts': alerts.count(),
-            'critical_alerts': alerts.filter(severity='CRITICAL').count(),
-            'high_alerts': alerts.filter(severity='HIGH').count(),
-            'medium_alerts': alerts.filter(severity='MEDIUM').count(),
-            'low_alerts': alerts.filter(severity='LOW').count(),
-            'resolved_alerts': alerts.filter(status='RESOLVED').count(),
-            'false_positives': alerts.filter(status='FALSE_POSITIVE').count(),
-        }
-    )
-    
-    # Incident metrics
-    incidents = Incident.objects.filter(detected_at__date=yesterday)
-    metrics.total_incidents = incidents.count()
-    metrics.open_incidents = incidents.filter(status='OPEN').count()
-    metrics.closed_incidents = incidents.filter(status='CLOSED').count()
-    
-    # Playbook metrics
-    executions = PlaybookExecution.objects.filter(created_at__date=yesterday)
-    metrics.playbooks_executed = executions.count()
-    metrics.playbooks_successful = executions.filter(status='SUCCESS').count()
-    
-    # Response time metrics (in seconds)
-    resolved_alerts = alerts.filter(status='RESOLVED', time_to_resolve__isnull=False)
-    if resolved_alerts.exists():
-        metrics.avg_time_to_resolve = resolved_alerts.aggregate(
-            avg=Avg('time_to_resolve')
-        )['avg'].total_seconds()
-    
-    # Top MITRE techniques
-    top_techniques = {}
-    for alert in alerts:
-        for technique in alert.mitre_techniques.all():
-            key = f"{technique.technique_id} - {technique.name}"
-            top_techniques[key] = top_techniques.get(key, 0) + 1
-    
-    metrics.top_mitre_techniques = dict(sorted(
-        top_techniques.items(),
-        key=lambda x: x[1],
-        reverse=True
-    )[:10])
-    
-    # Top source IPs
-    top_ips = {}
-    for alert in alerts:
-        if alert.source_ip:
-            top_ips[str(alert.source_ip)] = top_ips.get(str(alert.source_ip), 0) + 1
-    
-    metrics.top_source_ips = dict(sorted(
-        top_ips.items(),
-        key=lambda x: x[1],
-        reverse=True
-    )[:10])
-    
-    metrics.save()
-    
-    return f"Metrics generated for {yesterday}"
\ No newline at end of file
+    return f"Metrics generated for {yesterday}"
+
+
+@shared_task
+def flush_alert_rollups():
+    """Apply alert counters collected in Redis to the minute and hour rollups"""
+    applied = AlertRollups().flush()
+    if applied is None:
+        return "Alert rollups are already being flushed"
+    return f"Applied {applied} alert rollup counters"
+
+
+@shared_task
+def flush_response_times():
+    """Apply response time samples collected in Redis to the daily histograms"""
+    applied = ResponseTimes().flush()
+    if applied is None:
+        return "Response times are already being flushed"
+    return f"Applied {applied} response time counters"
+
+
+@shared_task
+def detect_volume_anomalies():
+    """Score the latest alert volume per source system and severity, raising alerts for anomalies"""
+    # The bucket being scored must include alerts still buffered in Redis.
+    # While another flush holds them the latest minutes are under-counted,
+    # which would look like sources going quiet, so the run is skipped
+    if AlertRollups().flush(wait=settings.ALERT_ANOMALY_FLUSH_WAIT_SECONDS) is None:
+        return "Alert rollups are being flushed elsewhere, anomaly detection skipped"
+    anomalies = VolumeAnomalyDetector().run()
+    return f"Found {len(anomalies)} alert volume anomalies"
+
+
+@shared_task
+def export_alert_snapshot():
+    """Write yesterday's alerts to a Parquet snapshot for offline analysis"""
+    # Snapshot days are local days, like DailyMetrics
+    yesterday = timezone.localdate() - timedelta(days=1)
+    rows = AlertSnapshots().export_day(yesterday)
+    return f"Exported {rows} alerts for {yesterday}"
+
+
+@shared_task
+def prune_alert_rollups():
+    """Drop minute rollups past their retention, hour rollups stay"""
+    cutoff = timezone.now() - timedelta(days=settings.ALERT_MINUTE_ROLLUP_RETENTION_DAYS)
+    deleted = AlertRollups().prune(cutoff)
+    return f"Deleted {deleted} minute rollups"
+
+
+@shared_task
+def rebuild_dashboard_snapshot():
+    """Recompute the cached dashboard payload"""
+    snapshot = DashboardSnapshot().build()
+    return f"Dashboard snapshot generated at {snapshot['generated_at']}"
+
+
+@shared_task
+def refresh_frequency_views():
+    """Recompute alert counts per technique and tactic over the rolling windows"""
+    FrequencyViews().refresh()
+    return "Technique and tactic frequencies refreshed"
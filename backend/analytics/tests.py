@@ -1,3 +1,331 @@
-from django.test import TestCase
+import importlib
+import time
+from datetime import date, timedelta
 
-# Create your tests here.
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from alerts.models import Alert
+from analytics.dashboard import DashboardSnapshot
+from analytics.frequency import FrequencyViews, materialized_query
+from analytics import tasks
+from analytics.management.commands.benchmark_daily_metrics import Command, legacy_daily_metrics
+from analytics.metrics import ALERT_COUNTS, compute_daily_metrics, day_bounds
+from analytics.models import AlertMinuteRollup, ResponseTimeHistogram, TacticFrequency, TechniqueFrequency
+from analytics.response_times import ResponseTimes
+from analytics.rollups import AlertRollups
+from frameworks.models import MitreTactic, MitreTechnique
+from incidents.models import Incident
+from playbooks.models import Playbook, PlaybookExecution
+
+DAY = date(2024, 3, 10)
+
+SEVERITIES = ['CRITICAL', 'HIGH', 'MEDIUM', 'LOW', 'INFO']
+STATUSES = ['NEW', 'INVESTIGATING', 'RESOLVED', 'FALSE_POSITIVE', 'RESOLVED']
+
+
+@pytest.fixture
+def redis():
+    """The platform's Redis, with no analytics counters left over from other tests"""
+    connection = get_redis_connection('default')
+    for pattern in ('alert-rollup:*', 'response-times:*'):
+        for key in connection.scan_iter(pattern):
+            connection.delete(key)
+    return connection
+
+
+def seed_day(day):
+    """Alerts, incidents and executions on `day`, plus a few just outside it"""
+    techniques = [
+        MitreTechnique.objects.create(
+            technique_id=f'T10{index:02d}', name=f'Technique {index}', description='',
+            url='https://attack.mitre.org/'
+        )
+        for index in range(12)
+    ]
+    start, end = day_bounds(day)
+    
+    # The first and last alert sit on the day's edges, the last two fall outside it
+    offsets = [timedelta(0)] + [timedelta(minutes=37 * index) for index in range(1, 38)] + [
+        end - start - timedelta(seconds=1), end - start, timedelta(seconds=-1),
+    ]
+    for index, offset in enumerate(offsets):
+        alert = Alert.objects.create(
+            alert_id=f'ALERT-METRICS-{index}',
+            title=f'Test alert {index}',
+            description='Test alert',
+            severity=SEVERITIES[index % len(SEVERITIES)],
+            status=STATUSES[index % len(STATUSES)],
+            source_system='TestSIEM',
+            source_ip=f'10.0.0.{index % 13}' if index % 4 else None,
+            detected_at=start + offset,
+        )
+        alert.mitre_techniques.set(techniques[index % 12:index % 12 + index % 3])
+    
+    for index, status in enumerate(['OPEN', 'OPEN', 'CLOSED', 'CONTAINED']):
+        Incident.objects.create(
+            incident_id=f'INC-METRICS-{index}', title='Test incident', description='Test incident',
+            incident_type='MALWARE', severity='HIGH', status=status,
+            detected_at=start + timedelta(hours=index),
+        )
+    
+    playbook = Playbook.objects.create(
+        name='Block IP', description='Test playbook', playbook_type='CONTAINMENT',
+        script_path='containment/block_ip.py'
+    )
+    for status in ['SUCCESS', 'SUCCESS', 'FAILED', 'CACHED']:
+        PlaybookExecution.objects.create(playbook=playbook, alert=alert, status=status)
+    PlaybookExecution.objects.update(created_at=start + timedelta(hours=3))
+
+
+def assert_matches_legacy(day):
+    expected = legacy_daily_metrics(day)
+    actual = compute_daily_metrics(day)
+    assert expected['total_alerts'] == 39
+    mismatched = [field for field, value in expected.items() if not Command.same(field, value, actual.get(field))]
+    assert mismatched == []
+
+
+@pytest.mark.django_db
+class TestDailyMetrics:
+    """Test compute_daily_metrics agrees with the per-alert scan it replaced"""
+    
+    def test_rebuilt_rollups_match_the_alert_scan(self, redis):
+        """Test metrics read from rebuilt rollups and histograms match counting Alert"""
+        seed_day(DAY)
+        AlertRollups().rebuild(day_bounds(DAY - timedelta(days=1))[0], day_bounds(DAY + timedelta(days=1))[1])
+        ResponseTimes().rebuild(DAY - timedelta(days=1), DAY + timedelta(days=1))
+        
+        assert_matches_legacy(DAY)
+    
+    def test_saved_alerts_match_the_alert_scan(self, redis, django_capture_on_commit_callbacks):
+        """Test the counters Alert.save() keeps, once flushed, match counting Alert"""
+        with django_capture_on_commit_callbacks(execute=True):
+            seed_day(DAY)
+            for alert in Alert.objects.filter(status='NEW')[:3]:
+                alert.status = 'RESOLVED'
+                alert.save()
+        AlertRollups().flush()
+        ResponseTimes().flush()
+        
+        assert_matches_legacy(DAY)
+    
+    def test_days_without_histograms_average_alerts(self, redis):
+        """Test a day from before the histograms existed averages its alerts' durations"""
+        seed_day(DAY)
+        AlertRollups().rebuild(*day_bounds(DAY))
+        
+        assert ResponseTimeHistogram.objects.count() == 0
+        assert_matches_legacy(DAY)
+
+
+@pytest.mark.django_db
+class TestFlushLock:
+    """Test rebuilds and anomaly detection never work from a flush still in progress"""
+    
+    def test_rebuild_waits_for_a_running_flush(self, redis):
+        """Test a rebuild starts once the flush holding the lock is done, not alongside it"""
+        seed_day(DAY)
+        redis.set(AlertRollups.LOCK_KEY, 1, px=500)
+        redis.set(ResponseTimes.LOCK_KEY, 1, px=500)
+        
+        started = time.monotonic()
+        AlertRollups().rebuild(*day_bounds(DAY))
+        ResponseTimes().rebuild(DAY, DAY)
+        
+        assert time.monotonic() - started >= 0.4
+        assert_matches_legacy(DAY)
+    
+    def test_anomalies_are_not_scored_on_a_partial_flush(self, redis, settings, monkeypatch):
+        """Test anomaly detection skips a run while another flush holds the latest counters"""
+        settings.ALERT_ANOMALY_FLUSH_WAIT_SECONDS = 0.2
+        redis.set(AlertRollups.LOCK_KEY, 1, ex=60)
+        monkeypatch.setattr(tasks.VolumeAnomalyDetector, 'run', pytest.fail)
+        
+        assert 'skipped' in tasks.detect_volume_anomalies()
+        
+        redis.delete(AlertRollups.LOCK_KEY)
+        monkeypatch.setattr(tasks.VolumeAnomalyDetector, 'run', lambda self: [])
+        assert tasks.detect_volume_anomalies() == 'Found 0 alert volume anomalies'
+    
+    def test_rebuild_gives_up_on_a_stuck_lock(self, redis):
+        """Test a rebuild raises rather than running alongside a flush that doesn't finish"""
+        redis.set(AlertRollups.LOCK_KEY, 1, ex=60)
+        rollups = AlertRollups()
+        rollups.LOCK_TTL = 0.2
+        
+        with pytest.raises(TimeoutError):
+            rollups.rebuild(*day_bounds(DAY))
+    
+    def test_flush_waits_for_a_rebuild(self, redis, monkeypatch):
+        """Test counters recorded during a rebuild stay pending until it has re-created the rows"""
+        seed_day(DAY)
+        start, _ = day_bounds(DAY)
+        flushed = []
+        bulk_create = AlertMinuteRollup.objects.bulk_create
+        
+        def flush_meanwhile(*args, **kwargs):
+            AlertRollups().record(redis, (start, 'HIGH', 'NEW', 'TestSIEM'))
+            flushed.append(AlertRollups().flush())
+            return bulk_create(*args, **kwargs)
+        monkeypatch.setattr(AlertMinuteRollup.objects, 'bulk_create', flush_meanwhile)
+        
+        AlertRollups().rebuild(*day_bounds(DAY))
+        assert flushed == [None]
+        
+        assert AlertRollups().flush() == 1
+        assert sum(AlertMinuteRollup.objects.values_list('count', flat=True)) == 39 + 1
+
+
+@pytest.mark.django_db
+class TestAlertBookkeeping:
+    """Test the analytics Alert.save() keeps in Redis"""
+    
+    def test_days_without_rollups_count_alerts(self, redis):
+        """Test a day from before the rollups existed is counted from Alert, not stored as zeros"""
+        seed_day(DAY)
+        
+        expected = legacy_daily_metrics(DAY)
+        actual = compute_daily_metrics(DAY)
+        assert actual['total_alerts'] == 39
+        assert {field: actual[field] for field in ALERT_COUNTS} == {field: expected[field] for field in ALERT_COUNTS}
+    
+    def test_redis_errors_do_not_fail_the_save(self, redis, monkeypatch, caplog,
+                                               django_capture_on_commit_callbacks):
+        """Test the alert is saved, and the error logged, when Redis is unreachable"""
+        def unreachable(*args, **kwargs):
+            raise ConnectionError('Redis went away')
+        monkeypatch.setattr('redis.client.Pipeline.execute', unreachable)
+        
+        with django_capture_on_commit_callbacks(execute=True) as callbacks:
+            seed_day(DAY)
+        
+        assert len(callbacks) == Alert.objects.count()
+        assert 'Redis went away' in caplog.text
+    
+    def test_loading_alerts_defers_the_bookkeeping(self, redis, monkeypatch, django_capture_on_commit_callbacks):
+        """Test alerts are only worked out against their counters when saved"""
+        seed_day(DAY)
+        calls = []
+        samples = ResponseTimes.samples
+        monkeypatch.setattr(ResponseTimes, 'samples', staticmethod(lambda alert: calls.append(alert) or samples(alert)))
+        
+        alerts = list(Alert.objects.all())
+        assert calls == []
+        
+        alert = alerts[0]
+        alert.status = 'FALSE_POSITIVE' if alert.status != 'FALSE_POSITIVE' else 'NEW'
+        with django_capture_on_commit_callbacks(execute=True):
+            alert.save()
+        assert len(calls) == 2
+        assert redis.hlen(AlertRollups.PENDING_KEY) == 2
+
+
+@pytest.fixture
+def technique_alerts(db):
+    """Alerts on two techniques in one tactic: one recent and three a few weeks old"""
+    tactic = MitreTactic.objects.create(
+        tactic_id='TA0001', name='Initial Access', description='', url='https://attack.mitre.org/'
+    )
+    recent, old = [
+        MitreTechnique.objects.create(
+            technique_id=technique_id, name=name, description='', url='https://attack.mitre.org/'
+        )
+        for technique_id, name in (('T1190', 'Exploit Public-Facing Application'), ('T1566', 'Phishing'))
+    ]
+    recent.tactics.add(tactic)
+    old.tactics.add(tactic)
+    
+    now = timezone.now()
+    for index, (technique, age) in enumerate([(recent, timedelta(hours=1))] + [(old, timedelta(days=20))] * 3):
+        alert = Alert.objects.create(
+            alert_id=f'ALERT-FREQUENCY-{index}', title='Test alert', description='Test alert',
+            severity='HIGH', source_system='TestSIEM', detected_at=now - age,
+        )
+        alert.mitre_techniques.add(technique)
+    return recent, old, tactic
+
+
+@pytest.mark.django_db
+class TestFrequencyViews:
+    """Test the technique and tactic frequency views"""
+    
+    def test_refresh_counts_each_window(self, technique_alerts):
+        """Test a refresh counts alerts per technique and tactic in every window"""
+        recent, old, tactic = technique_alerts
+        FrequencyViews().refresh()
+        
+        assert TechniqueFrequency.objects.get(technique=recent).count_24h == 1
+        assert (TechniqueFrequency.objects.get(technique=old).count_24h,
+                TechniqueFrequency.objects.get(technique=old).count_30d) == (0, 3)
+        assert [row['technique_id'] for row in FrequencyViews().top(TechniqueFrequency, '30d')['results']] == [
+            'T1566', 'T1190'
+        ]
+        assert TacticFrequency.objects.get(tactic=tactic).count_30d == 4
+    
+    @pytest.mark.skipif(connection.vendor != 'postgresql', reason='materialized views are PostgreSQL only')
+    def test_later_refreshes_are_concurrent(self, technique_alerts):
+        """Test a populated view is refreshed CONCURRENTLY and picks up new alerts"""
+        recent, old, tactic = technique_alerts
+        FrequencyViews().refresh()
+        
+        alert = Alert.objects.create(
+            alert_id='ALERT-FREQUENCY-NEW', title='Test alert', description='Test alert',
+            severity='HIGH', source_system='TestSIEM', detected_at=timezone.now(),
+        )
+        alert.mitre_techniques.add(old)
+        with CaptureQueriesContext(connection) as queries:
+            FrequencyViews().refresh()
+        
+        refreshes = [query['sql'] for query in queries if query['sql'].startswith('REFRESH')]
+        assert refreshes == [
+            'REFRESH MATERIALIZED VIEW CONCURRENTLY analytics_technique_frequency',
+            'REFRESH MATERIALIZED VIEW CONCURRENTLY analytics_tactic_frequency',
+        ]
+        assert TechniqueFrequency.objects.get(technique=old).count_24h == 1
+        assert TacticFrequency.objects.get(tactic=tactic).count_24h == 2
+    
+    def test_views_match_the_queries(self):
+        """Test the views the migrations create still run the queries the fallback tables use"""
+        migration = importlib.import_module('analytics.migrations.0004_frequency_views')
+        views = {name: view for name, _, view in migration.VIEWS}
+        
+        for model, _, query in FrequencyViews.VIEWS:
+            name = model._meta.db_table
+            expected = f"CREATE MATERIALIZED VIEW {name} AS {materialized_query(query)} WITH NO DATA"
+            assert views[name].split() == expected.split()
+    
+    def test_dashboard_ranks_techniques_over_all_alerts(self, technique_alerts):
+        """Test the dashboard's top techniques count every alert, not only the last 30 days"""
+        recent, old, tactic = technique_alerts
+        Alert.objects.filter(mitre_techniques=old).update(detected_at=timezone.now() - timedelta(days=400))
+        
+        top = DashboardSnapshot().build()['top_mitre_techniques']
+        assert [(row['technique_id'], row['count']) for row in top] == [('T1566', 3), ('T1190', 1)]
+
+
+@pytest.mark.django_db
+class TestResponseTimes:
+    """Test the response time histograms kept from Alert.save()"""
+    
+    def test_duration_changed_within_its_bucket(self, redis, django_capture_on_commit_callbacks):
+        """Test a duration that moves within its bucket updates the bucket's total"""
+        detected_at = timezone.now() - timedelta(hours=1)
+        with django_capture_on_commit_callbacks(execute=True):
+            alert = Alert.objects.create(
+                alert_id='ALERT-RESPONSE-TIME', title='Test alert', description='Test alert',
+                severity='HIGH', source_system='TestSIEM', detected_at=detected_at,
+                time_to_resolve=timedelta(seconds=1000),
+            )
+        ResponseTimes().flush()
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            alert.time_to_resolve = timedelta(seconds=1010)
+            alert.save()
+        ResponseTimes().flush()
+        
+        row = ResponseTimeHistogram.objects.get(metric='time_to_resolve')
+        assert (row.count, row.total_seconds) == (1, pytest.approx(1010))
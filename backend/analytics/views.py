@@ -1,67 +1,171 @@
 from rest_framework import viewsets, views
+from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Count, Avg
-from analytics.models import DailyMetrics
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from datetime import date, timedelta
+from analytics.models import AlertHourRollup, DailyMetrics, TacticFrequency, TechniqueFrequency
 from analytics.serializers import DailyMetricsSerializer
-from alerts.models import Alert
-from incidents.models import Incident
-from playbooks.models import PlaybookExecution
+from analytics.cardinality import DistinctCounts
+from analytics.dashboard import DashboardSnapshot
+from analytics.enrichment import EnrichmentCache
+from analytics.frequency import FrequencyViews
+from analytics.heavy_hitters import HeavyHitters
+from analytics.response_times import GROUP_FIELDS, METRICS, ResponseTimes
+from analytics.timeseries import FILTER_FIELDS, alert_timeseries, parse_interval
+
+
+def query_datetime(value):
+    """An ISO datetime query parameter, None if absent, raising ValueError if malformed"""
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"Invalid datetime '{value}'")
+    return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
 
 
 class DailyMetricsViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = DailyMetrics.objects.all()
     serializer_class = DailyMetricsSerializer
     ordering = ['-date']
+    
+    @action(detail=False, methods=['get'])
+    def timeseries(self, request):
+        """
+        Bucketed alert counts from the rollups, as columnar arrays
+        
+        ?metric=alerts&group_by=severity&interval=5m&from=<ISO>&to=<ISO>&max_points=500,
+        optionally filtered by severity, status or source_system.
+        """
+        params = request.query_params
+        if params.get('metric', 'alerts') != 'alerts':
+            return Response({'error': "Unknown metric, expected 'alerts'"}, status=400)
+        
+        try:
+            end = query_datetime(params.get('to')) or timezone.now()
+            start = query_datetime(params.get('from')) or end - timedelta(days=1)
+            return Response(alert_timeseries(
+                start, end,
+                interval=parse_interval(params.get('interval', '1h')),
+                group_by=params.get('group_by') or None,
+                filters={field: params[field] for field in FILTER_FIELDS if field in params},
+                max_points=int(params['max_points']) if params.get('max_points') else None,
+            ))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+    
+    @action(detail=False, methods=['get'], url_path='response-times')
+    def response_times(self, request):
+        """
+        Count, mean and percentiles of time to detect, respond and resolve
+        
+        ?from=<YYYY-MM-DD>&to=<YYYY-MM-DD>&metrics=time_to_resolve&quantiles=0.5,0.9,0.99
+        &group_by=severity, optionally filtered by severity or source_system. Days
+        are those the alerts were detected on; the default is the last 7.
+        """
+        params = request.query_params
+        try:
+            end = date.fromisoformat(params['to']) if params.get('to') else timezone.localdate()
+            start = date.fromisoformat(params['from']) if params.get('from') else end - timedelta(days=6)
+            quantiles = (0.5, 0.9, 0.99)
+            if params.get('quantiles'):
+                quantiles = [float(q) for q in params['quantiles'].split(',')]
+            return Response(ResponseTimes().summary(
+                start, end,
+                metrics=params['metrics'].split(',') if params.get('metrics') else METRICS,
+                quantiles=quantiles,
+                group_by=params.get('group_by') or None,
+                filters={field: params[field] for field in GROUP_FIELDS if field in params},
+            ))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
 
 
 class DashboardStatsView(views.APIView):
-    """Real-time dashboard statistics"""
+    """Real-time dashboard statistics, from the last snapshot (see analytics.dashboard)"""
     
     def get(self, request):
-        # Alert statistics
-        total_alerts = Alert.objects.count()
-        new_alerts = Alert.objects.filter(status='NEW').count()
-        critical_alerts = Alert.objects.filter(severity='CRITICAL').count()
-        
-        alerts_by_severity = Alert.objects.values('severity').annotate(
-            count=Count('id')
-        )
-        
-        # Incident statistics
-        total_incidents = Incident.objects.count()
-        open_incidents = Incident.objects.filter(status='OPEN').count()
-        
-        # Playbook statistics
-        total_executions = PlaybookExecution.objects.count()
-        successful_executions = PlaybookExecution.objects.filter(status='SUCCESS').count()
-        
-        # Top MITRE techniques
-        from frameworks.models import MitreTechnique
-        top_techniques = []
-        for technique in MitreTechnique.objects.annotate(
-            alert_count=Count('alerts')
-        ).order_by('-alert_count')[:5]:
-            top_techniques.append({
-                'technique_id': technique.technique_id,
-                'name': technique.name,
-                'count': technique.alert_count
-            })
+        return Response(DashboardSnapshot().get())
+
+
+class EnrichmentCacheStatsView(views.APIView):
+    """Enrichment cache hit ratio per provider"""
+    
+    def get(self, request):
+        return Response(EnrichmentCache().stats())
+
+
+class HeavyHittersView(views.APIView):
+    """Top values of an alert field in one hour or day, with Space-Saving error bounds"""
+    
+    def get(self, request):
+        params = request.query_params
+        try:
+            at = query_datetime(params.get('at')) or timezone.now()
+            return Response(HeavyHitters().top(
+                params.get('field', 'source_ip'),
+                params.get('period', 'hour'),
+                at,
+                k=int(params.get('k', 10)),
+            ))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+
+
+class DistinctCountsView(views.APIView):
+    """Approximate distinct IPs, users and assets over a range, from HyperLogLogs"""
+    
+    def get(self, request):
+        params = request.query_params
+        try:
+            end = query_datetime(params.get('to')) or timezone.now()
+            start = query_datetime(params.get('from')) or end - timedelta(days=1)
+            fields = params['fields'].split(',') if params.get('fields') else DistinctCounts.FIELDS
+            
+            # ?by_source_system=true breaks the counts down by every system seen in the range
+            if params.get('source_system'):
+                source_systems = [params['source_system']]
+            elif params.get('by_source_system') in ('1', 'true'):
+                source_systems = list(
+                    AlertHourRollup.objects.filter(bucket__gte=start, bucket__lt=end)
+                    .values_list('source_system', flat=True).distinct().order_by('source_system')
+                )
+            else:
+                source_systems = [None]
+            
+            counts = DistinctCounts().count(start, end, fields, source_systems)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
         
-        return Response({
-            'alerts': {
-                'total': total_alerts,
-                'new': new_alerts,
-                'critical': critical_alerts,
-                'by_severity': list(alerts_by_severity),
-            },
-            'incidents': {
-                'total': total_incidents,
-                'open': open_incidents,
-            },
-            'playbooks': {
-                'total_executions': total_executions,
-                'successful': successful_executions,
-                'success_rate': (successful_executions / total_executions * 100) if total_executions > 0 else 0,
-            },
-            'top_mitre_techniques': top_techniques,
-        })
\ No newline at end of file
+        response = {
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'standard_error': DistinctCounts.STANDARD_ERROR,
+        }
+        if source_systems == [None]:
+            response['counts'] = counts[None]
+        else:
+            response['by_source_system'] = counts
+        return Response(response)
+
+
+class TechniqueFrequencyView(views.APIView):
+    """Most frequent MITRE techniques over 24h, 7d or 30d, from the refreshed frequency view"""
+    model = TechniqueFrequency
+    
+    def get(self, request):
+        params = request.query_params
+        try:
+            return Response(FrequencyViews().top(
+                self.model,
+                params.get('window', '24h'),
+                limit=int(params.get('limit', 10)),
+            ))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+
+
+class TacticFrequencyView(TechniqueFrequencyView):
+    """Most frequent MITRE tactics over 24h, 7d or 30d, from the refreshed frequency view"""
+    model = TacticFrequency
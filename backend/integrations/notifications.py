@@ -0,0 +1,223 @@
+import html
+import json
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Dict, List, Tuple
+from django.conf import settings
+from django_redis import get_redis_connection
+
+
+class SMTPConnectionPool:
+    """
+    Persistent SMTP sessions shared by every notification sent from a worker
+    
+    Connections are opened (STARTTLS + login) once and reused until the server
+    drops them or they sit idle longer than SMTP_MAX_IDLE_SECONDS, instead of
+    paying a full handshake per message.
+    """
+    
+    def __init__(self, size: int = None, max_idle: int = None):
+        self.size = size or settings.SMTP_POOL_SIZE
+        self.max_idle = max_idle if max_idle is not None else settings.SMTP_MAX_IDLE_SECONDS
+        self._idle = []
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+    
+    @contextmanager
+    def connection(self):
+        """Check out a live connection, returning it to the pool afterwards"""
+        with self._slots:
+            server = self._checkout()
+            try:
+                yield server
+            except BaseException:
+                # Whatever went wrong, the session may be mid-transaction: don't reuse it
+                self._discard(server)
+                raise
+            else:
+                with self._lock:
+                    self._idle.append((server, time.monotonic()))
+    
+    def send(self, msg: MIMEMultipart):
+        """Send a message, reconnecting once if the pooled session went stale"""
+        try:
+            with self.connection() as server:
+                server.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            with self.connection() as server:
+                server.send_message(msg)
+    
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server, _ in idle:
+            self._discard(server)
+    
+    def _checkout(self) -> smtplib.SMTP:
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                server, idle_since = self._idle.pop()
+            
+            if time.monotonic() - idle_since > self.max_idle or not self._alive(server):
+                self._discard(server)
+                continue
+            return server
+        
+        return self._connect()
+    
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(settings.EMAIL_HOST, settings.EMAIL_PORT, timeout=settings.EMAIL_TIMEOUT)
+        if settings.EMAIL_USE_TLS:
+            server.starttls()
+        if settings.EMAIL_HOST_USER and settings.EMAIL_HOST_PASSWORD:
+            server.login(settings.EMAIL_HOST_USER, settings.EMAIL_HOST_PASSWORD)
+        return server
+    
+    @staticmethod
+    def _alive(server: smtplib.SMTP) -> bool:
+        try:
+            return server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+    
+    @staticmethod
+    def _discard(server: smtplib.SMTP):
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+
+# One pool per worker process, kept open across tasks
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_smtp_pool() -> SMTPConnectionPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SMTPConnectionPool()
+        return _pool
+
+
+class EmailNotifier:
+    """Renders alert notifications and sends them over the worker's SMTP pool"""
+    
+    def __init__(self, pool: SMTPConnectionPool = None):
+        self.pool = pool or get_smtp_pool()
+    
+    def send_alert(self, recipient: str, alert_data: Dict):
+        subject = f"[{alert_data['severity']}] SOC Alert: {alert_data['title']}"
+        self._send(recipient, subject, self._render([alert_data]))
+    
+    def send_digest(self, recipient: str, severity: str, alerts: List[Dict]):
+        """One message covering every alert collected for this recipient and severity"""
+        if len(alerts) == 1:
+            return self.send_alert(recipient, alerts[0])
+        subject = f"[{severity}] SOC Alert digest: {len(alerts)} alerts"
+        self._send(recipient, subject, self._render(alerts))
+    
+    def _send(self, recipient: str, subject: str, html: str):
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = subject
+        msg['From'] = settings.DEFAULT_FROM_EMAIL
+        msg['To'] = recipient
+        msg.attach(MIMEText(html, 'html'))
+        self.pool.send(msg)
+    
+    @staticmethod
+    def _render(alerts: List[Dict]) -> str:
+        sections = []
+        for alert_data in alerts:
+            # Alert fields come from ingested events and must not be rendered as markup
+            field = {
+                name: html.escape(str(alert_data.get(name) or 'N/A'))
+                for name in ('alert_id', 'severity', 'title', 'description', 'source_ip')
+            }
+            detected_at = alert_data.get('detected_at') or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            sections.append(f"""
+            <h2>Security Alert Detected</h2>
+            <p><strong>Alert ID:</strong> {field['alert_id']}</p>
+            <p><strong>Severity:</strong> <span style="color: red;">{field['severity']}</span></p>
+            <p><strong>Title:</strong> {field['title']}</p>
+            <p><strong>Description:</strong> {field['description']}</p>
+            <p><strong>Source IP:</strong> {field['source_ip']}</p>
+            <p><strong>Detected At:</strong> {html.escape(detected_at)}</p>
+            """)
+        
+        return f"""
+        <html>
+        <body>
+            {'<hr>'.join(sections)}
+            <hr>
+            <p>Please investigate {'these alerts' if len(alerts) > 1 else 'this alert'} in the SOC Platform.</p>
+        </body>
+        </html>
+        """
+
+
+class NotificationDigest:
+    """Collects notifications per recipient and severity so each window sends one message"""
+    
+    QUEUE_KEY = 'notification-digest:{recipient}:{severity}'
+    WINDOW_KEY = 'notification-digest-window:{recipient}:{severity}'
+    # Sorted set of [recipient, severity] -> when its open window is due to be flushed
+    DUE_KEY = 'notification-digest:due'
+    
+    # How late a window may be before sweep() flushes it itself
+    SWEEP_GRACE_SECONDS = 60
+    
+    def __init__(self):
+        self.redis = get_redis_connection('default')
+    
+    def enqueue(self, recipient: str, alert_data: Dict) -> bool:
+        """Add an alert to the open digest window, returns True if it opened a new window"""
+        severity = alert_data['severity']
+        self.redis.rpush(
+            self.QUEUE_KEY.format(recipient=recipient, severity=severity),
+            json.dumps(alert_data)
+        )
+        
+        # The window key expires on its own in case the flush task is lost
+        window = settings.NOTIFICATION_DIGEST_WINDOW
+        opened = bool(self.redis.set(
+            self.WINDOW_KEY.format(recipient=recipient, severity=severity),
+            1,
+            nx=True,
+            ex=max(window * 3, 60)
+        ))
+        if opened:
+            self.redis.zadd(self.DUE_KEY, {json.dumps([recipient, severity]): time.time() + window}, nx=True)
+        return opened
+    
+    def overdue(self) -> List[Tuple[str, str]]:
+        """
+        (recipient, severity) windows past due by SWEEP_GRACE_SECONDS, which
+        means their flush task was lost (worker restart, broker loss). Their
+        due time moves on by the grace period, so they are handed out once
+        per sweep.
+        """
+        now = time.time()
+        windows = self.redis.zrangebyscore(self.DUE_KEY, '-inf', now - self.SWEEP_GRACE_SECONDS)
+        if windows:
+            self.redis.zadd(self.DUE_KEY, {window: now for window in windows}, xx=True)
+        return [tuple(json.loads(window)) for window in windows]
+    
+    def drain(self, recipient: str, severity: str) -> List[Dict]:
+        """Atomically take every queued alert and close the window"""
+        pipe = self.redis.pipeline()
+        pipe.lrange(self.QUEUE_KEY.format(recipient=recipient, severity=severity), 0, -1)
+        pipe.delete(self.QUEUE_KEY.format(recipient=recipient, severity=severity))
+        pipe.delete(self.WINDOW_KEY.format(recipient=recipient, severity=severity))
+        pipe.zrem(self.DUE_KEY, json.dumps([recipient, severity]))
+        alerts, _, _, _ = pipe.execute()
+        
+        return [json.loads(alert_data) for alert_data in alerts]
@@ -0,0 +1,198 @@
+import asyncio
+import json
+import time
+from typing import Dict, List, Optional
+import httpx
+from django.conf import settings
+from django_redis import get_redis_connection
+
+
+SEVERITY_EMOJI = {
+    'CRITICAL': ':red_circle:',
+    'HIGH': ':large_orange_circle:',
+    'MEDIUM': ':large_yellow_circle:',
+    'LOW': ':white_circle:',
+}
+
+
+def escape(text) -> str:
+    """Escape the characters mrkdwn uses for links and mentions, so alert text can't ping <!channel>"""
+    return str(text).replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+class SlackOutbox:
+    """
+    Durable Redis queue of Slack notifications
+    
+    Alerts are appended to QUEUE_KEY as they arrive. Each window they are
+    grouped into messages and moved to OUTBOX_KEY, a sorted set scored by
+    when the message is next due, where they stay until Slack accepts them.
+    A worker that dies mid-delivery leaves its messages in the outbox for
+    the next flush.
+    """
+    
+    QUEUE_KEY = 'slack-queue'
+    WINDOW_KEY = 'slack-window'
+    OUTBOX_KEY = 'slack-outbox'
+    LOCK_KEY = 'slack-deliver-lock'
+    
+    def __init__(self):
+        self.redis = get_redis_connection('default')
+    
+    def enqueue(self, alert_data: Dict) -> bool:
+        """Add an alert to the open window, returns True if it opened a new window"""
+        self.redis.rpush(self.QUEUE_KEY, json.dumps(alert_data))
+        
+        # The window key expires on its own in case the flush task is lost
+        window = settings.SLACK_NOTIFICATION_WINDOW
+        return bool(self.redis.set(self.WINDOW_KEY, 1, nx=True, ex=max(window * 3, 60)))
+    
+    def group(self) -> int:
+        """Move queued alerts into the outbox as messages, returns how many were created"""
+        queued = self.redis.lrange(self.QUEUE_KEY, 0, -1)
+        if not queued:
+            return 0
+        
+        size = settings.SLACK_MAX_ALERTS_PER_MESSAGE
+        alerts = [json.loads(alert_data) for alert_data in queued]
+        messages = [alerts[start:start + size] for start in range(0, len(alerts), size)]
+        
+        # Trim only what was read; alerts pushed meanwhile stay queued
+        now = time.time()
+        pipe = self.redis.pipeline()
+        for alerts in messages:
+            pipe.zadd(self.OUTBOX_KEY, {json.dumps({'alerts': alerts, 'attempts': 0}): now})
+        pipe.ltrim(self.QUEUE_KEY, len(queued), -1)
+        pipe.delete(self.WINDOW_KEY)
+        pipe.execute()
+        
+        return len(messages)
+    
+    def due(self, limit: int = None) -> List[str]:
+        """Messages due now, longest due first, at most `limit` of them"""
+        entries = self.redis.zrangebyscore(
+            self.OUTBOX_KEY, '-inf', time.time(), start=0 if limit else None, num=limit
+        )
+        return [entry.decode() for entry in entries]
+    
+    def due_count(self) -> int:
+        return self.redis.zcount(self.OUTBOX_KEY, '-inf', time.time())
+    
+    def done(self, entry: str):
+        self.redis.zrem(self.OUTBOX_KEY, entry)
+    
+    def reschedule(self, entry: str, delay: float, count_attempt: bool = True) -> bool:
+        """Push a message back for later, returns False once it has used up its attempts"""
+        message = json.loads(entry)
+        if count_attempt:
+            message['attempts'] += 1
+        
+        pipe = self.redis.pipeline()
+        pipe.zrem(self.OUTBOX_KEY, entry)
+        if message['attempts'] < settings.SLACK_MAX_ATTEMPTS:
+            pipe.zadd(self.OUTBOX_KEY, {json.dumps(message): time.time() + delay})
+        pipe.execute()
+        
+        return message['attempts'] < settings.SLACK_MAX_ATTEMPTS
+    
+    def acquire(self, ttl: int) -> bool:
+        """Only one worker delivers at a time so messages are not posted twice"""
+        return bool(self.redis.set(self.LOCK_KEY, 1, nx=True, ex=ttl))
+    
+    def release(self):
+        self.redis.delete(self.LOCK_KEY)
+    
+    def stats(self) -> Dict:
+        return {
+            'queued': self.redis.llen(self.QUEUE_KEY),
+            'outbox': self.redis.zcard(self.OUTBOX_KEY),
+        }
+
+
+class SlackNotifier:
+    """Posts outbox messages to the Slack webhook over one keep-alive async client"""
+    
+    def __init__(self, outbox: SlackOutbox = None, webhook_url: str = None):
+        self.outbox = outbox or SlackOutbox()
+        self.webhook_url = webhook_url or settings.SLACK_WEBHOOK_URL
+        self.paused_until = 0.0
+    
+    def deliver(self, limit: int = None) -> Dict:
+        """Post due messages (at most `limit`), returns counts of sent, retried and dropped messages"""
+        return asyncio.run(self._deliver(self.outbox.due(limit)))
+    
+    async def _deliver(self, entries: List[str]) -> Dict:
+        counts = {'sent': 0, 'retried': 0, 'dropped': 0}
+        slots = asyncio.Semaphore(settings.SLACK_CONCURRENCY)
+        
+        async with httpx.AsyncClient(timeout=settings.SLACK_TIMEOUT) as client:
+            async def post(entry):
+                async with slots:
+                    counts[await self._post(client, entry)] += 1
+            
+            await asyncio.gather(*(post(entry) for entry in entries))
+        
+        return counts
+    
+    async def _post(self, client: httpx.AsyncClient, entry: str) -> str:
+        # A 429 pauses the whole webhook, not just the message that hit it
+        wait = self.paused_until - time.time()
+        if wait > 0:
+            self.outbox.reschedule(entry, wait, count_attempt=False)
+            return 'retried'
+        
+        message = json.loads(entry)
+        try:
+            response = await client.post(self.webhook_url, json=self.render(message['alerts']))
+        except httpx.HTTPError:
+            response = None
+        
+        if response is not None and response.status_code == 200:
+            self.outbox.done(entry)
+            return 'sent'
+        
+        if response is not None and response.status_code == 429:
+            retry_after = self._retry_after(response) or settings.SLACK_RETRY_BACKOFF
+            self.paused_until = max(self.paused_until, time.time() + retry_after)
+            self.outbox.reschedule(entry, retry_after, count_attempt=False)
+            return 'retried'
+        
+        # Network errors and 5xx back off exponentially; other 4xx won't succeed on retry
+        if response is None or response.status_code >= 500:
+            delay = settings.SLACK_RETRY_BACKOFF * 2 ** message['attempts']
+            return 'retried' if self.outbox.reschedule(entry, delay) else 'dropped'
+        
+        self.outbox.done(entry)
+        return 'dropped'
+    
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> Optional[float]:
+        try:
+            return float(response.headers.get('Retry-After', ''))
+        except ValueError:
+            return None
+    
+    @staticmethod
+    def render(alerts: List[Dict]) -> Dict:
+        """One Block Kit message for a group of alerts"""
+        title = (
+            f"[{alerts[0]['severity']}] SOC Alert: {alerts[0]['title']}" if len(alerts) == 1
+            else f"{len(alerts)} new SOC alerts"
+        )
+        # The header is plain text; the fallback text and sections are mrkdwn
+        blocks = [{'type': 'header', 'text': {'type': 'plain_text', 'text': title[:150]}}]
+        
+        for alert_data in alerts:
+            emoji = SEVERITY_EMOJI.get(alert_data['severity'], ':white_circle:')
+            blocks.append({
+                'type': 'section',
+                'text': {
+                    'type': 'mrkdwn',
+                    'text': (
+                        f"{emoji} *{escape(alert_data['severity'])}* {escape(alert_data['title'])}\n"
+                        f"`{escape(alert_data['alert_id'])}` · source {escape(alert_data.get('source_ip') or 'N/A')}"
+                    )[:3000],
+                },
+            })
+        
+        return {'text': escape(title), 'blocks': blocks}
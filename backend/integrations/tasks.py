@@ -0,0 +1,106 @@
+from celery import shared_task
+from alerts.models import Alert
+from integrations.notifications import EmailNotifier, NotificationDigest
+from integrations.slack import SlackNotifier, SlackOutbox
+from playbooks.executor import build_alert_data
+from django.conf import settings
+
+
+@shared_task
+def send_alert_notification(alert_id):
+    """Email an alert to the notification recipients, directly or through a digest"""
+    try:
+        alert = Alert.objects.get(id=alert_id)
+    except Alert.DoesNotExist:
+        return f"Alert {alert_id} not found"
+    
+    alert_data = build_alert_data(alert)
+    alert_data['detected_at'] = alert.detected_at.strftime('%Y-%m-%d %H:%M:%S')
+    
+    notifier = EmailNotifier()
+    digest = NotificationDigest()
+    digested = 0
+    
+    for recipient in settings.NOTIFICATION_RECIPIENTS:
+        # Severities that can't wait for a window are sent straight away
+        if (
+            not settings.NOTIFICATION_DIGEST_WINDOW
+            or alert.severity in settings.NOTIFICATION_IMMEDIATE_SEVERITIES
+        ):
+            notifier.send_alert(recipient, alert_data)
+            continue
+        
+        digested += 1
+        if digest.enqueue(recipient, alert_data):
+            flush_notification_digest.apply_async(
+                (recipient, alert.severity),
+                countdown=settings.NOTIFICATION_DIGEST_WINDOW
+            )
+    
+    return f"Alert {alert.alert_id} notified {len(settings.NOTIFICATION_RECIPIENTS)} recipients ({digested} by digest)"
+
+
+@shared_task
+def flush_notification_digest(recipient, severity):
+    """Send one message for every alert collected in a recipient's digest window"""
+    alerts = NotificationDigest().drain(recipient, severity)
+    
+    if not alerts:
+        return f"No alerts queued for {recipient} ({severity})"
+    
+    EmailNotifier().send_digest(recipient, severity, alerts)
+    
+    return f"Digest of {len(alerts)} {severity} alerts sent to {recipient}"
+
+
+@shared_task
+def sweep_notification_digests():
+    """Flush digest windows whose flush task never ran, so their alerts are still emailed"""
+    windows = NotificationDigest().overdue()
+    for recipient, severity in windows:
+        flush_notification_digest.delay(recipient, severity)
+    return f"Flushed {len(windows)} overdue notification digests"
+
+
+@shared_task
+def send_slack_notification(alert_id):
+    """Queue an alert for the next grouped Slack message"""
+    try:
+        alert = Alert.objects.get(id=alert_id)
+    except Alert.DoesNotExist:
+        return f"Alert {alert_id} not found"
+    
+    if SlackOutbox().enqueue(build_alert_data(alert)):
+        flush_slack_notifications.apply_async(countdown=settings.SLACK_NOTIFICATION_WINDOW)
+    
+    return f"Alert {alert.alert_id} queued for Slack"
+
+
+@shared_task
+def flush_slack_notifications():
+    """Group queued alerts into messages and post whatever in the outbox is due"""
+    outbox = SlackOutbox()
+    limit = settings.SLACK_MAX_MESSAGES_PER_FLUSH
+    
+    # The lock outlasts the longest run this cap allows: every post hitting its
+    # connect, write and read timeouts, SLACK_CONCURRENCY posts at a time.
+    # Retry-After never waits in the run, those messages are rescheduled instead
+    rounds = -(-limit // settings.SLACK_CONCURRENCY)
+    if not outbox.acquire(ttl=rounds * 3 * settings.SLACK_TIMEOUT + 60):
+        return "Slack delivery already running"
+    
+    try:
+        grouped = outbox.group()
+        counts = SlackNotifier(outbox).deliver(limit)
+        backlog = outbox.due_count()
+    finally:
+        outbox.release()
+    
+    # Whatever is still due goes out in the next run, under a fresh lock
+    if backlog:
+        flush_slack_notifications.delay()
+    
+    return (
+        f"Grouped {grouped} Slack messages; sent {counts['sent']}, "
+        f"retrying {counts['retried']}, dropped {counts['dropped']}"
+    )
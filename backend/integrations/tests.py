@@ -1,3 +1,257 @@
-from django.test import TestCase
+import json
+import socket
+import threading
+import time
+from email import message_from_bytes
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-# Create your tests here.
+import pytest
+from aiosmtpd.controller import Controller
+from django.utils import timezone
+
+from alerts.models import Alert
+from integrations import notifications
+from integrations.notifications import EmailNotifier, NotificationDigest, SMTPConnectionPool
+from integrations.slack import SlackNotifier, SlackOutbox
+from integrations.tasks import (
+    flush_notification_digest, flush_slack_notifications, send_alert_notification, sweep_notification_digests
+)
+
+
+class SMTPSink:
+    """aiosmtpd handler that keeps every message it receives and counts SMTP sessions and QUITs"""
+    
+    def __init__(self):
+        self.messages = []
+        self.sessions = set()
+        self.quits = 0
+    
+    async def handle_QUIT(self, server, session, envelope):
+        self.quits += 1
+        return '221 Bye'
+    
+    async def handle_DATA(self, server, session, envelope):
+        self.sessions.add(id(session))
+        self.messages.append(message_from_bytes(envelope.original_content))
+        return '250 Message accepted for delivery'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_sink(settings, monkeypatch):
+    """Local SMTP server the notifications are sent to, with a fresh connection pool"""
+    sink = SMTPSink()
+    controller = Controller(sink, hostname='127.0.0.1', port=free_port())
+    controller.start()
+    
+    settings.EMAIL_HOST = '127.0.0.1'
+    settings.EMAIL_PORT = controller.port
+    settings.EMAIL_USE_TLS = False
+    settings.EMAIL_HOST_USER = ''
+    settings.EMAIL_HOST_PASSWORD = ''
+    monkeypatch.setattr(notifications, '_pool', None)
+    
+    yield sink
+    
+    if notifications._pool is not None:
+        notifications._pool.close()
+    controller.stop()
+
+
+@pytest.fixture
+def digest_settings(settings):
+    settings.NOTIFICATION_RECIPIENTS = ['soc@example.com']
+    settings.NOTIFICATION_DIGEST_WINDOW = 60
+    settings.NOTIFICATION_IMMEDIATE_SEVERITIES = ['CRITICAL']
+    redis = NotificationDigest().redis
+    for key in redis.scan_iter('notification-digest*'):
+        redis.delete(key)
+    return settings
+
+
+def make_alert(index, severity='MEDIUM'):
+    return Alert.objects.create(
+        alert_id=f'ALERT-DIGEST-{index}',
+        title=f'Test alert {index}',
+        description='Test alert',
+        severity=severity,
+        source_system='TestSIEM',
+        source_ip='192.168.1.100',
+        detected_at=timezone.now(),
+    )
+
+
+def alert_data(index, severity='MEDIUM'):
+    return {
+        'alert_id': f'ALERT-{index}',
+        'title': f'Test alert {index}',
+        'description': 'Test alert',
+        'severity': severity,
+        'source_ip': '192.168.1.100',
+    }
+
+
+@pytest.mark.django_db
+class TestEmailDigest:
+    """Test alert emails are grouped into digests and sent over pooled sessions"""
+    
+    def test_alerts_in_a_window_are_sent_as_one_digest(self, smtp_sink, digest_settings, monkeypatch):
+        """Test every alert queued in the window goes out in one message"""
+        scheduled = []
+        monkeypatch.setattr(
+            flush_notification_digest, 'apply_async',
+            lambda args, countdown: scheduled.append((args, countdown))
+        )
+        
+        alerts = [make_alert(index) for index in range(3)]
+        for alert in alerts:
+            send_alert_notification(alert.id)
+        
+        # Only the first alert opens the window and schedules its flush
+        assert scheduled == [(('soc@example.com', 'MEDIUM'), 60)]
+        assert smtp_sink.messages == []
+        
+        flush_notification_digest('soc@example.com', 'MEDIUM')
+        
+        assert len(smtp_sink.messages) == 1
+        message = smtp_sink.messages[0]
+        assert message['Subject'] == '[MEDIUM] SOC Alert digest: 3 alerts'
+        assert message['To'] == 'soc@example.com'
+        body = message.get_payload()[0].get_payload(decode=True).decode()
+        assert all(alert.alert_id in body for alert in alerts)
+    
+    def test_immediate_severities_skip_the_digest(self, smtp_sink, digest_settings, monkeypatch):
+        """Test critical alerts are emailed straight away"""
+        monkeypatch.setattr(flush_notification_digest, 'apply_async', pytest.fail)
+        
+        alert = make_alert(0, severity='CRITICAL')
+        send_alert_notification(alert.id)
+        
+        assert len(smtp_sink.messages) == 1
+        assert smtp_sink.messages[0]['Subject'] == f'[CRITICAL] SOC Alert: {alert.title}'
+    
+    def test_empty_window_sends_nothing(self, smtp_sink, digest_settings):
+        """Test flushing a window that was already drained sends no email"""
+        flush_notification_digest('soc@example.com', 'MEDIUM')
+        assert smtp_sink.messages == []
+    
+    def test_single_alert_digest_is_a_plain_alert(self, smtp_sink):
+        """Test a digest of one alert reads like the alert itself"""
+        EmailNotifier(pool=SMTPConnectionPool(size=1)).send_digest('soc@example.com', 'LOW', [alert_data(0, 'LOW')])
+        assert smtp_sink.messages[0]['Subject'] == '[LOW] SOC Alert: Test alert 0'
+    
+    def test_messages_share_one_smtp_session(self, smtp_sink):
+        """Test the pool reuses its connection instead of reconnecting per message"""
+        pool = SMTPConnectionPool(size=1)
+        notifier = EmailNotifier(pool=pool)
+        for index in range(3):
+            notifier.send_alert('soc@example.com', alert_data(index))
+        pool.close()
+        
+        assert len(smtp_sink.messages) == 3
+        assert len(smtp_sink.sessions) == 1
+    
+    def test_failed_session_is_closed(self, smtp_sink):
+        """Test a session used when any error was raised is quit, not left open or reused"""
+        pool = SMTPConnectionPool(size=1)
+        
+        with pytest.raises(UnicodeEncodeError):
+            with pool.connection() as server:
+                server.sendmail('soc@example.com', ['soc@example.com'], 'Subject: caf\u00e9')
+        
+        assert smtp_sink.quits == 1
+        assert pool._idle == []
+        EmailNotifier(pool=pool).send_alert('soc@example.com', alert_data(0))
+        assert len(smtp_sink.messages) == 1
+    
+    def test_alert_fields_are_escaped(self, smtp_sink):
+        """Test alert text is shown as text, not rendered as markup"""
+        data = dict(alert_data(0), title='<a href="https://example.com">Reset password</a> & more')
+        EmailNotifier(pool=SMTPConnectionPool(size=1)).send_alert('soc@example.com', data)
+        
+        body = smtp_sink.messages[0].get_payload()[0].get_payload(decode=True).decode()
+        assert '&lt;a href=&quot;https://example.com&quot;&gt;Reset password&lt;/a&gt; &amp; more' in body
+        assert '<a href' not in body
+    
+    def test_sweep_flushes_overdue_digests_once(self, digest_settings, monkeypatch):
+        """Test the sweep re-arms a digest past its grace period, and only once per grace period"""
+        digest = NotificationDigest()
+        digest.enqueue('soc@example.com', alert_data(0))
+        digest.enqueue('soc@example.com', alert_data(1, 'HIGH'))
+        digest.redis.zadd(digest.DUE_KEY, {
+            '["soc@example.com", "MEDIUM"]': time.time() - digest.SWEEP_GRACE_SECONDS - 1
+        })
+        flushed = []
+        monkeypatch.setattr(flush_notification_digest, 'delay', lambda *args: flushed.append(args))
+        
+        sweep_notification_digests()
+        sweep_notification_digests()
+        
+        assert flushed == [('soc@example.com', 'MEDIUM')]
+
+
+@pytest.fixture
+def slack_webhook(settings):
+    """Local stand-in for the Slack webhook that keeps the messages posted to it"""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        messages = []
+        
+        def do_POST(self):
+            Handler.messages.append(json.loads(self.rfile.read(int(self.headers['Content-Length']))))
+            self.send_response(200)
+            self.send_header('Content-Length', '2')
+            self.end_headers()
+            self.wfile.write(b'ok')
+        
+        def log_message(self, *args):
+            pass
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    settings.SLACK_WEBHOOK_URL = f"http://127.0.0.1:{server.server_port}/"
+    outbox = SlackOutbox()
+    outbox.redis.delete(outbox.QUEUE_KEY, outbox.WINDOW_KEY, outbox.OUTBOX_KEY, outbox.LOCK_KEY)
+    yield Handler.messages
+    server.shutdown()
+    server.server_close()
+
+
+class TestSlackNotifications:
+    """Test Slack messages are delivered from the outbox and rendered safely"""
+    
+    def test_flush_delivers_a_bounded_batch(self, slack_webhook, settings, monkeypatch):
+        """Test one flush posts at most SLACK_MAX_MESSAGES_PER_FLUSH messages and schedules the rest"""
+        settings.SLACK_MAX_ALERTS_PER_MESSAGE = 1
+        settings.SLACK_MAX_MESSAGES_PER_FLUSH = 2
+        outbox = SlackOutbox()
+        for index in range(3):
+            outbox.enqueue(alert_data(index))
+        scheduled = []
+        monkeypatch.setattr(flush_slack_notifications, 'delay', lambda: scheduled.append(True))
+        
+        flush_slack_notifications()
+        
+        assert len(slack_webhook) == 2
+        assert (outbox.due_count(), scheduled) == (1, [True])
+        
+        monkeypatch.setattr(flush_slack_notifications, 'delay', pytest.fail)
+        flush_slack_notifications()
+        assert len(slack_webhook) == 3
+        assert outbox.due_count() == 0
+    
+    def test_alert_text_cannot_mention_or_link(self):
+        """Test mrkdwn control characters in alert fields are escaped"""
+        title = '<!channel> see <https://example.com|this> & that'
+        message = SlackNotifier.render([dict(alert_data(0), title=title)])
+        
+        section = message['blocks'][1]['text']['text']
+        assert '&lt;!channel&gt; see &lt;https://example.com|this&gt; &amp; that' in section
+        assert '<' not in section and '<' not in message['text']
+        # The header is plain text, which Slack shows as is
+        assert message['blocks'][0]['text']['text'] == f'[MEDIUM] SOC Alert: {title}'
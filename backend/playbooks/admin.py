@@ -3,13 +3,16 @@ from .models import Playbook, PlaybookExecution
 
 @admin.register(Playbook)
 class PlaybookAdmin(admin.ModelAdmin):
-    list_display = ['name', 'playbook_type', 'enabled', 'auto_execute', 'execution_count', 'success_rate']
-    list_filter = ['playbook_type', 'enabled', 'auto_execute']
+    list_display = [
+        'name', 'playbook_type', 'enabled', 'auto_execute', 'cacheable',
+        'batchable', 'execution_count', 'cache_hit_count', 'success_rate'
+    ]
+    list_filter = ['playbook_type', 'enabled', 'auto_execute', 'cacheable', 'batchable']
     search_fields = ['name', 'description']
     filter_horizontal = ['mitre_techniques', 'owasp_categories', 'stride_categories', 'kill_chain_stages']
 
 @admin.register(PlaybookExecution)
 class PlaybookExecutionAdmin(admin.ModelAdmin):
-    list_display = ['playbook', 'alert', 'status', 'started_at', 'completed_at']
+    list_display = ['playbook', 'alert', 'status', 'started_at', 'completed_at', 'peak_rss_kb', 'cpu_time_seconds']
     list_filter = ['status', 'playbook']
     date_hierarchy = 'created_at'
\ No newline at end of file
@@ -0,0 +1,65 @@
+import time
+from typing import List
+from django_redis import get_redis_connection
+from playbooks.models import Playbook, PlaybookExecution
+
+
+class PlaybookBatcher:
+    """Collects executions of batchable playbooks so one script run can serve many alerts"""
+    
+    QUEUE_KEY = 'playbook-batch:{playbook_id}'
+    WINDOW_KEY = 'playbook-batch-window:{playbook_id}'
+    # Sorted set of playbook id -> when its open window is due to be flushed
+    DUE_KEY = 'playbook-batch:due'
+    
+    # How late a window may be before sweep() flushes it itself
+    SWEEP_GRACE_SECONDS = 60
+    
+    def __init__(self):
+        self.redis = get_redis_connection('default')
+    
+    def enqueue(self, execution: PlaybookExecution) -> bool:
+        """Add an execution to the playbook's open window, returns True if it opened a new window"""
+        playbook = execution.playbook
+        self.redis.rpush(self.QUEUE_KEY.format(playbook_id=playbook.id), execution.id)
+        
+        # The window key expires on its own in case the flush task is lost
+        opened = bool(self.redis.set(
+            self.WINDOW_KEY.format(playbook_id=playbook.id),
+            1,
+            nx=True,
+            ex=max(playbook.batch_window_seconds * 3, 60)
+        ))
+        if opened:
+            self.redis.zadd(self.DUE_KEY, {playbook.id: time.time() + playbook.batch_window_seconds}, nx=True)
+        return opened
+    
+    def postpone(self, playbook: Playbook, seconds: float):
+        """Move a deferred window's due time, so sweep() leaves it to the deferred flush"""
+        self.redis.zadd(self.DUE_KEY, {playbook.id: time.time() + seconds}, xx=True)
+    
+    def overdue(self) -> List[int]:
+        """
+        Playbooks whose window is past due by SWEEP_GRACE_SECONDS, which means
+        its flush task was lost (worker restart, broker loss). Their due time
+        moves on by the grace period, so they are handed out once per sweep.
+        """
+        now = time.time()
+        playbook_ids = [
+            int(playbook_id)
+            for playbook_id in self.redis.zrangebyscore(self.DUE_KEY, '-inf', now - self.SWEEP_GRACE_SECONDS)
+        ]
+        if playbook_ids:
+            self.redis.zadd(self.DUE_KEY, {playbook_id: now for playbook_id in playbook_ids}, xx=True)
+        return playbook_ids
+    
+    def drain(self, playbook: Playbook) -> List[int]:
+        """Atomically take every queued execution id and close the window"""
+        pipe = self.redis.pipeline()
+        pipe.lrange(self.QUEUE_KEY.format(playbook_id=playbook.id), 0, -1)
+        pipe.delete(self.QUEUE_KEY.format(playbook_id=playbook.id))
+        pipe.delete(self.WINDOW_KEY.format(playbook_id=playbook.id))
+        pipe.zrem(self.DUE_KEY, playbook.id)
+        execution_ids, _, _, _ = pipe.execute()
+        
+        return [int(execution_id) for execution_id in execution_ids]
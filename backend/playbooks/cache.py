@@ -0,0 +1,49 @@
+import hashlib
+import json
+from typing import Dict, Optional
+from django.core.cache import cache
+from playbooks.models import Playbook, PlaybookExecution
+
+
+class PlaybookResultCache:
+    """Caches results of idempotent playbooks keyed by their relevant inputs"""
+    
+    KEY_PREFIX = 'playbook-result'
+    DEFAULT_KEY_FIELDS = ['source_ip', 'destination_ip', 'affected_user', 'affected_asset']
+    
+    def make_key(self, playbook: Playbook, alert_data: Dict) -> str:
+        """Build the cache key from the playbook and a hash of the relevant alert fields"""
+        fields = playbook.cache_key_fields or self.DEFAULT_KEY_FIELDS
+        
+        # Script path and parameters are part of the key so edits invalidate old results
+        payload = {
+            'script_path': playbook.script_path,
+            'parameters': playbook.parameters,
+            'inputs': {field: alert_data.get(field) for field in sorted(fields)},
+        }
+        digest = hashlib.sha256(
+            json.dumps(payload, sort_keys=True, default=str).encode()
+        ).hexdigest()
+        
+        return f"{self.KEY_PREFIX}:{playbook.id}:{digest}"
+    
+    def get(self, playbook: Playbook, alert_data: Dict) -> Optional[Dict]:
+        """Return the stored result for these inputs, if any"""
+        if not playbook.cacheable:
+            return None
+        return cache.get(self.make_key(playbook, alert_data))
+    
+    def set(self, playbook: Playbook, alert_data: Dict, execution: PlaybookExecution):
+        """Store the result of a successful execution"""
+        if not playbook.cacheable or playbook.cache_ttl_seconds <= 0:
+            return
+        
+        cache.set(
+            self.make_key(playbook, alert_data),
+            {
+                'execution_id': execution.id,
+                'output': execution.output,
+                'actions_taken': execution.actions_taken,
+            },
+            timeout=playbook.cache_ttl_seconds
+        )
@@ -0,0 +1,201 @@
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, NamedTuple, Optional
+from django.conf import settings
+from alerts.models import Alert
+from playbooks.models import Playbook
+from playbooks.registry import ScriptRegistry
+
+
+def build_alert_data(alert: Alert) -> Dict:
+    """Serialize the alert fields handed to playbook scripts on stdin"""
+    return {
+        'alert_id': alert.alert_id,
+        'title': alert.title,
+        'description': alert.description,
+        'severity': alert.severity,
+        'source_ip': str(alert.source_ip) if alert.source_ip else None,
+        'destination_ip': str(alert.destination_ip) if alert.destination_ip else None,
+        'affected_user': alert.affected_user,
+        'affected_asset': alert.affected_asset,
+        'raw_log': alert.raw_log,
+        'indicators_of_compromise': alert.indicators_of_compromise,
+    }
+
+
+class ScriptResult(NamedTuple):
+    returncode: int
+    stdout: str
+    stderr: str
+    peak_rss_kb: Optional[int]
+    cpu_time_seconds: Optional[float]
+
+
+class ScriptTimeout(subprocess.TimeoutExpired):
+    """Timeout that still carries the resource usage of the killed process group"""
+    
+    def __init__(self, cmd, timeout, peak_rss_kb=None, cpu_time_seconds=None):
+        super().__init__(cmd, timeout)
+        self.peak_rss_kb = peak_rss_kb
+        self.cpu_time_seconds = cpu_time_seconds
+
+
+class _ScriptIO:
+    """Feeds the script's stdin and drains its stdout and stderr on threads, like Popen.communicate()"""
+    
+    def __init__(self, process: subprocess.Popen, input: str):
+        self.output = {}
+        self.threads = [
+            threading.Thread(target=self._write, args=(process.stdin, input), daemon=True),
+            threading.Thread(target=self._read, args=('stdout', process.stdout), daemon=True),
+            threading.Thread(target=self._read, args=('stderr', process.stderr), daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+    
+    def join(self, deadline: Optional[float] = None):
+        """Wait for the pipes to close, at most until `deadline` (time.monotonic())"""
+        for thread in self.threads:
+            thread.join(None if deadline is None else max(deadline - time.monotonic(), 0))
+    
+    def is_open(self) -> bool:
+        return any(thread.is_alive() for thread in self.threads)
+    
+    def result(self):
+        self.join()
+        return self.output.get('stdout', ''), self.output.get('stderr', '')
+    
+    @staticmethod
+    def _write(stream, input):
+        try:
+            stream.write(input)
+            stream.close()
+        except (BrokenPipeError, ValueError):
+            pass
+    
+    def _read(self, name, stream):
+        with stream:
+            self.output[name] = stream.read()
+
+
+def _wait4(process: subprocess.Popen, deadline: Optional[float] = None):
+    """
+    Reap the child with os.wait4, which (unlike Popen.wait) keeps its
+    rusage, and set process.returncode. Polls like Popen.wait(timeout)
+    until `deadline` (time.monotonic()), then raises TimeoutExpired.
+    """
+    delay = 0.0005
+    while True:
+        try:
+            pid, status, rusage = os.wait4(process.pid, 0 if deadline is None else os.WNOHANG)
+        except ChildProcessError:
+            # Reaped by someone else, as Popen.wait assumes in this case
+            process.returncode = 0
+            return None
+        if pid == process.pid:
+            process.returncode = os.waitstatus_to_exitcode(status)
+            return rusage
+        
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise subprocess.TimeoutExpired(process.args, None)
+        delay = min(delay * 2, remaining, 0.05)
+        time.sleep(delay)
+
+
+SCRIPT_RUNNER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'script_runner.py')
+
+
+def resource_limits(playbook: Playbook) -> Dict[str, int]:
+    """Resolve per-playbook rlimits, falling back to the global defaults (0 disables a limit)"""
+    cpu_seconds = playbook.cpu_time_limit_seconds or settings.PLAYBOOK_CPU_TIME_LIMIT
+    memory_mb = playbook.memory_limit_mb or settings.PLAYBOOK_MEMORY_LIMIT_MB
+    open_files = playbook.max_open_files or settings.PLAYBOOK_MAX_OPEN_FILES
+    
+    limits = {}
+    if cpu_seconds:
+        limits['RLIMIT_CPU'] = cpu_seconds
+    if memory_mb:
+        limits['RLIMIT_AS'] = memory_mb * 1024 * 1024
+    if open_files:
+        limits['RLIMIT_NOFILE'] = open_files
+    return limits
+
+
+def _read_usage(rusage, usage_fd: int):
+    """Peak RSS (KB) reported by the runner and CPU seconds of the reaped child"""
+    with os.fdopen(usage_fd, 'rb') as usage_pipe:
+        reported = usage_pipe.read()
+    peak_rss_kb = int(reported) if reported.isdigit() else None
+    
+    cpu_time_seconds = None
+    if rusage is not None:
+        cpu_time_seconds = rusage.ru_utime + rusage.ru_stime
+    return peak_rss_kb, cpu_time_seconds
+
+
+def run_script(playbook: Playbook, payload: Dict, script_path: str = None) -> ScriptResult:
+    """Run the playbook script (or a workflow step's script) with payload on stdin,
+    in its own process group under the playbook's rlimits"""
+    # Raises ScriptRejected unless the script is registered and unchanged
+    registry = ScriptRegistry()
+    script_path = script_path or playbook.script_path
+    entry = registry.resolve(script_path)
+    script_path = str(registry.path(script_path))
+    
+    # The runner applies the limits and reports peak RSS back on this pipe
+    usage_fd, runner_usage_fd = os.pipe()
+    try:
+        process = subprocess.Popen(
+            [
+                # The worker's own interpreter, which compiled the registry's bytecode
+                sys.executable, SCRIPT_RUNNER,
+                json.dumps(resource_limits(playbook)), str(runner_usage_fd), script_path,
+                entry.get('compiled_path') or '',
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            start_new_session=True,
+            pass_fds=(runner_usage_fd,),
+            env={**os.environ, 'PLAYBOOK_REDIS_URL': settings.PLAYBOOK_REDIS_URL},
+        )
+    except Exception:
+        os.close(usage_fd)
+        raise
+    finally:
+        os.close(runner_usage_fd)
+    
+    # The pipes close when the script exits, then the child is reaped
+    # with its rusage (Popen.communicate would reap it without)
+    deadline = time.monotonic() + playbook.timeout_seconds
+    script_io = _ScriptIO(process, json.dumps(payload))
+    script_io.join(deadline)
+    try:
+        rusage = _wait4(process, deadline)
+        timed_out = False
+    except subprocess.TimeoutExpired:
+        timed_out = True
+    
+    # Kill the whole group, also after the script exited, so children it
+    # spawned are not orphaned and can't keep its pipes open
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    if timed_out:
+        rusage = _wait4(process)
+    
+    # Pipes still open at the deadline were held past it by the script's children
+    script_io.join(deadline)
+    if timed_out or script_io.is_open():
+        raise ScriptTimeout(process.args, playbook.timeout_seconds, *_read_usage(rusage, usage_fd))
+    
+    stdout, stderr = script_io.result()
+    return ScriptResult(process.returncode, stdout, stderr, *_read_usage(rusage, usage_fd))
@@ -0,0 +1,71 @@
+import subprocess
+import sys
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Imports the script like the SDK's in-process loader would, without running __main__
+IMPORT_SNIPPET = "import runpy, sys; runpy.run_path(sys.argv[1], run_name='playbook_import_check')"
+
+
+class Command(BaseCommand):
+    help = 'Measure how long each playbook script takes to import'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('scripts', nargs='*', help='Script paths relative to PLAYBOOK_SCRIPTS_DIR')
+        parser.add_argument(
+            '--budget-ms', type=float, default=settings.PLAYBOOK_IMPORT_BUDGET_MS,
+            help='Fail if a script spends longer than this importing modules beyond interpreter startup'
+        )
+        parser.add_argument('--top', type=int, default=3, help='Slowest imports to list per script')
+    
+    def handle(self, *args, **options):
+        scripts_dir = Path(settings.PLAYBOOK_SCRIPTS_DIR)
+        scripts = [scripts_dir / script for script in options['scripts']] or sorted(
+            path for path in scripts_dir.glob('*/*.py') if path.name != '__init__.py'
+        )
+        
+        # Modules every interpreter loads at startup are not the script's cost
+        startup = self._measure('import runpy, pkgutil')
+        
+        over_budget = []
+        for script in scripts:
+            imports = {
+                module: cumulative for module, cumulative in self._measure(IMPORT_SNIPPET, script).items()
+                if module not in startup
+            }
+            import_ms = sum(imports.values()) / 1000
+            slowest = ', '.join(
+                f"{module} {cumulative / 1000:.1f} ms"
+                for module, cumulative in sorted(imports.items(), key=lambda item: -item[1])[:options['top']]
+            )
+            
+            line = f"{script.relative_to(scripts_dir)}: {import_ms:.1f} ms ({slowest})"
+            if import_ms > options['budget_ms']:
+                over_budget.append(script)
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(self.style.SUCCESS(line))
+        
+        if over_budget:
+            raise CommandError(f"{len(over_budget)} scripts over the {options['budget_ms']:.0f} ms import budget")
+    
+    @staticmethod
+    def _measure(code, script=None):
+        """Cumulative import time in us of each top-level import, from `python -X importtime`"""
+        command = [sys.executable, '-X', 'importtime', '-c', code] + ([str(script)] if script else [])
+        process = subprocess.run(command, capture_output=True, text=True)
+        
+        if process.returncode != 0:
+            raise CommandError(f"Importing {script} failed:\n{process.stderr[-2000:]}")
+        
+        # "import time: self [us] | cumulative | imported package"; nested imports are indented
+        imports = {}
+        for line in process.stderr.splitlines():
+            if not line.startswith('import time:') or '[us]' in line:
+                continue
+            _, cumulative, module = line[len('import time:'):].split('|')
+            if not module.startswith('  '):
+                imports[module.strip()] = int(cumulative)
+        
+        return imports
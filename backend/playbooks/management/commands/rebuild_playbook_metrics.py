@@ -0,0 +1,28 @@
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from playbooks.metrics import PlaybookMetrics
+
+
+class Command(BaseCommand):
+    help = 'Recompute PlaybookDailyMetrics from PlaybookExecution for a range of days'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--from', dest='start', type=date.fromisoformat, required=True, help='First day (YYYY-MM-DD)'
+        )
+        parser.add_argument('--to', dest='end', type=date.fromisoformat, help='Last day, inclusive (default: today)')
+    
+    def handle(self, *args, **options):
+        start = options['start']
+        end = options['end'] or timezone.localdate()
+        if end < start:
+            raise CommandError('--to is before --from')
+        
+        # A day at a time, so each transaction stays small
+        day = start
+        while day <= end:
+            PlaybookMetrics().rebuild(day, day)
+            self.stdout.write(f"  {day}")
+            day += timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt playbook metrics from {start} to {end}"))
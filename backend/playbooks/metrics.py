@@ -0,0 +1,139 @@
+from datetime import date
+from typing import Dict, Iterable, List, Optional
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from analytics.response_times import bucket_for, quantile
+from playbooks.models import PlaybookDailyMetrics, PlaybookExecution
+
+STATUS_FIELDS = {
+    'SUCCESS': 'success_count',
+    'FAILED': 'failed_count',
+    'TIMEOUT': 'timeout_count',
+    'CACHED': 'cached_count',
+}
+QUANTILES = ((0.5, 'p50_duration_seconds'), (0.9, 'p90_duration_seconds'), (0.99, 'p99_duration_seconds'))
+UPDATE_FIELDS = list(STATUS_FIELDS.values()) + [
+    'total_duration_seconds', 'max_duration_seconds', 'duration_histogram', 'updated_at',
+] + [field for _, field in QUANTILES]
+
+
+class PlaybookMetrics:
+    """
+    Per-playbook daily execution counts and durations
+    
+    Executions are added to their playbook's PlaybookDailyMetrics row for
+    the day they finished, as they finish, so reading a playbook's health
+    never scans PlaybookExecution. Durations go into the same log-scale
+    histogram buckets as alert response times (see analytics.response_times),
+    counted in milliseconds since many scripts finish within a second, and
+    histograms merge across days by adding counts. Rows are locked while they
+    are updated, so concurrent workers don't lose counts.
+    """
+    
+    def record(self, executions: Iterable[PlaybookExecution]):
+        """Count finished executions, several at once for a batch run"""
+        deltas: Dict[tuple, PlaybookDailyMetrics] = {}
+        for execution in executions:
+            if execution.status not in STATUS_FIELDS or not execution.completed_at:
+                continue
+            key = (timezone.localtime(execution.completed_at).date(), execution.playbook_id)
+            delta = deltas.setdefault(key, PlaybookDailyMetrics(date=key[0], playbook_id=key[1]))
+            self._add(delta, execution)
+        if deltas:
+            self._merge(deltas)
+    
+    def rebuild(self, start: date, end: date):
+        """Recompute the rows of days [start, end] from PlaybookExecution"""
+        from analytics.metrics import day_bounds
+        
+        executions = PlaybookExecution.objects.filter(
+            completed_at__gte=day_bounds(start)[0], completed_at__lt=day_bounds(end)[1],
+            status__in=list(STATUS_FIELDS),
+        ).only('playbook_id', 'status', 'started_at', 'completed_at').order_by()
+        
+        rows: Dict[tuple, PlaybookDailyMetrics] = {}
+        for execution in executions.iterator(chunk_size=5000):
+            key = (timezone.localtime(execution.completed_at).date(), execution.playbook_id)
+            self._add(rows.setdefault(key, PlaybookDailyMetrics(date=key[0], playbook_id=key[1])), execution)
+        for row in rows.values():
+            self._percentiles(row)
+        
+        with transaction.atomic():
+            PlaybookDailyMetrics.objects.filter(date__gte=start, date__lte=end).delete()
+            PlaybookDailyMetrics.objects.bulk_create(rows.values(), batch_size=1000)
+    
+    @staticmethod
+    def summary(rows: Iterable[PlaybookDailyMetrics]) -> Dict:
+        """Totals and percentiles over several days' rows of one playbook"""
+        merged = PlaybookDailyMetrics()
+        for row in rows:
+            PlaybookMetrics._combine(merged, row)
+        PlaybookMetrics._percentiles(merged)
+        
+        runs = merged.run_count
+        return {
+            'executions': runs + merged.cached_count,
+            **{field: getattr(merged, field) for field in STATUS_FIELDS.values()},
+            'success_rate': round(merged.success_count / runs * 100, 2) if runs else None,
+            'avg_duration_seconds': round(merged.total_duration_seconds / runs, 3) if runs else None,
+            'max_duration_seconds': merged.max_duration_seconds,
+            **{field: getattr(merged, field) for _, field in QUANTILES},
+        }
+    
+    @staticmethod
+    def _add(row: PlaybookDailyMetrics, execution: PlaybookExecution):
+        field = STATUS_FIELDS[execution.status]
+        setattr(row, field, getattr(row, field) + 1)
+        
+        # Cache hits didn't run, their durations would drag the percentiles down
+        if execution.status == 'CACHED' or not execution.started_at:
+            return
+        seconds = max((execution.completed_at - execution.started_at).total_seconds(), 0.0)
+        row.total_duration_seconds += seconds
+        row.max_duration_seconds = max(row.max_duration_seconds or 0.0, seconds)
+        bucket = str(bucket_for(seconds * 1000))
+        row.duration_histogram[bucket] = row.duration_histogram.get(bucket, 0) + 1
+    
+    @staticmethod
+    def _combine(row: PlaybookDailyMetrics, other: PlaybookDailyMetrics):
+        for field in STATUS_FIELDS.values():
+            setattr(row, field, getattr(row, field) + getattr(other, field))
+        row.total_duration_seconds += other.total_duration_seconds
+        if other.max_duration_seconds is not None:
+            row.max_duration_seconds = max(row.max_duration_seconds or 0.0, other.max_duration_seconds)
+        for bucket, count in other.duration_histogram.items():
+            row.duration_histogram[bucket] = row.duration_histogram.get(bucket, 0) + count
+    
+    @staticmethod
+    def _percentiles(row: PlaybookDailyMetrics):
+        buckets = {int(bucket): count for bucket, count in row.duration_histogram.items()}
+        for q, field in QUANTILES:
+            value: Optional[float] = quantile(buckets, q)
+            if value is not None:
+                # A bucket's midpoint can overshoot the slowest run it holds
+                value = round(min(value / 1000, row.max_duration_seconds or 0.0), 3)
+            setattr(row, field, value)
+    
+    def _merge(self, deltas: Dict[tuple, PlaybookDailyMetrics]):
+        keys: List[tuple] = sorted(deltas)
+        with transaction.atomic():
+            # Make sure every row exists, then lock them in a fixed order
+            PlaybookDailyMetrics.objects.bulk_create(
+                [PlaybookDailyMetrics(date=day, playbook_id=playbook_id) for day, playbook_id in keys],
+                ignore_conflicts=True,
+            )
+            match = Q()
+            for day, playbook_id in keys:
+                match |= Q(date=day, playbook_id=playbook_id)
+            rows = list(
+                PlaybookDailyMetrics.objects.select_for_update()
+                .filter(match)
+                .order_by('date', 'playbook_id')
+            )
+            now = timezone.now()
+            for row in rows:
+                self._combine(row, deltas[(row.date, row.playbook_id)])
+                self._percentiles(row)
+                row.updated_at = now
+            PlaybookDailyMetrics.objects.bulk_update(rows, UPDATE_FIELDS)
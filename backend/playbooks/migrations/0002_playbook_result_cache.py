@@ -0,0 +1,61 @@
+# Generated by Django 5.0.1 on 2026-10-19 17:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("playbooks", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="playbook",
+            name="cache_hit_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="playbook",
+            name="cache_key_fields",
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name="playbook",
+            name="cache_ttl_seconds",
+            field=models.IntegerField(default=3600),
+        ),
+        migrations.AddField(
+            model_name="playbook",
+            name="cacheable",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="playbookexecution",
+            name="cached_from",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="cache_hits",
+                to="playbooks.playbookexecution",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="playbookexecution",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("PENDING", "Pending"),
+                    ("RUNNING", "Running"),
+                    ("SUCCESS", "Success"),
+                    ("FAILED", "Failed"),
+                    ("TIMEOUT", "Timeout"),
+                    ("CACHED", "Cached"),
+                ],
+                default="PENDING",
+                max_length=20,
+            ),
+        ),
+    ]
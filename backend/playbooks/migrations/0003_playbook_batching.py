@@ -0,0 +1,33 @@
+# Generated by Django 5.0.1 on 2026-10-19 17:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("playbooks", "0002_playbook_result_cache"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="playbook",
+            name="batch_target_field",
+            field=models.CharField(default="source_ip", max_length=100),
+        ),
+        migrations.AddField(
+            model_name="playbook",
+            name="batch_window_seconds",
+            field=models.IntegerField(default=10),
+        ),
+        migrations.AddField(
+            model_name="playbook",
+            name="batchable",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="playbookexecution",
+            name="batch_id",
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
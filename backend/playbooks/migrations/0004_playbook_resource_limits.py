@@ -0,0 +1,38 @@
+# Generated by Django 5.0.1 on 2026-10-19 17:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("playbooks", "0003_playbook_batching"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="playbook",
+            name="cpu_time_limit_seconds",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="playbook",
+            name="max_open_files",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="playbook",
+            name="memory_limit_mb",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="playbookexecution",
+            name="cpu_time_seconds",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="playbookexecution",
+            name="peak_rss_kb",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
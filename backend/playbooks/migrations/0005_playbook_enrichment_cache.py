@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-19 17:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("playbooks", "0004_playbook_resource_limits"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="playbook",
+            name="enrichment_cache",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.1 on 2026-10-19 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("playbooks", "0005_playbook_enrichment_cache"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="playbook",
+            name="workflow",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="playbookexecution",
+            name="critical_path",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="playbookexecution",
+            name="step_results",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name="playbook",
+            name="script_path",
+            field=models.CharField(blank=True, max_length=500),
+        ),
+    ]
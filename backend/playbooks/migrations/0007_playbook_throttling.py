@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-19 17:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("playbooks", "0006_playbook_workflow"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="playbook",
+            name="max_concurrent_executions",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="playbook",
+            name="max_executions_per_minute",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
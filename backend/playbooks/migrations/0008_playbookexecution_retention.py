@@ -0,0 +1,45 @@
+# Generated by Django 5.0.1 on 2026-10-19 17:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("alerts", "0001_initial"),
+        ("playbooks", "0007_playbook_throttling"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="playbookexecution",
+            name="compacted_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="playbookexecution",
+            name="summary",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddIndex(
+            model_name="playbookexecution",
+            index=models.Index(
+                fields=["-created_at"], name="playbooks_p_created_0216c4_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="playbookexecution",
+            index=models.Index(
+                fields=["playbook", "-created_at"],
+                name="playbooks_p_playboo_2e2505_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="playbookexecution",
+            index=models.Index(
+                fields=["status", "-created_at"], name="playbooks_p_status_f241a8_idx"
+            ),
+        ),
+    ]
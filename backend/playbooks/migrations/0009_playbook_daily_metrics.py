@@ -0,0 +1,53 @@
+# Generated by Django 5.0.1 on 2026-10-19 18:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("playbooks", "0008_playbookexecution_retention"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PlaybookDailyMetrics",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("success_count", models.IntegerField(default=0)),
+                ("failed_count", models.IntegerField(default=0)),
+                ("timeout_count", models.IntegerField(default=0)),
+                ("cached_count", models.IntegerField(default=0)),
+                ("total_duration_seconds", models.FloatField(default=0)),
+                ("max_duration_seconds", models.FloatField(blank=True, null=True)),
+                ("p50_duration_seconds", models.FloatField(blank=True, null=True)),
+                ("p90_duration_seconds", models.FloatField(blank=True, null=True)),
+                ("p99_duration_seconds", models.FloatField(blank=True, null=True)),
+                ("duration_histogram", models.JSONField(blank=True, default=dict)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "playbook",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_metrics",
+                        to="playbooks.playbook",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Playbook Daily Metrics",
+                "ordering": ["-date", "playbook"],
+                "unique_together": {("date", "playbook")},
+            },
+        ),
+    ]
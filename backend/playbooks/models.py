@@ -25,11 +25,35 @@ class Playbook(models.Model):
     kill_chain_stages = models.ManyToManyField(KillChainStage, blank=True, related_name='playbooks')
     
     # Execution
-    script_path = models.CharField(max_length=500)
+    script_path = models.CharField(max_length=500, blank=True)
     timeout_seconds = models.IntegerField(default=300)
     enabled = models.BooleanField(default=True)
     auto_execute = models.BooleanField(default=False)
     parameters = models.JSONField(default=dict, blank=True)
+    # DAG of script steps run instead of script_path (see playbooks.workflow)
+    workflow = models.JSONField(default=dict, blank=True)
+    
+    # Result caching (idempotent playbooks only)
+    cacheable = models.BooleanField(default=False)
+    cache_ttl_seconds = models.IntegerField(default=3600)
+    cache_key_fields = models.JSONField(default=list, blank=True)
+    
+    # Cross-alert coalescing (one script run per window for all targets)
+    batchable = models.BooleanField(default=False)
+    batch_window_seconds = models.IntegerField(default=10)
+    batch_target_field = models.CharField(max_length=100, default='source_ip')
+    
+    # Resource limits (empty falls back to the PLAYBOOK_* settings)
+    cpu_time_limit_seconds = models.IntegerField(null=True, blank=True)
+    memory_limit_mb = models.IntegerField(null=True, blank=True)
+    max_open_files = models.IntegerField(null=True, blank=True)
+    
+    # Resolve IOCs through the shared enrichment cache before running
+    enrichment_cache = models.BooleanField(default=False)
+    
+    # Throttling, enforced across all workers (empty means unlimited)
+    max_concurrent_executions = models.IntegerField(null=True, blank=True)
+    max_executions_per_minute = models.IntegerField(null=True, blank=True)
     
     # Metadata
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
@@ -40,6 +64,7 @@ class Playbook(models.Model):
     execution_count = models.IntegerField(default=0)
     success_count = models.IntegerField(default=0)
     failure_count = models.IntegerField(default=0)
+    cache_hit_count = models.IntegerField(default=0)
     
     class Meta:
         ordering = ['name']
@@ -61,6 +86,7 @@ class PlaybookExecution(models.Model):
         ('SUCCESS', 'Success'),
         ('FAILED', 'Failed'),
         ('TIMEOUT', 'Timeout'),
+        ('CACHED', 'Cached'),
     ]
     
     playbook = models.ForeignKey(Playbook, on_delete=models.CASCADE, related_name='executions')
@@ -71,16 +97,99 @@ class PlaybookExecution(models.Model):
     started_at = models.DateTimeField(null=True, blank=True)
     completed_at = models.DateTimeField(null=True, blank=True)
     triggered_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    batch_id = models.CharField(max_length=64, blank=True, db_index=True)
     
     # Results
     output = models.TextField(blank=True)
     error_message = models.TextField(blank=True)
     actions_taken = models.JSONField(default=list)
     
+    # Resource usage
+    peak_rss_kb = models.BigIntegerField(null=True, blank=True)
+    cpu_time_seconds = models.FloatField(null=True, blank=True)
+    
+    # Workflow playbooks: per-step status and timing, and the slowest dependency chain
+    step_results = models.JSONField(default=dict, blank=True)
+    critical_path = models.JSONField(default=dict, blank=True)
+    
+    cached_from = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='cache_hits'
+    )
+    
+    # Compacted executions keep this summary in place of output, actions and step results
+    summary = models.JSONField(default=dict, blank=True)
+    compacted_at = models.DateTimeField(null=True, blank=True)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at']),
+            models.Index(fields=['playbook', '-created_at']),
+            models.Index(fields=['status', '-created_at']),
+        ]
     
     def __str__(self):
-        return f"{self.playbook.name} - {self.alert.alert_id}"
\ No newline at end of file
+        return f"{self.playbook.name} - {self.alert.alert_id}"
+    
+    def summarize(self):
+        """Status, duration and action counts, what outlives compaction"""
+        if self.compacted_at:
+            return self.summary
+        
+        actions = self.actions_taken or []
+        action_types = {}
+        for action in actions:
+            name = action.get('action', 'unknown')
+            action_types[name] = action_types.get(name, 0) + 1
+        
+        duration = None
+        if self.started_at and self.completed_at:
+            duration = round((self.completed_at - self.started_at).total_seconds(), 3)
+        
+        return {
+            'status': self.status,
+            'duration_seconds': duration,
+            'action_count': len(actions),
+            'failed_action_count': sum(1 for action in actions if not action.get('success')),
+            'action_types': action_types,
+            'steps': {step_id: record.get('status') for step_id, record in (self.step_results or {}).items()},
+            'output_length': len(self.output or ''),
+            'error': (self.error_message or '').strip().split('\n')[-1][:500],
+        }
+
+
+class PlaybookDailyMetrics(models.Model):
+    """One playbook's finished executions on one day, kept current by playbooks.metrics"""
+    date = models.DateField()
+    playbook = models.ForeignKey(Playbook, on_delete=models.CASCADE, related_name='daily_metrics')
+    
+    # Executions by final status
+    success_count = models.IntegerField(default=0)
+    failed_count = models.IntegerField(default=0)
+    timeout_count = models.IntegerField(default=0)
+    cached_count = models.IntegerField(default=0)
+    
+    # Durations of runs (cache hits excluded), in seconds; percentiles come
+    # from duration_histogram, log-scale millisecond buckets that merge across days
+    total_duration_seconds = models.FloatField(default=0)
+    max_duration_seconds = models.FloatField(null=True, blank=True)
+    p50_duration_seconds = models.FloatField(null=True, blank=True)
+    p90_duration_seconds = models.FloatField(null=True, blank=True)
+    p99_duration_seconds = models.FloatField(null=True, blank=True)
+    duration_histogram = models.JSONField(default=dict, blank=True)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-date', 'playbook']
+        unique_together = ['date', 'playbook']
+        verbose_name_plural = "Playbook Daily Metrics"
+    
+    def __str__(self):
+        return f"{self.playbook_id} on {self.date}"
+    
+    @property
+    def run_count(self):
+        return self.success_count + self.failed_count + self.timeout_count
@@ -0,0 +1,214 @@
+import ast
+import hashlib
+import importlib.util
+import json
+import py_compile
+from pathlib import Path
+from typing import Dict, List
+from django.conf import settings
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+
+class ScriptRejected(Exception):
+    """The playbook's script is missing, invalid or changed since it was registered"""
+
+
+# Registry entries already resolved by this process, keyed by script_path
+_entries: Dict[str, Dict] = {}
+
+
+class ScriptRegistry:
+    """
+    Known-good playbook scripts, scanned from PLAYBOOK_SCRIPTS_DIR at worker startup
+    
+    Each entry records the script's content hash, its entry point and the
+    alert fields it reads, and points at bytecode compiled ahead of time.
+    Executions resolve their script through the registry and are rejected
+    if it is missing or its content no longer matches the registered hash.
+    """
+    
+    KEY = 'playbook-script-registry'
+    SCANNED_AT_KEY = 'playbook-script-registry-scanned-at'
+    RESCAN_KEY = 'playbook-script-registry-rescan'
+    RESCAN_INTERVAL = 60
+    
+    def __init__(self):
+        self.redis = get_redis_connection('default')
+        self.scripts_dir = Path(settings.PLAYBOOK_SCRIPTS_DIR).resolve()
+    
+    def scan(self) -> Dict[str, Dict]:
+        """Register every script under PLAYBOOK_SCRIPTS_DIR, replacing the previous scan"""
+        # Shared modules next to the script folders (the SDK) are only warmed up
+        for module in self.scripts_dir.glob('*.py'):
+            self._compile(module, importlib.util.cache_from_source(str(module)))
+        
+        entries = {}
+        for path in sorted(self.scripts_dir.glob('*/*.py')):
+            script_path = path.relative_to(self.scripts_dir).as_posix()
+            try:
+                entries[script_path] = self.register(script_path)
+            except ScriptRejected as e:
+                entries[script_path] = {'script_path': script_path, 'error': str(e)}
+        
+        pipe = self.redis.pipeline()
+        pipe.delete(self.KEY)
+        if entries:
+            pipe.hset(self.KEY, mapping={path: json.dumps(entry) for path, entry in entries.items()})
+        pipe.set(self.SCANNED_AT_KEY, timezone.now().isoformat())
+        pipe.execute()
+        
+        _entries.clear()
+        _entries.update({path: entry for path, entry in entries.items() if 'error' not in entry})
+        return entries
+    
+    def register(self, script_path: str) -> Dict:
+        """Inspect and precompile one script"""
+        entry = self.inspect(script_path)
+        path = self.path(script_path)
+        entry['compiled_path'] = self._compile(path, importlib.util.cache_from_source(str(path)))
+        entry['registered_at'] = timezone.now().isoformat()
+        return entry
+    
+    def inspect(self, script_path: str) -> Dict:
+        """Hash and statically inspect a script, raising ScriptRejected if it can't run"""
+        path = self.path(script_path)
+        try:
+            source = path.read_bytes()
+            stat = path.stat()
+        except OSError:
+            raise ScriptRejected(f"Script not found: {script_path}")
+        
+        try:
+            tree = ast.parse(source, filename=str(path))
+        except SyntaxError as e:
+            raise ScriptRejected(f"Script does not compile: {script_path}: {e}")
+        
+        entry_point = self._entry_point(tree)
+        if entry_point is None:
+            raise ScriptRejected(f"Script has no @playbook or main() entry point: {script_path}")
+        
+        parameter = entry_point.args.args[0].arg if entry_point.args.args else None
+        return {
+            'script_path': script_path,
+            'sha256': hashlib.sha256(source).hexdigest(),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'entry_point': entry_point.name,
+            'signature': f"{entry_point.name}({ast.unparse(entry_point.args)})",
+            'inputs': self._inputs(tree, parameter),
+        }
+    
+    def resolve(self, script_path: str) -> Dict:
+        """Registry entry a playbook may execute, raising ScriptRejected otherwise"""
+        entry = _entries.get(script_path)
+        if entry is None:
+            stored = self.redis.hget(self.KEY, script_path)
+            entry = json.loads(stored) if stored else None
+            
+            # Unknown to Redis too: it was flushed, or the script was added
+            # since the last scan. Rescan, at most once per interval cluster-wide
+            if entry is None and self.redis.set(self.RESCAN_KEY, 1, nx=True, ex=self.RESCAN_INTERVAL):
+                entry = self.scan().get(script_path)
+            
+            if entry is None or 'error' in entry:
+                raise ScriptRejected(
+                    entry['error'] if entry else f"Script is not registered: {script_path}"
+                )
+            _entries[script_path] = entry
+        
+        # A stat is enough while size and mtime are unchanged; otherwise rehash
+        try:
+            stat = self.path(script_path).stat()
+        except OSError:
+            raise ScriptRejected(f"Script not found: {script_path}")
+        
+        if (stat.st_size, stat.st_mtime_ns) != (entry['size'], entry['mtime_ns']):
+            if self.inspect(script_path)['sha256'] != entry['sha256']:
+                raise ScriptRejected(f"Script changed since it was registered: {script_path}")
+        
+        return entry
+    
+    def state(self) -> Dict:
+        """Registered scripts and the playbooks that can't currently run"""
+        from playbooks.models import Playbook
+        
+        scripts = {
+            path.decode(): json.loads(entry) for path, entry in self.redis.hgetall(self.KEY).items()
+        }
+        scanned_at = self.redis.get(self.SCANNED_AT_KEY)
+        
+        rejected = []
+        for playbook in Playbook.objects.filter(enabled=True).only('id', 'name', 'script_path', 'workflow'):
+            # Workflow playbooks need every step's script
+            script_paths = [step.get('script') for step in playbook.workflow.get('steps', [])] or [playbook.script_path]
+            try:
+                for script_path in script_paths:
+                    self.resolve(script_path)
+            except ScriptRejected as e:
+                rejected.append({'id': playbook.id, 'name': playbook.name, 'error': str(e)})
+        
+        return {
+            'scanned_at': scanned_at.decode() if scanned_at else None,
+            'scripts': scripts,
+            'rejected_playbooks': rejected,
+        }
+    
+    def path(self, script_path: str) -> Path:
+        """Absolute path of a script, which must stay inside PLAYBOOK_SCRIPTS_DIR"""
+        path = (self.scripts_dir / script_path).resolve()
+        if self.scripts_dir not in path.parents:
+            raise ScriptRejected(f"Script is outside PLAYBOOK_SCRIPTS_DIR: {script_path}")
+        return path
+    
+    @staticmethod
+    def _compile(path: Path, cfile: str):
+        """Write bytecode to the standard __pycache__ location, None if it can't be written"""
+        try:
+            # Hash-checked so regular imports never pick up stale bytecode either
+            return py_compile.compile(
+                str(path), cfile=cfile, doraise=True,
+                invalidation_mode=py_compile.PycInvalidationMode.CHECKED_HASH
+            )
+        except (py_compile.PyCompileError, OSError):
+            return None
+    
+    @staticmethod
+    def _entry_point(tree: ast.Module):
+        functions = [node for node in tree.body if isinstance(node, ast.FunctionDef)]
+        for function in functions:
+            for decorator in function.decorator_list:
+                name = decorator.attr if isinstance(decorator, ast.Attribute) else getattr(decorator, 'id', None)
+                if name == 'playbook':
+                    return function
+        return next((function for function in functions if function.name == 'main'), None)
+    
+    @staticmethod
+    def _inputs(tree: ast.Module, parameter: str) -> List[str]:
+        """Alert fields read as param['x'], param.get('x') or 'x' in param"""
+        if parameter is None:
+            return []
+        
+        def is_parameter(node):
+            return isinstance(node, ast.Name) and node.id == parameter
+        
+        inputs = []
+        for node in ast.walk(tree):
+            key = None
+            if isinstance(node, ast.Subscript) and is_parameter(node.value):
+                key = node.slice
+            elif (
+                isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                and node.func.attr == 'get' and is_parameter(node.func.value) and node.args
+            ):
+                key = node.args[0]
+            elif (
+                isinstance(node, ast.Compare) and len(node.ops) == 1
+                and isinstance(node.ops[0], ast.In) and is_parameter(node.comparators[0])
+            ):
+                key = node.left
+            
+            if isinstance(key, ast.Constant) and isinstance(key.value, str) and key.value not in inputs:
+                inputs.append(key.value)
+        
+        return inputs
@@ -0,0 +1,182 @@
+import gzip
+import json
+import mmap
+import time
+import uuid
+from datetime import timedelta
+from functools import partial
+from pathlib import Path
+from typing import Dict, List
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from playbooks.models import PlaybookExecution
+
+
+class ExecutionRetention:
+    """
+    Keeps PlaybookExecution history bounded
+    
+    Executions older than PLAYBOOK_EXECUTION_COMPACT_DAYS are compacted:
+    output, error_message, actions_taken and step_results are archived as
+    gzipped JSON lines (one file per day of created_at) and replaced by a
+    small summary. Executions older than PLAYBOOK_EXECUTION_RETENTION_DAYS
+    are deleted. Both work in chunks of primary keys so no single
+    statement locks or loads much of the table.
+    
+    A chunk's archive lines are staged in a .pending file before its
+    transaction commits and appended to the day's file only once it has,
+    so a rolled-back chunk never reaches the archive. Pending files left
+    by a crash are published or discarded on the next run, depending on
+    whether their executions were compacted, unless the crash came after
+    they were appended.
+    """
+    
+    LARGE_FIELDS = ['output', 'error_message', 'actions_taken', 'step_results', 'critical_path']
+    FINISHED_STATES = ['SUCCESS', 'FAILED', 'TIMEOUT', 'CACHED']
+    # A pending file younger than this may belong to a chunk still in its transaction
+    PENDING_GRACE_SECONDS = 3600
+    
+    def __init__(self):
+        self.chunk_size = settings.PLAYBOOK_EXECUTION_COMPACT_CHUNK
+        archive_dir = settings.PLAYBOOK_EXECUTION_ARCHIVE_DIR
+        self.archive_dir = Path(archive_dir) if archive_dir else None
+    
+    def compact(self, before=None) -> int:
+        """Compact finished executions created before `before`, returns how many"""
+        before = before or timezone.now() - timedelta(days=settings.PLAYBOOK_EXECUTION_COMPACT_DAYS)
+        candidates = PlaybookExecution.objects.filter(
+            created_at__lt=before,
+            compacted_at__isnull=True,
+            status__in=self.FINISHED_STATES,
+        ).order_by('id')
+        
+        if self.archive_dir:
+            self._recover_pending()
+        
+        compacted = 0
+        last_id = 0
+        while True:
+            ids = list(candidates.filter(id__gt=last_id).values_list('id', flat=True)[:self.chunk_size])
+            if not ids:
+                return compacted
+            last_id = ids[-1]
+            compacted += self._compact_chunk(ids)
+    
+    def purge(self, before=None) -> int:
+        """Delete executions created before `before`, returns how many"""
+        if not settings.PLAYBOOK_EXECUTION_RETENTION_DAYS and before is None:
+            return 0
+        before = before or timezone.now() - timedelta(days=settings.PLAYBOOK_EXECUTION_RETENTION_DAYS)
+        expired = PlaybookExecution.objects.filter(created_at__lt=before).order_by('id')
+        
+        deleted = 0
+        while True:
+            ids = list(expired.values_list('id', flat=True)[:self.chunk_size])
+            if not ids:
+                return deleted
+            deleted += PlaybookExecution.objects.filter(id__in=ids).delete()[1].get('playbooks.PlaybookExecution', 0)
+    
+    def _compact_chunk(self, ids: List[int]) -> int:
+        pending: List[Path] = []
+        try:
+            with transaction.atomic():
+                # Skip rows another compaction run is already working on
+                executions = list(
+                    PlaybookExecution.objects.select_for_update(skip_locked=True)
+                    .filter(id__in=ids, compacted_at__isnull=True)
+                    .only(
+                        'id', 'playbook_id', 'alert_id', 'status', 'started_at', 'completed_at', 'created_at',
+                        *self.LARGE_FIELDS
+                    )
+                )
+                if not executions:
+                    return 0
+                
+                if self.archive_dir:
+                    pending = self._stage(executions)
+                    transaction.on_commit(partial(self._publish, pending), robust=True)
+                
+                compacted_at = timezone.now()
+                for execution in executions:
+                    execution.summary = execution.summarize()
+                    execution.compacted_at = compacted_at
+                    execution.output = ''
+                    execution.error_message = ''
+                    execution.actions_taken = []
+                    execution.step_results = {}
+                    execution.critical_path = {}
+                
+                PlaybookExecution.objects.bulk_update(executions, ['summary', 'compacted_at', *self.LARGE_FIELDS])
+                return len(executions)
+        except Exception:
+            # The chunk rolled back, so its staged lines must not reach the archive
+            for path in pending:
+                path.unlink(missing_ok=True)
+            raise
+    
+    def _stage(self, executions: List[PlaybookExecution]) -> List[Path]:
+        """Write the fields being dropped to pending files, one per day, returns their paths"""
+        by_day: Dict[str, List[str]] = {}
+        for execution in executions:
+            record = {
+                'id': execution.id,
+                'playbook_id': execution.playbook_id,
+                'alert_id': execution.alert_id,
+                'status': execution.status,
+                'created_at': execution.created_at.isoformat(),
+            }
+            record.update({field: getattr(execution, field) for field in self.LARGE_FIELDS})
+            by_day.setdefault(execution.created_at.date().isoformat(), []).append(json.dumps(record, default=str))
+        
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        token = uuid.uuid4().hex
+        pending = []
+        for day, lines in by_day.items():
+            path = self.archive_dir / f"executions-{day}.jsonl.gz.{token}.pending"
+            with gzip.open(path, 'wt', encoding='utf-8') as staged:
+                staged.write('\n'.join(lines) + '\n')
+            pending.append(path)
+        return pending
+    
+    def _publish(self, pending: List[Path]):
+        """Append committed pending files to their day's archive"""
+        for path in pending:
+            # Appending adds a gzip member; readers see one continuous stream
+            with open(self._archive(path), 'ab') as target:
+                target.write(path.read_bytes())
+            path.unlink()
+    
+    def _recover_pending(self):
+        """Publish pending files whose chunk committed before a crash, drop the rest"""
+        cutoff = time.time() - self.PENDING_GRACE_SECONDS
+        for path in sorted(self.archive_dir.glob('*.pending')):
+            if path.stat().st_mtime > cutoff:
+                continue
+            with gzip.open(path, 'rt', encoding='utf-8') as staged:
+                ids = [json.loads(line)['id'] for line in staged if line.strip()]
+            # A chunk is compacted all at once, so any of its rows tells whether it committed
+            if PlaybookExecution.objects.filter(id__in=ids, compacted_at__isnull=False).exists():
+                if self._published(path):
+                    path.unlink()
+                else:
+                    self._publish([path])
+            else:
+                path.unlink()
+    
+    def _published(self, path: Path) -> bool:
+        """
+        Whether a pending file was already appended, by a publish that
+        crashed before removing it. Its gzip header names the file, token
+        included, so its bytes can only be in the archive if it was.
+        """
+        archive = self._archive(path)
+        if not archive.exists() or not archive.stat().st_size:
+            return False
+        with open(archive, 'rb') as published, mmap.mmap(published.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return data.find(path.read_bytes()) != -1
+    
+    @staticmethod
+    def _archive(path: Path) -> Path:
+        """The day's archive a pending file is appended to"""
+        return path.with_name(path.name.split('.jsonl.gz.')[0] + '.jsonl.gz')
@@ -0,0 +1,89 @@
+"""
+Bootstrap for playbook subprocesses
+
+Runs without Django: applies the rlimits passed by the executor, runs the
+playbook script as __main__ (from the registry's precompiled bytecode when
+given) and, on exit, writes the script's peak RSS to the side pipe the
+executor is listening on.
+
+Usage: python script_runner.py <limits-json> <usage-fd> <script-path> [<compiled-path>]
+"""
+
+import atexit
+import importlib.util
+import json
+import marshal
+import os
+import resource
+import runpy
+import sys
+import types
+
+# CPU gets headroom so SIGXCPU arrives before the hard-limit SIGKILL
+CPU_HARD_LIMIT_HEADROOM = 5
+
+
+def apply_limits(limits):
+    """Apply {'RLIMIT_*': value} limits, never raising above the inherited hard limit"""
+    for name, value in limits.items():
+        limit = getattr(resource, name)
+        _, hard = resource.getrlimit(limit)
+        ceiling = value + CPU_HARD_LIMIT_HEADROOM if limit == resource.RLIMIT_CPU else value
+        if hard != resource.RLIM_INFINITY:
+            value, ceiling = min(value, hard), min(ceiling, hard)
+        resource.setrlimit(limit, (value, ceiling))
+
+
+def peak_rss_kb():
+    """High-water RSS of this process image (ru_maxrss would include the parent worker)"""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_compiled(script_path, compiled_path):
+    """Run precompiled bytecode as __main__, the way runpy.run_path runs the source"""
+    with open(compiled_path, 'rb') as compiled:
+        # 16-byte pyc header: magic, flags, hash or mtime, size
+        data = compiled.read()
+
+    # Bytecode from another Python version can't be loaded, run the source instead
+    if data[:4] != importlib.util.MAGIC_NUMBER:
+        runpy.run_path(script_path, run_name='__main__')
+        return
+    code = marshal.loads(data[16:])
+
+    module = types.ModuleType('__main__')
+    module.__file__ = script_path
+    module.__cached__ = compiled_path
+    module.__builtins__ = __builtins__
+    sys.modules['__main__'] = module
+    exec(code, module.__dict__)
+
+
+def report_usage(usage_fd):
+    try:
+        os.write(usage_fd, str(peak_rss_kb()).encode())
+        os.close(usage_fd)
+    except OSError:
+        pass
+
+
+if __name__ == '__main__':
+    limits, usage_fd, script_path = json.loads(sys.argv[1]), int(sys.argv[2]), sys.argv[3]
+    compiled_path = sys.argv[4] if len(sys.argv) > 4 else ''
+    apply_limits(limits)
+    atexit.register(report_usage, usage_fd)
+
+    # Behave like `python script_path`
+    sys.argv = [script_path]
+    sys.path[0] = os.path.dirname(script_path)
+    if compiled_path and os.path.exists(compiled_path):
+        run_compiled(script_path, compiled_path)
+    else:
+        runpy.run_path(script_path, run_name='__main__')
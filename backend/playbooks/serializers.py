@@ -1,5 +1,7 @@
 from rest_framework import serializers
-from playbooks.models import Playbook, PlaybookExecution
+from playbooks.models import Playbook, PlaybookDailyMetrics, PlaybookExecution
+from playbooks.registry import ScriptRegistry, ScriptRejected
+from playbooks.workflow import Workflow
 
 
 class PlaybookSerializer(serializers.ModelSerializer):
@@ -9,14 +11,54 @@ class PlaybookSerializer(serializers.ModelSerializer):
     class Meta:
         model = Playbook
         fields = '__all__'
-        read_only_fields = ['execution_count', 'success_count', 'failure_count', 'created_at', 'updated_at']
+        read_only_fields = [
+            'execution_count', 'success_count', 'failure_count', 'cache_hit_count',
+            'created_at', 'updated_at'
+        ]
+    
+    def validate_script_path(self, value):
+        if not value:
+            return value
+        try:
+            ScriptRegistry().inspect(value)
+        except ScriptRejected as e:
+            raise serializers.ValidationError(str(e))
+        return value
+    
+    def validate_workflow(self, value):
+        if value:
+            try:
+                Workflow.validate(value)
+            except ValueError as e:
+                raise serializers.ValidationError(str(e))
+        return value
+    
+    def validate(self, attrs):
+        script_path = attrs.get('script_path', getattr(self.instance, 'script_path', ''))
+        workflow = attrs.get('workflow', getattr(self.instance, 'workflow', {}))
+        if not script_path and not workflow:
+            raise serializers.ValidationError('A playbook needs a script_path or a workflow')
+        return attrs
 
 
 class PlaybookExecutionSerializer(serializers.ModelSerializer):
     playbook = serializers.StringRelatedField(read_only=True)
     alert = serializers.StringRelatedField(read_only=True)
+    summary = serializers.SerializerMethodField()
     
     class Meta:
         model = PlaybookExecution
         fields = '__all__'
-        read_only_fields = ['started_at', 'completed_at', 'created_at']
\ No newline at end of file
+        read_only_fields = [
+            'started_at', 'completed_at', 'created_at', 'cached_from', 'batch_id',
+            'peak_rss_kb', 'cpu_time_seconds', 'step_results', 'critical_path', 'compacted_at'
+        ]
+    
+    def get_summary(self, obj):
+        return obj.summarize()
+
+
+class PlaybookDailyMetricsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PlaybookDailyMetrics
+        exclude = ['duration_histogram']
@@ -1,10 +1,22 @@
-from celery import shared_task
+from celery import chord, shared_task
 from playbooks.models import PlaybookExecution, Playbook
+from playbooks.cache import PlaybookResultCache
+from playbooks.batching import PlaybookBatcher
+from playbooks.executor import build_alert_data, run_script
+from playbooks.metrics import PlaybookMetrics
+from playbooks.retention import ExecutionRetention
+from playbooks.throttle import PlaybookThrottle
+from playbooks.workflow import Workflow
+from analytics.enrichment import EnrichmentCache
+from django.db.models import F
 from django.utils import timezone
-from django.conf import settings
 import subprocess
 import json
-import os
+import logging
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
 
 
 @shared_task
@@ -20,69 +32,457 @@ def execute_playbook_script(execution_id):
         execution.started_at = timezone.now()
         execution.save()
         
+        throttle = PlaybookThrottle()
+        
+        # Workflow playbooks run their steps as a DAG instead of one script,
+        # holding one slot for the whole run
+        if playbook.workflow:
+            retry_after = throttle.acquire(
+                playbook, execution.id,
+                lease_seconds=playbook.timeout_seconds * len(Workflow(playbook.workflow).steps)
+            )
+            if retry_after:
+                return defer_execution(execution, retry_after)
+            dispatch_workflow(execution, {})
+            return f"Playbook execution {execution_id} started workflow"
+        
         # Prepare alert data for script
-        alert_data = {
-            'alert_id': alert.alert_id,
-            'title': alert.title,
-            'description': alert.description,
-            'severity': alert.severity,
-            'source_ip': str(alert.source_ip) if alert.source_ip else None,
-            'destination_ip': str(alert.destination_ip) if alert.destination_ip else None,
-            'affected_user': alert.affected_user,
-            'affected_asset': alert.affected_asset,
-            'raw_log': alert.raw_log,
-        }
+        alert_data = build_alert_data(alert)
         
-        # Build script path
-        script_path = os.path.join(settings.PLAYBOOK_SCRIPTS_DIR, playbook.script_path)
+        # Serve idempotent playbooks from the result cache
+        result_cache = PlaybookResultCache()
+        cached = result_cache.get(playbook, alert_data)
+        if cached is not None:
+            execution.status = 'CACHED'
+            execution.output = cached['output']
+            execution.actions_taken = cached['actions_taken']
+            execution.cached_from_id = cached['execution_id']
+            execution.completed_at = timezone.now()
+            execution.save()
+            record_metrics([execution])
+            
+            # Cache hits are not runs, keep them out of execution/success counts
+            Playbook.objects.filter(id=playbook.id).update(cache_hit_count=F('cache_hit_count') + 1)
+            
+            return f"Playbook execution {execution_id} served from cache"
         
-        if not os.path.exists(script_path):
-            raise FileNotFoundError(f"Script not found: {script_path}")
+        # Coalesce batchable playbooks into one script run per window
+        if playbook.batchable and alert_data.get(playbook.batch_target_field):
+            if PlaybookBatcher().enqueue(execution):
+                flush_playbook_batch.apply_async(
+                    (playbook.id,),
+                    countdown=playbook.batch_window_seconds
+                )
+            return f"Playbook execution {execution_id} queued for batch"
         
-        # Execute script
-        process = subprocess.Popen(
-            ['python', script_path],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            timeout=playbook.timeout_seconds
-        )
+        # Over the playbook's concurrency or rate limit: back in the queue
+        retry_after = throttle.acquire(playbook, execution.id)
+        if retry_after:
+            return defer_execution(execution, retry_after)
         
-        stdout, stderr = process.communicate(input=json.dumps(alert_data))
+        # Hand the script what the shared enrichment cache already knows
+        enrichment_cache = EnrichmentCache() if playbook.enrichment_cache else None
+        if enrichment_cache:
+            alert_data['enrichment_cache'] = lookup_enrichment(enrichment_cache, [alert_data])
         
-        # Update playbook statistics
-        playbook.execution_count += 1
+        # Execute script
+        try:
+            run = run_script(playbook, alert_data)
+        finally:
+            throttle.release(playbook, execution.id)
+        execution.peak_rss_kb = run.peak_rss_kb
+        execution.cpu_time_seconds = run.cpu_time_seconds
         
-        if process.returncode == 0:
+        if run.returncode == 0:
             # Success
-            result = json.loads(stdout)
+            result = json.loads(run.stdout)
             execution.status = 'SUCCESS'
             execution.output = result.get('output', '')
             execution.actions_taken = result.get('actions_taken', [])
-            playbook.success_count += 1
+            
+            if result.get('status', 'SUCCESS') == 'SUCCESS':
+                result_cache.set(playbook, alert_data, execution)
         else:
             # Failure
             execution.status = 'FAILED'
-            execution.error_message = stderr
-            playbook.failure_count += 1
+            execution.error_message = run.stderr
         
         execution.completed_at = timezone.now()
         execution.save()
-        playbook.save()
         
-        return f"Playbook execution {execution_id} completed"
+        # Update playbook statistics in the database: other runs and edits
+        # made while this one ran must not be overwritten by a stale instance
+        succeeded = execution.status == 'SUCCESS'
+        Playbook.objects.filter(id=playbook.id).update(
+            execution_count=F('execution_count') + 1,
+            success_count=F('success_count') + (1 if succeeded else 0),
+            failure_count=F('failure_count') + (0 if succeeded else 1),
+        )
+        record_metrics([execution])
         
-    except subprocess.TimeoutExpired:
+        if enrichment_cache and execution.status == 'SUCCESS':
+            store_enrichment(enrichment_cache, result.get('enrichment', {}))
+        
+        return f"Playbook execution {execution_id} completed"
+    
+    except subprocess.TimeoutExpired as e:
         execution.status = 'TIMEOUT'
         execution.error_message = 'Execution timed out'
+        execution.peak_rss_kb = getattr(e, 'peak_rss_kb', None)
+        execution.cpu_time_seconds = getattr(e, 'cpu_time_seconds', None)
         execution.completed_at = timezone.now()
         execution.save()
+        record_metrics([execution])
         return f"Playbook execution {execution_id} timed out"
-        
+    
     except Exception as e:
         execution.status = 'FAILED'
         execution.error_message = str(e)
         execution.completed_at = timezone.now()
         execution.save()
-        return f"Playbook execution {execution_id} failed: {str(e)}"
\ No newline at end of file
+        record_metrics([execution])
+        return f"Playbook execution {execution_id} failed: {str(e)}"
+
+
+def lookup_enrichment(enrichment_cache, alerts):
+    """Cached provider results for the alerts' IOCs, none if the cache can't be read"""
+    try:
+        return enrichment_cache.lookup(alerts)
+    except Exception:
+        # The cache is an optimization: without it the script asks the providers
+        logger.warning("Could not look up enrichment results in the cache", exc_info=True)
+        return {}
+
+
+def store_enrichment(enrichment_cache, enrichment):
+    """Write a run's provider results back to the shared cache, once its execution is saved"""
+    try:
+        enrichment_cache.store(enrichment)
+    except Exception:
+        # The cache is an optimization: a failure here must not fail the execution
+        logger.exception("Could not store enrichment results in the cache")
+
+
+def record_metrics(executions):
+    """Add finished executions to the playbook daily metrics, without failing them if that errors"""
+    try:
+        PlaybookMetrics().record(executions)
+    except Exception:
+        # The executions are saved; rebuild_playbook_metrics recounts the day from them
+        logger.exception("Could not record playbook execution metrics")
+
+
+def defer_execution(execution, retry_after):
+    """Put an execution over its playbook's limits back in the queue, pending"""
+    execution.status = 'PENDING'
+    execution.started_at = None
+    execution.save(update_fields=['status', 'started_at'])
+    
+    execute_playbook_script.apply_async((execution.id,), countdown=retry_after)
+    return f"Playbook execution {execution.id} deferred for {retry_after:.1f}s"
+
+
+@shared_task
+def compact_playbook_executions():
+    """Delete expired executions, then summarize and archive old execution results"""
+    retention = ExecutionRetention()
+    deleted = retention.purge()
+    compacted = retention.compact()
+    return f"Compacted {compacted} and deleted {deleted} playbook executions"
+
+
+@shared_task
+def flush_playbook_batch(playbook_id):
+    """Run a batchable playbook once for every execution collected in its window"""
+    playbook = Playbook.objects.get(id=playbook_id)
+    
+    # The whole batch is one run against the playbook's limits; while it is
+    # deferred its executions stay queued and keep collecting new ones
+    batch_id = uuid.uuid4().hex
+    throttle = PlaybookThrottle()
+    retry_after = throttle.acquire(playbook, f"batch:{batch_id}")
+    if retry_after:
+        PlaybookBatcher().postpone(playbook, retry_after)
+        flush_playbook_batch.apply_async((playbook_id,), countdown=retry_after)
+        return f"Batch for playbook {playbook_id} deferred for {retry_after:.1f}s"
+    
+    try:
+        return run_playbook_batch(playbook, batch_id)
+    finally:
+        throttle.release(playbook, f"batch:{batch_id}")
+
+
+@shared_task
+def sweep_playbook_batches():
+    """Flush batch windows whose flush task never ran, so their executions don't stay RUNNING"""
+    playbook_ids = PlaybookBatcher().overdue()
+    for playbook_id in playbook_ids:
+        flush_playbook_batch.delay(playbook_id)
+    return f"Flushed {len(playbook_ids)} overdue playbook batches"
+
+
+def run_playbook_batch(playbook, batch_id):
+    """Drain the playbook's batch queue and run the script once over it"""
+    execution_ids = PlaybookBatcher().drain(playbook)
+    executions = list(
+        PlaybookExecution.objects.filter(id__in=execution_ids).select_related('alert')
+    )
+    
+    if not executions:
+        return f"No executions queued for playbook {playbook.id}"
+    
+    # Dedupe targets across alerts, keeping first-seen order
+    alerts = []
+    targets = {}
+    for execution in executions:
+        alert_data = build_alert_data(execution.alert)
+        alerts.append(alert_data)
+        execution.target = alert_data.get(playbook.batch_target_field)
+        targets.setdefault(execution.target, None)
+    
+    payload = {
+        'batch_id': batch_id,
+        'targets': list(targets),
+        'alerts': alerts,
+    }
+    enrichment_cache = EnrichmentCache() if playbook.enrichment_cache else None
+    
+    run = None
+    try:
+        if enrichment_cache:
+            payload['enrichment_cache'] = lookup_enrichment(enrichment_cache, alerts)
+        
+        run = run_script(playbook, payload)
+        
+        if run.returncode == 0:
+            result = json.loads(run.stdout)
+            status, error_message = 'SUCCESS', ''
+        else:
+            result = {}
+            status, error_message = 'FAILED', run.stderr
+    
+    except subprocess.TimeoutExpired:
+        result = {}
+        status, error_message = 'TIMEOUT', 'Execution timed out'
+    
+    except Exception as e:
+        result = {}
+        status, error_message = 'FAILED', str(e)
+    
+    # Fan results back out to each original execution, per alert where the
+    # script reports it and per target otherwise
+    completed_at = timezone.now()
+    for execution in executions:
+        execution.status = status
+        execution.batch_id = batch_id
+        execution.error_message = error_message
+        execution.output = result.get('output', '')
+        execution.actions_taken = [
+            action for action in result.get('actions_taken', [])
+            if (
+                action['alert_id'] == execution.alert.alert_id if 'alert_id' in action
+                else action.get('target', execution.target) == execution.target
+            )
+        ]
+        execution.completed_at = completed_at
+        
+        # Resource usage belongs to the shared run
+        if run is not None:
+            execution.peak_rss_kb = run.peak_rss_kb
+            execution.cpu_time_seconds = run.cpu_time_seconds
+    
+    PlaybookExecution.objects.bulk_update(
+        executions,
+        [
+            'status', 'batch_id', 'error_message', 'output', 'actions_taken', 'completed_at',
+            'peak_rss_kb', 'cpu_time_seconds',
+        ]
+    )
+    record_metrics(executions)
+    
+    if enrichment_cache and status == 'SUCCESS':
+        store_enrichment(enrichment_cache, result.get('enrichment', {}))
+    
+    # Update playbook statistics, one run per original execution
+    if run is not None:
+        successful = len(executions) if run.returncode == 0 else 0
+        Playbook.objects.filter(id=playbook.id).update(
+            execution_count=F('execution_count') + len(executions),
+            success_count=F('success_count') + successful,
+            failure_count=F('failure_count') + (len(executions) - successful),
+        )
+    
+    return f"Batch {batch_id} ran {len(executions)} executions for {len(targets)} targets"
+
+
+def dispatch_workflow(execution, records):
+    """Run every step that is ready as one chord, or finish the workflow when none are"""
+    workflow = Workflow(execution.playbook.workflow)
+    alert_data = build_alert_data(execution.alert)
+    
+    header = []
+    while not header:
+        ready = workflow.next_steps(alert_data, records)
+        if not ready:
+            return finish_workflow(execution, workflow, records)
+        
+        for step_id in ready:
+            items = workflow.items(step_id, alert_data, records)
+            if items is None:
+                header.append(run_workflow_step.s(execution.id, step_id, records))
+            elif not items:
+                records[step_id] = {'status': 'SUCCESS', 'items': [], 'duration_ms': 0}
+            else:
+                # Fan-out: one task per item, all in the same chord
+                header.extend(
+                    run_workflow_step.s(execution.id, step_id, records, item=item, index=index)
+                    for index, item in enumerate(items)
+                )
+    
+    execution.step_results = records
+    execution.save(update_fields=['step_results'])
+    
+    # A step task that raises never returns its record, so the callback
+    # can't run; the error callback fails the workflow instead of leaving it RUNNING
+    chord(header)(
+        advance_workflow.s(execution.id, records).on_error(fail_workflow.s(execution.id))
+    )
+
+
+@shared_task
+def run_workflow_step(execution_id, step_id, records, item=None, index=None):
+    """Run one workflow step (or one fan-out item) and return its record"""
+    execution = PlaybookExecution.objects.select_related('playbook', 'alert').get(id=execution_id)
+    step = Workflow(execution.playbook.workflow).steps[step_id]
+    
+    payload = build_alert_data(execution.alert)
+    payload['workflow'] = {'execution_id': execution_id, 'step': step_id, 'steps': records}
+    if index is not None:
+        payload['item'] = item
+    
+    record = {'step': step_id, 'started_at': timezone.now().isoformat()}
+    if index is not None:
+        record.update(index=index, item=item)
+    
+    started = time.perf_counter()
+    try:
+        run = run_script(execution.playbook, payload, script_path=step['script'])
+        record.update(peak_rss_kb=run.peak_rss_kb, cpu_time_seconds=run.cpu_time_seconds)
+        
+        if run.returncode == 0:
+            result = json.loads(run.stdout)
+            record.update(
+                status='SUCCESS' if result.get('status', 'SUCCESS') == 'SUCCESS' else 'FAILED',
+                output=result.get('output', ''),
+                actions_taken=result.get('actions_taken', []),
+                result={
+                    key: value for key, value in result.items()
+                    if key not in ('status', 'output', 'actions_taken')
+                },
+            )
+        else:
+            record.update(status='FAILED', error=run.stderr[-2000:])
+    
+    except subprocess.TimeoutExpired:
+        record.update(status='TIMEOUT', error='Execution timed out')
+    
+    except Exception as e:
+        record.update(status='FAILED', error=str(e))
+    
+    record['completed_at'] = timezone.now().isoformat()
+    record['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return record
+
+
+@shared_task
+def advance_workflow(results, execution_id, records):
+    """Chord callback: fold the finished steps into the records and dispatch what is now ready"""
+    fanned_out = {}
+    for record in results:
+        step_id = record.pop('step')
+        if 'index' in record:
+            fanned_out.setdefault(step_id, []).append(record)
+        else:
+            records[step_id] = record
+    
+    # Items run in parallel, so the step lasts from the first start to the last finish
+    for step_id, items in fanned_out.items():
+        items.sort(key=lambda item: item['index'])
+        failed = [item for item in items if item['status'] != 'SUCCESS']
+        started = min(item['started_at'] for item in items)
+        completed = max(item['completed_at'] for item in items)
+        records[step_id] = {
+            'status': failed[0]['status'] if failed else 'SUCCESS',
+            'started_at': started,
+            'completed_at': completed,
+            'duration_ms': max(item['duration_ms'] for item in items),
+            'items': items,
+        }
+    
+    execution = PlaybookExecution.objects.select_related('playbook', 'alert').get(id=execution_id)
+    dispatch_workflow(execution, records)
+
+
+@shared_task
+def fail_workflow(request, exc, traceback, execution_id):
+    """Chord error callback: a step (or advancing the workflow) raised, fail the whole run"""
+    execution = PlaybookExecution.objects.select_related('playbook').get(id=execution_id)
+    if execution.status != 'RUNNING':
+        return f"Workflow execution {execution_id} already finished"
+    
+    execution.status = 'FAILED'
+    execution.error_message = f"Workflow step raised: {exc!r}"
+    execution.completed_at = timezone.now()
+    execution.save(update_fields=['status', 'error_message', 'completed_at'])
+    PlaybookThrottle().release(execution.playbook, execution.id)
+    record_metrics([execution])
+    
+    Playbook.objects.filter(id=execution.playbook_id).update(
+        execution_count=F('execution_count') + 1,
+        failure_count=F('failure_count') + 1,
+    )
+    return f"Workflow execution {execution_id} failed"
+
+
+def finish_workflow(execution, workflow, records):
+    """Record the workflow's overall result, timing and critical path"""
+    playbook = execution.playbook
+    step_records = []
+    for step_id in workflow.order():
+        record = records[step_id]
+        step_records.extend(record.get('items') or [record])
+    
+    actions = []
+    for step_id in workflow.order():
+        for record in records[step_id].get('items') or [records[step_id]]:
+            actions.extend(dict(action, step=step_id) for action in record.get('actions_taken', []))
+    
+    failed = [step_id for step_id in workflow.order() if records[step_id]['status'] in ('FAILED', 'TIMEOUT')]
+    skipped = [step_id for step_id in workflow.order() if records[step_id]['status'] == 'SKIPPED']
+    critical_path = workflow.critical_path(records)
+    
+    execution.status = 'FAILED' if failed else 'SUCCESS'
+    execution.error_message = '\n'.join(
+        f"{step_id}: {records[step_id].get('error') or records[step_id]['status']}" for step_id in failed
+    )
+    execution.actions_taken = actions
+    execution.output = (
+        f"Workflow ran {len(workflow.steps) - len(skipped)} of {len(workflow.steps)} steps; "
+        f"critical path {' -> '.join(critical_path['steps'])} ({critical_path['duration_ms']} ms)"
+    )
+    execution.step_results = records
+    execution.critical_path = critical_path
+    execution.peak_rss_kb = max((r['peak_rss_kb'] for r in step_records if r.get('peak_rss_kb')), default=None)
+    execution.cpu_time_seconds = sum(r.get('cpu_time_seconds') or 0 for r in step_records) or None
+    execution.completed_at = timezone.now()
+    execution.save()
+    PlaybookThrottle().release(playbook, execution.id)
+    record_metrics([execution])
+    
+    Playbook.objects.filter(id=playbook.id).update(
+        execution_count=F('execution_count') + 1,
+        success_count=F('success_count') + (0 if failed else 1),
+        failure_count=F('failure_count') + (1 if failed else 0),
+    )
+    
+    return f"Workflow execution {execution.id} finished: {execution.status}"
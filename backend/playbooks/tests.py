@@ -1,3 +1,578 @@
-from django.test import TestCase
+import gzip
+import importlib.util
+import json
+import os
+import sys
+import textwrap
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-# Create your tests here.
+import pytest
+from django.conf import settings
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from alerts.models import Alert
+from analytics.enrichment import EnrichmentCache
+from playbooks import tasks
+from playbooks.batching import PlaybookBatcher
+from playbooks.cache import PlaybookResultCache
+from playbooks.executor import ScriptResult, ScriptTimeout, build_alert_data, run_script
+from playbooks.metrics import PlaybookMetrics
+from playbooks.models import Playbook, PlaybookExecution
+from playbooks.registry import ScriptRegistry, _entries
+from playbooks.throttle import PlaybookThrottle
+from playbooks.retention import ExecutionRetention
+
+
+def load_script(relative_path):
+    """Import a playbook script as a module, the way tests call it in-process"""
+    path = settings.PLAYBOOK_SCRIPTS_DIR / relative_path
+    spec = importlib.util.spec_from_file_location(path.stem, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def enrich_ioc():
+    return load_script('investigation/enrich_ioc.py')
+
+
+@pytest.fixture
+def redis():
+    """The platform's Redis, with the enrichment rate limit buckets emptied"""
+    connection = get_redis_connection('default')
+    for key in connection.scan_iter('enrichment-rate:*'):
+        connection.delete(key)
+    return connection
+
+
+@pytest.fixture
+def stub_provider():
+    """Local stand-in for the VirusTotal API that counts the requests it serves"""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        paths = []
+        
+        def do_GET(self):
+            Handler.paths.append(self.path)
+            body = json.dumps({
+                'data': {'attributes': {'last_analysis_stats': {'malicious': 3, 'harmless': 57}}}
+            }).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, *args):
+            pass
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}", Handler.paths
+    server.shutdown()
+    server.server_close()
+
+
+class TestEnrichmentRateLimit:
+    """Test the enrichment providers' token buckets"""
+    
+    def test_quota_is_shared_across_runs(self, enrich_ioc, redis):
+        """Test two runs draw on one bucket per provider"""
+        first = enrich_ioc.TokenBucket('virustotal', 4, redis=redis)
+        second = enrich_ioc.TokenBucket('virustotal', 4, redis=redis)
+        
+        assert [first.acquire(max_wait=0) for _ in range(3)] == [True, True, True]
+        assert second.acquire(max_wait=0)
+        assert not second.acquire(max_wait=0)
+        assert not first.acquire(max_wait=0)
+    
+    def test_providers_have_separate_buckets(self, enrich_ioc, redis):
+        """Test one provider's quota does not use up another's"""
+        virustotal = enrich_ioc.TokenBucket('virustotal', 1, redis=redis)
+        abuseipdb = enrich_ioc.TokenBucket('abuseipdb', 1, redis=redis)
+        
+        assert virustotal.acquire(max_wait=0)
+        assert not virustotal.acquire(max_wait=0)
+        assert abuseipdb.acquire(max_wait=0)
+    
+    def test_tokens_refill_at_the_quota_rate(self, enrich_ioc, redis):
+        """Test acquire waits for the next token rather than failing"""
+        bucket = enrich_ioc.TokenBucket('virustotal', 600, capacity=1, redis=redis)
+        assert bucket.acquire(max_wait=0)
+        
+        started = time.monotonic()
+        assert bucket.acquire(max_wait=1)
+        assert time.monotonic() - started >= 0.05
+    
+    def test_without_redis_only_the_run_is_limited(self, enrich_ioc, monkeypatch):
+        """Test the bucket falls back to this process when there is no Redis to share"""
+        monkeypatch.setattr(enrich_ioc, 'shared_redis', lambda: None)
+        bucket = enrich_ioc.TokenBucket('virustotal', 2)
+        
+        assert bucket.redis is None
+        assert [bucket.acquire(max_wait=0) for _ in range(3)] == [True, True, False]
+    
+    def test_lookups_past_the_quota_are_not_sent(self, enrich_ioc, redis, stub_provider, monkeypatch):
+        """Test a second execution finds the quota used up by the first"""
+        url, paths = stub_provider
+        monkeypatch.setattr(enrich_ioc, 'MAX_RATE_LIMIT_WAIT', 0)
+        
+        def get_providers():
+            provider = enrich_ioc.VirusTotal('test-key', url, 2)
+            provider.bucket = enrich_ioc.TokenBucket(provider.name, 2, redis=redis)
+            return [provider]
+        monkeypatch.setattr(enrich_ioc, 'get_providers', get_providers)
+        
+        alert_data = {'alert_id': 'ALERT-1', 'indicators_of_compromise': ['1.1.1.1', '2.2.2.2', '3.3.3.3']}
+        first = enrich_ioc.main(alert_data)['enrichment']
+        outcomes = sorted(first[ip]['virustotal']['success'] for ip in ('1.1.1.1', '2.2.2.2', '3.3.3.3'))
+        assert outcomes == [False, True, True]
+        assert len(paths) == 2
+        
+        second = enrich_ioc.main(alert_data)['enrichment']
+        assert all(
+            second[ip]['virustotal']['data'] == 'virustotal rate limit exceeded'
+            for ip in ('1.1.1.1', '2.2.2.2', '3.3.3.3')
+        )
+        assert len(paths) == 2
+    
+    def test_providers_do_not_wait_on_each_other(self, enrich_ioc, monkeypatch):
+        """Test lookups waiting for one provider's quota don't hold up another provider's lookups"""
+        ips = [f'1.1.1.{index}' for index in range(enrich_ioc.MAX_WORKERS + 2)]
+        abuseipdb_done = threading.Event()
+        looked_up = []
+        
+        def virustotal_lookup(self, ioc_type, values):
+            # Stands in for lookups blocked until the quota refills
+            abuseipdb_done.wait(5)
+            return {value: (False, 'virustotal rate limit exceeded') for value in values}
+        
+        def abuseipdb_lookup(self, ioc_type, values):
+            looked_up.extend(values)
+            if len(looked_up) == len(ips):
+                abuseipdb_done.set()
+            return {value: (True, {'abuse_confidence_score': 0}) for value in values}
+        monkeypatch.setattr(enrich_ioc.VirusTotal, 'lookup', virustotal_lookup)
+        monkeypatch.setattr(enrich_ioc.AbuseIPDB, 'lookup', abuseipdb_lookup)
+        
+        started = time.monotonic()
+        enrichment = enrich_ioc.main({'alert_id': 'ALERT-1', 'indicators_of_compromise': ips})['enrichment']
+        
+        assert time.monotonic() - started < 4
+        assert all(enrichment[ip]['abuseipdb']['success'] for ip in ips)
+
+
+@pytest.fixture
+def old_executions(db):
+    """Finished executions old enough to be compacted"""
+    playbook = Playbook.objects.create(
+        name='Block IP', description='Test playbook', playbook_type='CONTAINMENT',
+        script_path='containment/block_ip.py'
+    )
+    alert = Alert.objects.create(
+        alert_id='ALERT-RETENTION', title='Test alert', description='Test alert',
+        severity='HIGH', source_system='TestSIEM', detected_at=timezone.now()
+    )
+    executions = [
+        PlaybookExecution.objects.create(
+            playbook=playbook, alert=alert, status='SUCCESS', output=f'output {index}',
+            actions_taken=[{'action': 'block_ip', 'success': True}]
+        )
+        for index in range(3)
+    ]
+    PlaybookExecution.objects.update(created_at=timezone.now() - timedelta(days=60))
+    return executions
+
+
+def read_archive(archive_dir):
+    return [
+        json.loads(line)
+        for path in sorted(archive_dir.glob('*.jsonl.gz'))
+        for line in gzip.open(path, 'rt', encoding='utf-8')
+    ]
+
+
+@pytest.mark.django_db
+class TestExecutionArchive:
+    """Test compaction only archives executions whose chunk committed"""
+    
+    def test_archive_is_written_on_commit(self, old_executions, settings, tmp_path,
+                                          django_capture_on_commit_callbacks):
+        """Test the archive gets the dropped fields once the chunk commits"""
+        settings.PLAYBOOK_EXECUTION_ARCHIVE_DIR = str(tmp_path)
+        
+        with django_capture_on_commit_callbacks() as callbacks:
+            assert ExecutionRetention().compact() == 3
+            assert read_archive(tmp_path) == []
+        for callback in callbacks:
+            callback()
+        
+        records = read_archive(tmp_path)
+        assert sorted(record['output'] for record in records) == ['output 0', 'output 1', 'output 2']
+        assert list(tmp_path.glob('*.pending')) == []
+    
+    def test_rolled_back_chunk_is_not_archived(self, old_executions, settings, tmp_path, monkeypatch,
+                                               django_capture_on_commit_callbacks):
+        """Test a chunk whose update fails leaves nothing in the archive"""
+        settings.PLAYBOOK_EXECUTION_ARCHIVE_DIR = str(tmp_path)
+        
+        def fail(*args, **kwargs):
+            raise RuntimeError('database went away')
+        monkeypatch.setattr(PlaybookExecution.objects, 'bulk_update', fail)
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            with pytest.raises(RuntimeError):
+                ExecutionRetention().compact()
+        
+        assert read_archive(tmp_path) == []
+        assert list(tmp_path.glob('*.pending')) == []
+        assert not PlaybookExecution.objects.filter(compacted_at__isnull=False).exists()
+    
+    def test_pending_files_are_recovered(self, old_executions, settings, tmp_path):
+        """Test leftover pending files are published if their chunk committed and dropped if not"""
+        settings.PLAYBOOK_EXECUTION_ARCHIVE_DIR = str(tmp_path)
+        retention = ExecutionRetention()
+        committed = retention._stage(old_executions[:1])
+        lost = retention._stage(old_executions[1:])
+        PlaybookExecution.objects.filter(id=old_executions[0].id).update(compacted_at=timezone.now())
+        
+        stale = time.time() - retention.PENDING_GRACE_SECONDS - 1
+        for path in committed + lost:
+            os.utime(path, (stale, stale))
+        retention._recover_pending()
+        
+        assert [record['id'] for record in read_archive(tmp_path)] == [old_executions[0].id]
+        assert list(tmp_path.glob('*.pending')) == []
+    
+    def test_published_pending_files_are_not_appended_twice(self, old_executions, settings, tmp_path):
+        """Test a pending file left by a crash after it was appended is only removed"""
+        settings.PLAYBOOK_EXECUTION_ARCHIVE_DIR = str(tmp_path)
+        retention = ExecutionRetention()
+        earlier = retention._stage(old_executions[1:])
+        retention._publish(earlier)
+        staged = retention._stage(old_executions[:1])
+        PlaybookExecution.objects.update(compacted_at=timezone.now())
+        
+        # The crash: appended to the day's archive, but not unlinked
+        for path in staged:
+            with open(retention._archive(path), 'ab') as archive:
+                archive.write(path.read_bytes())
+            stale = time.time() - retention.PENDING_GRACE_SECONDS - 1
+            os.utime(path, (stale, stale))
+        retention._recover_pending()
+        
+        assert sorted(record['id'] for record in read_archive(tmp_path)) == sorted(
+            execution.id for execution in old_executions
+        )
+        assert list(tmp_path.glob('*.pending')) == []
+
+
+@pytest.fixture
+def failing_metrics(monkeypatch):
+    """PlaybookMetrics whose database write fails"""
+    def fail(self, executions):
+        raise RuntimeError('metrics table is locked')
+    monkeypatch.setattr(PlaybookMetrics, 'record', fail)
+
+
+def make_execution(**playbook_fields):
+    playbook = Playbook.objects.create(
+        name='Block IP', description='Test playbook', playbook_type='CONTAINMENT',
+        script_path='containment/block_ip.py', **playbook_fields
+    )
+    alert = Alert.objects.create(
+        alert_id='ALERT-METRICS', title='Test alert', description='Test alert', severity='HIGH',
+        source_system='TestSIEM', source_ip='192.168.1.100', detected_at=timezone.now()
+    )
+    return PlaybookExecution.objects.create(playbook=playbook, alert=alert)
+
+
+@pytest.mark.django_db
+class TestExecutionMetrics:
+    """Test recording execution metrics never changes an execution's outcome"""
+    
+    def test_successful_run_stays_successful(self, failing_metrics, monkeypatch, caplog):
+        """Test a run that succeeded is saved as SUCCESS when its metrics can't be recorded"""
+        execution = make_execution()
+        monkeypatch.setattr(tasks, 'run_script', lambda playbook, payload: ScriptResult(
+            0, json.dumps({'status': 'SUCCESS', 'output': 'Blocked', 'actions_taken': []}), '', 1024, 0.01
+        ))
+        
+        tasks.execute_playbook_script(execution.id)
+        
+        execution.refresh_from_db()
+        assert (execution.status, execution.output) == ('SUCCESS', 'Blocked')
+        assert execution.playbook.success_count == 1
+        assert 'Could not record playbook execution metrics' in caplog.text
+    
+    def test_cache_hit_stays_cached(self, failing_metrics):
+        """Test a result served from the cache is saved as CACHED when its metrics can't be recorded"""
+        execution = make_execution(cacheable=True)
+        cache = PlaybookResultCache()
+        cache.set(execution.playbook, build_alert_data(execution.alert), execution)
+        
+        tasks.execute_playbook_script(execution.id)
+        
+        execution.refresh_from_db()
+        assert execution.status == 'CACHED'
+        assert execution.playbook.cache_hit_count == 1
+    
+    def test_counters_made_during_a_run_are_kept(self, monkeypatch):
+        """Test a run adds to the playbook's counters instead of saving the copy it loaded"""
+        execution = make_execution()
+        
+        def run_script(playbook, payload):
+            Playbook.objects.filter(id=playbook.id).update(execution_count=5, success_count=4, description='Edited')
+            return ScriptResult(0, json.dumps({'status': 'SUCCESS', 'output': 'Blocked'}), '', 1024, 0.01)
+        monkeypatch.setattr(tasks, 'run_script', run_script)
+        
+        tasks.execute_playbook_script(execution.id)
+        
+        playbook = Playbook.objects.get(id=execution.playbook_id)
+        assert (playbook.execution_count, playbook.success_count, playbook.description) == (6, 5, 'Edited')
+
+
+@pytest.mark.django_db
+class TestEnrichmentCache:
+    """Test the shared enrichment cache is only an optimization for playbook runs"""
+    
+    @pytest.fixture
+    def unreachable_cache(self, monkeypatch):
+        def unreachable(self, alerts):
+            raise ConnectionError('Redis went away')
+        monkeypatch.setattr(EnrichmentCache, 'lookup', unreachable)
+    
+    @pytest.fixture
+    def payloads(self, monkeypatch):
+        payloads = []
+        
+        def run_script(playbook, payload):
+            payloads.append(payload)
+            return ScriptResult(0, json.dumps({'status': 'SUCCESS', 'output': 'Enriched'}), '', 1024, 0.01)
+        monkeypatch.setattr(tasks, 'run_script', run_script)
+        return payloads
+    
+    def test_unreadable_cache_does_not_fail_the_run(self, unreachable_cache, payloads, caplog):
+        """Test a run goes ahead with no cached results when the cache lookup fails"""
+        execution = make_execution(enrichment_cache=True)
+        
+        tasks.execute_playbook_script(execution.id)
+        
+        execution.refresh_from_db()
+        assert execution.status == 'SUCCESS'
+        assert payloads[0]['enrichment_cache'] == {}
+        assert 'Could not look up enrichment results in the cache' in caplog.text
+    
+    def test_unreadable_cache_does_not_fail_the_batch(self, unreachable_cache, payloads):
+        """Test a batch goes ahead with no cached results when the cache lookup fails"""
+        execution = make_execution(enrichment_cache=True, batchable=True)
+        PlaybookBatcher().enqueue(execution)
+        
+        tasks.flush_playbook_batch(execution.playbook_id)
+        
+        execution.refresh_from_db()
+        assert execution.status == 'SUCCESS'
+        assert payloads[0]['enrichment_cache'] == {}
+
+
+@pytest.fixture
+def throttle():
+    """PlaybookThrottle with no leases left over from other tests"""
+    throttle = PlaybookThrottle()
+    for key in throttle.redis.scan_iter('playbook-inflight:*'):
+        throttle.redis.delete(key)
+    return throttle
+
+
+@pytest.mark.django_db
+class TestPlaybookThrottle:
+    """Test throttled executions always give back their in-flight lease"""
+    
+    def test_failed_workflow_step_releases_its_lease(self, throttle):
+        """Test the chord error callback fails the workflow, counts it and frees its slot"""
+        execution = make_execution(max_concurrent_executions=1)
+        PlaybookExecution.objects.filter(id=execution.id).update(status='RUNNING')
+        assert throttle.acquire(execution.playbook, execution.id) == 0
+        
+        tasks.fail_workflow(None, RuntimeError('worker lost'), None, execution.id)
+        tasks.fail_workflow(None, RuntimeError('worker lost'), None, execution.id)
+        
+        execution.refresh_from_db()
+        assert execution.status == 'FAILED'
+        assert 'worker lost' in execution.error_message
+        playbook = Playbook.objects.get(id=execution.playbook_id)
+        assert (playbook.execution_count, playbook.failure_count) == (1, 1)
+        assert throttle.stats([playbook])[playbook.id]['in_flight'] == 0
+    
+    def test_script_that_raises_releases_its_lease(self, throttle, monkeypatch):
+        """Test an execution whose script can't be run still frees its slot"""
+        execution = make_execution(max_concurrent_executions=1)
+        in_flight = []
+        
+        def run_script(playbook, payload):
+            in_flight.append(throttle.stats([playbook])[playbook.id]['in_flight'])
+            raise OSError('cannot start the script runner')
+        monkeypatch.setattr(tasks, 'run_script', run_script)
+        
+        tasks.execute_playbook_script(execution.id)
+        
+        execution.refresh_from_db()
+        assert execution.status == 'FAILED'
+        in_flight.append(throttle.stats([execution.playbook])[execution.playbook_id]['in_flight'])
+        assert in_flight == [1, 0]
+
+
+@pytest.mark.django_db
+class TestPlaybookBatches:
+    """Test batch windows are flushed even when their flush task is lost"""
+    
+    def test_sweep_flushes_overdue_windows_once(self, monkeypatch):
+        """Test the sweep re-arms a window past its grace period, and only once per grace period"""
+        batcher = PlaybookBatcher()
+        batcher.redis.delete(batcher.DUE_KEY)
+        alert = Alert.objects.create(
+            alert_id='ALERT-BATCH', title='Test alert', description='Test alert', severity='HIGH',
+            source_system='TestSIEM', source_ip='192.168.1.100', detected_at=timezone.now()
+        )
+        lost, pending = [
+            Playbook.objects.create(
+                name=name, description='Test playbook', playbook_type='CONTAINMENT',
+                script_path='containment/block_ip.py', batchable=True
+            )
+            for name in ('Block IP', 'Disable account')
+        ]
+        for playbook in (lost, pending):
+            batcher.enqueue(PlaybookExecution.objects.create(playbook=playbook, alert=alert))
+        batcher.redis.zadd(batcher.DUE_KEY, {lost.id: time.time() - batcher.SWEEP_GRACE_SECONDS - 1})
+        flushed = []
+        monkeypatch.setattr(tasks.flush_playbook_batch, 'delay', flushed.append)
+        
+        tasks.sweep_playbook_batches()
+        tasks.sweep_playbook_batches()
+        
+        assert flushed == [lost.id]
+
+
+@pytest.fixture
+def add_script(settings, tmp_path):
+    """Registers a script written to an otherwise empty PLAYBOOK_SCRIPTS_DIR"""
+    settings.PLAYBOOK_SCRIPTS_DIR = tmp_path / 'scripts'
+    
+    def add(script_path, source):
+        path = settings.PLAYBOOK_SCRIPTS_DIR / script_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(textwrap.dedent(source))
+        ScriptRegistry().scan()
+    yield add
+    
+    registry = ScriptRegistry()
+    registry.redis.delete(registry.KEY, registry.RESCAN_KEY)
+    _entries.clear()
+
+
+ECHO_SCRIPT = """
+    import json
+    import sys
+    
+    def main(alert_data):
+        return {'version': list(sys.version_info[:3])}
+    
+    if __name__ == '__main__':
+        print(json.dumps(main(json.load(sys.stdin))))
+"""
+
+
+def exits(pid, timeout=1):
+    """Whether the process is gone (or a zombie) within `timeout` seconds"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with open(f'/proc/{pid}/stat') as stat:
+                if stat.read().rsplit(')', 1)[1].split()[0] == 'Z':
+                    return True
+        except FileNotFoundError:
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestScriptExecution:
+    """Test playbook scripts run in their own process group and are reaped with their usage"""
+    
+    def test_exit_is_reaped_with_resource_usage(self, add_script):
+        """Test a finished script reports its exit code, output, CPU time and peak RSS"""
+        add_script('test/busy.py', """
+            import json
+            import sys
+            
+            def main(alert_data):
+                sum(range(2_000_000))
+                return {'status': 'FAILED', 'alert_id': alert_data['alert_id']}
+            
+            if __name__ == '__main__':
+                print(json.dumps(main(json.load(sys.stdin))))
+                sys.exit(3)
+        """)
+        playbook = Playbook(name='Busy', script_path='test/busy.py', timeout_seconds=10)
+        
+        result = run_script(playbook, {'alert_id': 'ALERT-BUSY'})
+        
+        assert result.returncode == 3
+        assert json.loads(result.stdout) == {'status': 'FAILED', 'alert_id': 'ALERT-BUSY'}
+        assert result.cpu_time_seconds > 0
+        assert result.peak_rss_kb > 0
+    
+    def test_runs_on_the_workers_interpreter(self, add_script, monkeypatch):
+        """Test scripts run on the interpreter that compiled them, not whichever python is on PATH"""
+        add_script('test/version.py', ECHO_SCRIPT)
+        monkeypatch.setenv('PATH', '/nonexistent')
+        
+        result = run_script(Playbook(name='Version', script_path='test/version.py'), {})
+        
+        assert json.loads(result.stdout) == {'version': list(sys.version_info[:3])}
+    
+    def test_bytecode_from_another_python_runs_the_source(self, add_script):
+        """Test a compiled script whose magic number doesn't match this interpreter runs from source"""
+        add_script('test/version.py', ECHO_SCRIPT)
+        compiled_path = ScriptRegistry().resolve('test/version.py')['compiled_path']
+        with open(compiled_path, 'r+b') as compiled:
+            # A header and code object another Python version would have written
+            header = compiled.read(16)
+            compiled.seek(0)
+            compiled.write(b'\x00\x00\r\n' + header[4:] + b'\xff not marshalled by this Python')
+        
+        result = run_script(Playbook(name='Version', script_path='test/version.py'), {})
+        
+        assert result.returncode == 0
+        assert json.loads(result.stdout) == {'version': list(sys.version_info[:3])}
+    
+    def test_children_left_running_are_killed(self, add_script, tmp_path):
+        """Test a script that exits leaving a child on its pipes times out at its deadline"""
+        pid_file = tmp_path / 'orphan.pid'
+        add_script('test/orphan.py', """
+            import json
+            import subprocess
+            import sys
+            
+            def main(alert_data):
+                child = subprocess.Popen(['sleep', '30'])
+                with open(alert_data['pid_file'], 'w') as pid_file:
+                    pid_file.write(str(child.pid))
+                return {'status': 'SUCCESS'}
+            
+            if __name__ == '__main__':
+                print(json.dumps(main(json.load(sys.stdin))))
+        """)
+        playbook = Playbook(name='Orphan', script_path='test/orphan.py', timeout_seconds=3)
+        
+        started = time.monotonic()
+        with pytest.raises(ScriptTimeout):
+            run_script(playbook, {'pid_file': str(pid_file)})
+        
+        assert time.monotonic() - started < 5
+        assert exits(int(pid_file.read_text()))
@@ -0,0 +1,129 @@
+import random
+import time
+from typing import Dict, Iterable
+from django.conf import settings
+from django_redis import get_redis_connection
+from playbooks.models import Playbook
+
+
+# Atomically: drop expired leases, timestamps and deferrals, then take a slot
+# if both limits allow it. Returns 0 on success, otherwise milliseconds to wait.
+ACQUIRE_SCRIPT = """
+local inflight, rate, deferred = KEYS[1], KEYS[2], KEYS[3]
+local now, lease_until, holder = tonumber(ARGV[1]), tonumber(ARGV[2]), ARGV[3]
+local max_concurrent, per_minute, retry_ms = tonumber(ARGV[4]), tonumber(ARGV[5]), tonumber(ARGV[6])
+
+redis.call('ZREMRANGEBYSCORE', inflight, '-inf', now)
+redis.call('ZREMRANGEBYSCORE', rate, '-inf', now - 60000)
+redis.call('ZREMRANGEBYSCORE', deferred, '-inf', now - 60000)
+
+if max_concurrent > 0 and redis.call('ZSCORE', inflight, holder) == false
+        and redis.call('ZCARD', inflight) >= max_concurrent then
+    return retry_ms
+end
+
+if per_minute > 0 and redis.call('ZCARD', rate) >= per_minute then
+    local oldest = redis.call('ZRANGE', rate, 0, 0, 'WITHSCORES')
+    return math.max(1, tonumber(oldest[2]) + 60000 - now)
+end
+
+redis.call('ZADD', inflight, lease_until, holder)
+redis.call('PEXPIREAT', inflight, lease_until)
+if per_minute > 0 then
+    redis.call('ZADD', rate, now, holder .. ':' .. now)
+    redis.call('PEXPIRE', rate, 60000)
+end
+redis.call('ZREM', deferred, holder)
+return 0
+"""
+
+
+class PlaybookThrottle:
+    """
+    Cluster-wide max in-flight executions and executions per minute, per playbook
+    
+    In-flight executions hold a lease in a Redis sorted set scored by when it
+    expires, so a worker that dies mid-run frees its slot after the
+    playbook's timeout. The per-minute limit is a sliding window of start
+    times. Executions over either limit are deferred, not failed.
+    """
+    
+    INFLIGHT_KEY = 'playbook-inflight:{playbook_id}'
+    RATE_KEY = 'playbook-rate:{playbook_id}'
+    DEFERRED_KEY = 'playbook-deferred:{playbook_id}'
+    STATS_KEY = 'playbook-throttle-stats'
+    
+    def __init__(self):
+        self.redis = get_redis_connection('default')
+        self._acquire = self.redis.register_script(ACQUIRE_SCRIPT)
+    
+    @staticmethod
+    def limited(playbook: Playbook) -> bool:
+        return bool(playbook.max_concurrent_executions or playbook.max_executions_per_minute)
+    
+    def acquire(self, playbook: Playbook, holder, lease_seconds: int = None) -> float:
+        """Take a slot for holder, returns 0 or the seconds to wait before trying again"""
+        if not self.limited(playbook):
+            return 0
+        
+        now_ms = int(time.time() * 1000)
+        lease_seconds = lease_seconds or playbook.timeout_seconds + settings.PLAYBOOK_THROTTLE_LEASE_MARGIN
+        wait_ms = self._acquire(
+            keys=[
+                self.INFLIGHT_KEY.format(playbook_id=playbook.id),
+                self.RATE_KEY.format(playbook_id=playbook.id),
+                self.DEFERRED_KEY.format(playbook_id=playbook.id),
+            ],
+            args=[
+                now_ms, now_ms + lease_seconds * 1000, str(holder),
+                playbook.max_concurrent_executions or 0,
+                playbook.max_executions_per_minute or 0,
+                settings.PLAYBOOK_THROTTLE_RETRY_SECONDS * 1000,
+            ]
+        )
+        if not wait_ms:
+            return 0
+        
+        # Jitter so deferred executions don't all come back at the same instant
+        retry_after = wait_ms / 1000 * random.uniform(1, 1.5)
+        
+        # Deferrals are scored by when they are due back, and forgotten a
+        # minute after that if the retry never reaches acquire (a cache hit)
+        deferred_key = self.DEFERRED_KEY.format(playbook_id=playbook.id)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zadd(deferred_key, {str(holder): now_ms + int(retry_after * 1000)})
+        pipe.pexpire(deferred_key, int(retry_after * 1000) + 60000)
+        pipe.hincrby(self.STATS_KEY, f"{playbook.id}:deferred", 1)
+        pipe.execute()
+        
+        return retry_after
+    
+    def release(self, playbook: Playbook, holder):
+        if self.limited(playbook):
+            self.redis.zrem(self.INFLIGHT_KEY.format(playbook_id=playbook.id), str(holder))
+    
+    def stats(self, playbooks: Iterable[Playbook]) -> Dict[int, Dict]:
+        """Current in-flight, deferred and per-minute counts for each playbook"""
+        playbooks = list(playbooks)
+        now_ms = int(time.time() * 1000)
+        
+        pipe = self.redis.pipeline(transaction=False)
+        for playbook in playbooks:
+            pipe.zcount(self.INFLIGHT_KEY.format(playbook_id=playbook.id), now_ms, '+inf')
+            pipe.zcount(self.DEFERRED_KEY.format(playbook_id=playbook.id), now_ms - 60000, '+inf')
+            pipe.zcount(self.RATE_KEY.format(playbook_id=playbook.id), now_ms - 60000, '+inf')
+            pipe.hget(self.STATS_KEY, f"{playbook.id}:deferred")
+        counts = pipe.execute()
+        
+        stats = {}
+        for index, playbook in enumerate(playbooks):
+            in_flight, deferred, last_minute, deferred_total = counts[index * 4:index * 4 + 4]
+            stats[playbook.id] = {
+                'max_concurrent_executions': playbook.max_concurrent_executions,
+                'max_executions_per_minute': playbook.max_executions_per_minute,
+                'in_flight': in_flight,
+                'started_last_minute': last_minute,
+                'deferred': deferred,
+                'deferred_total': int(deferred_total or 0),
+            }
+        return stats
@@ -1,12 +1,26 @@
 from rest_framework import viewsets, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
-from playbooks.models import Playbook, PlaybookExecution
-from playbooks.serializers import PlaybookSerializer, PlaybookExecutionSerializer
+from datetime import date, timedelta
+from playbooks.metrics import PlaybookMetrics
+from playbooks.models import Playbook, PlaybookDailyMetrics, PlaybookExecution
+from playbooks.serializers import PlaybookSerializer, PlaybookExecutionSerializer, PlaybookDailyMetricsSerializer
+from playbooks.registry import ScriptRegistry
+from playbooks.throttle import PlaybookThrottle
 from playbooks.tasks import execute_playbook_script
 
 
+def query_days(params, default_days=7):
+    """?from= and ?to= as dates, inclusive, defaulting to the last `default_days` days"""
+    end = date.fromisoformat(params['to']) if params.get('to') else timezone.localdate()
+    start = date.fromisoformat(params['from']) if params.get('from') else end - timedelta(days=default_days - 1)
+    if end < start:
+        raise ValueError("'to' is before 'from'")
+    return start, end
+
+
 class PlaybookViewSet(viewsets.ModelViewSet):
     queryset = Playbook.objects.all()
     serializer_class = PlaybookSerializer
@@ -41,10 +55,89 @@ class PlaybookViewSet(viewsets.ModelViewSet):
             'execution_id': execution.id,
             'status': 'Playbook execution started'
         })
+    
+    @action(detail=True, methods=['get'])
+    def throttle(self, request, pk=None):
+        """Limits, executions in flight and deferrals for this playbook"""
+        playbook = self.get_object()
+        return Response(PlaybookThrottle().stats([playbook])[playbook.id])
+    
+    @action(detail=False, methods=['get'], url_path='throttle')
+    def throttle_stats(self, request):
+        """Limits, executions in flight and deferrals for every playbook"""
+        playbooks = self.filter_queryset(self.get_queryset()).only(
+            'id', 'name', 'max_concurrent_executions', 'max_executions_per_minute'
+        )
+        stats = PlaybookThrottle().stats(playbooks)
+        return Response([dict(stats[playbook.id], id=playbook.id, name=playbook.name) for playbook in playbooks])
+    
+    @action(detail=True, methods=['get'])
+    def metrics(self, request, pk=None):
+        """This playbook's daily execution counts and durations, with totals over the range"""
+        playbook = self.get_object()
+        try:
+            start, end = query_days(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        
+        days = list(playbook.daily_metrics.filter(date__gte=start, date__lte=end))
+        return Response({
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'summary': PlaybookMetrics.summary(days),
+            'days': PlaybookDailyMetricsSerializer(days, many=True).data,
+        })
+    
+    @action(detail=False, methods=['get'], url_path='metrics')
+    def metrics_summary(self, request):
+        """
+        Execution counts and durations per playbook over a range of days
+        
+        ?from=<YYYY-MM-DD>&to=<YYYY-MM-DD>&ordering=-p90_duration_seconds finds
+        the slowest, ordering=success_rate the least reliable.
+        """
+        params = request.query_params
+        try:
+            start, end = query_days(params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        
+        days = {}
+        for row in PlaybookDailyMetrics.objects.filter(date__gte=start, date__lte=end):
+            days.setdefault(row.playbook_id, []).append(row)
+        playbooks = self.filter_queryset(self.get_queryset()).filter(id__in=days).only('id', 'name')
+        results = [
+            dict(PlaybookMetrics.summary(days[playbook.id]), id=playbook.id, name=playbook.name)
+            for playbook in playbooks
+        ]
+        
+        ordering = params.get('ordering')
+        if ordering:
+            field = ordering.lstrip('-')
+            if field not in PlaybookMetrics.summary([]):
+                return Response({'error': f"Cannot order by '{field}'"}, status=400)
+            # Playbooks without a value (no runs) sort last either way
+            ordered = sorted(
+                (result for result in results if result[field] is not None),
+                key=lambda result: result[field], reverse=ordering.startswith('-')
+            )
+            results = ordered + [result for result in results if result[field] is None]
+        
+        return Response(results)
+    
+    @action(detail=False, methods=['get'])
+    def registry(self, request):
+        """Registered scripts and playbooks whose script is missing or changed"""
+        return Response(ScriptRegistry().state())
+    
+    @action(detail=False, methods=['post'], url_path='registry/rescan')
+    def rescan_registry(self, request):
+        ScriptRegistry().scan()
+        return Response(ScriptRegistry().state())
 
 
 class PlaybookExecutionViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = PlaybookExecution.objects.all()
+    queryset = PlaybookExecution.objects.select_related('playbook', 'alert')
     serializer_class = PlaybookExecutionSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['status', 'playbook']
\ No newline at end of file
@@ -0,0 +1,178 @@
+from typing import Any, Dict, List, Optional
+from django.conf import settings
+from playbooks.registry import ScriptRegistry, ScriptRejected
+
+
+OPERATORS = {
+    'eq': lambda actual, expected: actual == expected,
+    'ne': lambda actual, expected: actual != expected,
+    'gt': lambda actual, expected: actual is not None and actual > expected,
+    'gte': lambda actual, expected: actual is not None and actual >= expected,
+    'lt': lambda actual, expected: actual is not None and actual < expected,
+    'lte': lambda actual, expected: actual is not None and actual <= expected,
+    'in': lambda actual, expected: actual in expected,
+    'contains': lambda actual, expected: actual is not None and expected in actual,
+    'exists': lambda actual, expected: (actual is not None) == (expected is not False),
+}
+
+# Step states that let dependents run; anything else skips them
+DONE_STATES = ('SUCCESS',)
+
+
+class Workflow:
+    """
+    A playbook defined as a DAG of script steps
+    
+    Definition (Playbook.workflow):
+    
+        {"steps": [
+            {"id": "enrich", "script": "investigation/enrich_ioc.py"},
+            {"id": "contain", "script": "containment/block_ip.py",
+             "depends_on": ["enrich"],
+             "condition": {"path": "steps.enrich.status", "op": "eq", "value": "SUCCESS"}},
+            {"id": "notify", "script": "notification/send_email.py",
+             "depends_on": ["contain"], "for_each": "alert.indicators_of_compromise"}
+        ]}
+    
+    Paths resolve against {"alert": alert_data, "steps": {id: step record}},
+    where a step record holds status, timing and the script's result.
+    Conditions can be combined with {"all": [...]} or {"any": [...]}.
+    A step whose condition is false, or whose dependency did not succeed,
+    is SKIPPED; its dependents are skipped in turn.
+    """
+    
+    def __init__(self, definition: Dict):
+        self.steps = {step['id']: step for step in definition.get('steps', [])}
+    
+    @classmethod
+    def validate(cls, definition: Dict) -> 'Workflow':
+        """Check ids, dependencies, acyclicity and scripts, raising ValueError"""
+        steps = definition.get('steps') if isinstance(definition, dict) else None
+        if not steps or not isinstance(steps, list):
+            raise ValueError("Workflow needs a non-empty 'steps' list")
+        
+        ids = [step.get('id') for step in steps]
+        if None in ids or len(set(ids)) != len(ids):
+            raise ValueError("Every step needs a unique 'id'")
+        
+        registry = ScriptRegistry()
+        for step in steps:
+            for dependency in step.get('depends_on', []):
+                if dependency not in ids:
+                    raise ValueError(f"Step '{step['id']}' depends on unknown step '{dependency}'")
+            try:
+                registry.inspect(step.get('script') or '')
+            except ScriptRejected as e:
+                raise ValueError(f"Step '{step['id']}': {e}")
+            for condition in cls._conditions(step.get('condition')):
+                if condition.get('op', 'eq') not in OPERATORS:
+                    raise ValueError(f"Step '{step['id']}' uses unknown operator '{condition['op']}'")
+        
+        workflow = cls(definition)
+        workflow.order()
+        return workflow
+    
+    def order(self) -> List[str]:
+        """Step ids in dependency order, raising ValueError on a cycle"""
+        ordered, visiting, visited = [], set(), set()
+        
+        def visit(step_id):
+            if step_id in visited:
+                return
+            if step_id in visiting:
+                raise ValueError(f"Workflow has a dependency cycle through '{step_id}'")
+            visiting.add(step_id)
+            for dependency in self.steps[step_id].get('depends_on', []):
+                visit(dependency)
+            visiting.discard(step_id)
+            visited.add(step_id)
+            ordered.append(step_id)
+        
+        for step_id in self.steps:
+            visit(step_id)
+        return ordered
+    
+    def next_steps(self, alert_data: Dict, records: Dict[str, Dict]) -> List[str]:
+        """Steps whose dependencies have all finished, marking skipped ones in records"""
+        ready = []
+        progressed = True
+        while progressed:
+            progressed = False
+            for step_id in self.order():
+                if step_id in records or step_id in ready:
+                    continue
+                dependencies = self.steps[step_id].get('depends_on', [])
+                if not all(dependency in records for dependency in dependencies):
+                    continue
+                
+                if any(records[dependency]['status'] not in DONE_STATES for dependency in dependencies):
+                    records[step_id] = {'status': 'SKIPPED', 'reason': 'dependency did not succeed'}
+                    progressed = True
+                elif not self.condition_met(self.steps[step_id].get('condition'), alert_data, records):
+                    records[step_id] = {'status': 'SKIPPED', 'reason': 'condition not met'}
+                    progressed = True
+                else:
+                    ready.append(step_id)
+        return ready
+    
+    def items(self, step_id: str, alert_data: Dict, records: Dict[str, Dict]) -> Optional[List]:
+        """Values a for_each step fans out over, None for a plain step"""
+        path = self.steps[step_id].get('for_each')
+        if not path:
+            return None
+        values = resolve(path, {'alert': alert_data, 'steps': records})
+        if isinstance(values, dict):
+            values = list(values)
+        return list(values or [])[:settings.WORKFLOW_MAX_FAN_OUT]
+    
+    def condition_met(self, condition: Optional[Dict], alert_data: Dict, records: Dict[str, Dict]) -> bool:
+        if not condition:
+            return True
+        if 'all' in condition:
+            return all(self.condition_met(part, alert_data, records) for part in condition['all'])
+        if 'any' in condition:
+            return any(self.condition_met(part, alert_data, records) for part in condition['any'])
+        
+        actual = resolve(condition['path'], {'alert': alert_data, 'steps': records})
+        try:
+            return OPERATORS[condition.get('op', 'eq')](actual, condition.get('value'))
+        except TypeError:
+            return False
+    
+    def critical_path(self, records: Dict[str, Dict]) -> Dict:
+        """Longest chain of dependent step durations, the floor on workflow latency"""
+        longest = {}
+        for step_id in self.order():
+            own = records.get(step_id, {}).get('duration_ms') or 0
+            best = max(
+                (longest[dependency] for dependency in self.steps[step_id].get('depends_on', [])),
+                key=lambda path: path[0],
+                default=(0, [])
+            )
+            longest[step_id] = (best[0] + own, best[1] + [step_id])
+        
+        duration_ms, steps = max(longest.values(), key=lambda path: path[0], default=(0, []))
+        return {'steps': steps, 'duration_ms': duration_ms}
+    
+    @classmethod
+    def _conditions(cls, condition: Optional[Dict]):
+        if not condition:
+            return
+        for key in ('all', 'any'):
+            if key in condition:
+                for part in condition[key]:
+                    yield from cls._conditions(part)
+                return
+        yield condition
+
+
+def resolve(path: str, data: Any) -> Any:
+    """Follow a dotted path through dicts and lists, None if any part is missing"""
+    for part in path.split('.'):
+        if isinstance(data, dict):
+            data = data.get(part)
+        elif isinstance(data, list) and part.isdigit() and int(part) < len(data):
+            data = data[int(part)]
+        else:
+            return None
+    return data
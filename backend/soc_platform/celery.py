@@ -1,6 +1,7 @@
 import os
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_ready
 
 # Set Django settings module
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'soc_platform.settings')
@@ -23,8 +24,56 @@ app.conf.beat_schedule = {
         'task': 'analytics.tasks.generate_daily_metrics',
         'schedule': crontab(hour=0, minute=30),  # 12:30 AM daily
     },
+    'flush-alert-rollups': {
+        'task': 'analytics.tasks.flush_alert_rollups',
+        'schedule': 10.0,  # applies alert counters buffered in Redis
+    },
+    'flush-response-times': {
+        'task': 'analytics.tasks.flush_response_times',
+        'schedule': 60.0,  # applies response time samples buffered in Redis
+    },
+    'detect-volume-anomalies': {
+        'task': 'analytics.tasks.detect_volume_anomalies',
+        'schedule': 60.0,  # alert volume spikes and silences per source system
+    },
+    'prune-alert-rollups': {
+        'task': 'analytics.tasks.prune_alert_rollups',
+        'schedule': crontab(hour=1, minute=0),  # 1 AM daily
+    },
+    'refresh-frequency-views': {
+        'task': 'analytics.tasks.refresh_frequency_views',
+        'schedule': 300.0,  # technique and tactic counts over 24h/7d/30d
+    },
+    'export-alert-snapshot': {
+        'task': 'analytics.tasks.export_alert_snapshot',
+        'schedule': crontab(hour=1, minute=30),  # 1:30 AM daily
+    },
+    'sweep-playbook-batches': {
+        'task': 'playbooks.tasks.sweep_playbook_batches',
+        'schedule': 60.0,  # flushes batch windows whose flush task was lost
+    },
+    'compact-playbook-executions': {
+        'task': 'playbooks.tasks.compact_playbook_executions',
+        'schedule': crontab(hour=3, minute=0),  # 3 AM daily
+    },
+    'sweep-notification-digests': {
+        'task': 'integrations.tasks.sweep_notification_digests',
+        'schedule': 60.0,  # flushes email digest windows whose flush task was lost
+    },
+    'flush-slack-notifications': {
+        'task': 'integrations.tasks.flush_slack_notifications',
+        'schedule': 60.0,  # retries queued Slack messages that are due
+    },
 }
 
+
+@worker_ready.connect
+def register_playbook_scripts(**kwargs):
+    """Scan, validate and precompile playbook scripts before taking work"""
+    from playbooks.registry import ScriptRegistry
+    ScriptRegistry().scan()
+
+
 @app.task(bind=True)
 def debug_task(self):
-    print(f'Request: {self.request!r}')
\ No newline at end of file
+    print(f'Request: {self.request!r}')
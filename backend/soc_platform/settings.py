@@ -116,6 +116,9 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_TASK_ROUTES = {
+    'integrations.tasks.*': {'queue': 'notifications'},
+}
 
 # Caching
 CACHES = {
@@ -172,6 +175,11 @@ ABUSEIPDB_API_KEY = config('ABUSEIPDB_API_KEY', default='')
 SHODAN_API_KEY = config('SHODAN_API_KEY', default='')
 ALIENVAULT_API_KEY = config('ALIENVAULT_API_KEY', default='')
 
+# Enrichment cache TTLs (seconds): Redis hits, ThreatIntelligence freshness, misses/errors
+ENRICHMENT_CACHE_TTL = config('ENRICHMENT_CACHE_TTL', default=3600, cast=int)
+ENRICHMENT_DB_TTL = config('ENRICHMENT_DB_TTL', default=86400, cast=int)
+ENRICHMENT_NEGATIVE_TTL = config('ENRICHMENT_NEGATIVE_TTL', default=300, cast=int)
+
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = config('EMAIL_HOST', default='smtp.gmail.com')
@@ -180,16 +188,76 @@ EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=True, cast=bool)
 EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='SOC Platform <noreply@socplatform.local>')
+EMAIL_TIMEOUT = config('EMAIL_TIMEOUT', default=30, cast=int)
+
+# Alert notifications (no recipients disables them); sent from a dedicated
+# `notifications` worker that keeps SMTP sessions open across messages
+NOTIFICATION_RECIPIENTS = config('NOTIFICATION_RECIPIENTS', default='', cast=Csv())
+NOTIFICATION_DIGEST_WINDOW = config('NOTIFICATION_DIGEST_WINDOW', default=60, cast=int)
+NOTIFICATION_IMMEDIATE_SEVERITIES = config('NOTIFICATION_IMMEDIATE_SEVERITIES', default='CRITICAL', cast=Csv())
+SMTP_POOL_SIZE = config('SMTP_POOL_SIZE', default=2, cast=int)
+SMTP_MAX_IDLE_SECONDS = config('SMTP_MAX_IDLE_SECONDS', default=60, cast=int)
 
 # Slack
 SLACK_WEBHOOK_URL = config('SLACK_WEBHOOK_URL', default='')
+SLACK_NOTIFICATION_WINDOW = config('SLACK_NOTIFICATION_WINDOW', default=10, cast=int)
+SLACK_MAX_ALERTS_PER_MESSAGE = config('SLACK_MAX_ALERTS_PER_MESSAGE', default=20, cast=int)  # Slack allows 50 blocks
+SLACK_CONCURRENCY = config('SLACK_CONCURRENCY', default=2, cast=int)
+SLACK_TIMEOUT = config('SLACK_TIMEOUT', default=10, cast=int)
+SLACK_RETRY_BACKOFF = config('SLACK_RETRY_BACKOFF', default=5, cast=int)
+SLACK_MAX_ATTEMPTS = config('SLACK_MAX_ATTEMPTS', default=5, cast=int)
+SLACK_MAX_MESSAGES_PER_FLUSH = config('SLACK_MAX_MESSAGES_PER_FLUSH', default=50, cast=int)  # the rest go next run
 
 # Playbook Configuration
 PLAYBOOK_SCRIPTS_DIR = BASE_DIR.parent / config('PLAYBOOK_SCRIPTS_DIR', default='playbook_scripts')
 PLAYBOOK_TIMEOUT = config('PLAYBOOK_TIMEOUT', default=300, cast=int)
+PLAYBOOK_CPU_TIME_LIMIT = config('PLAYBOOK_CPU_TIME_LIMIT', default=300, cast=int)
+PLAYBOOK_MEMORY_LIMIT_MB = config('PLAYBOOK_MEMORY_LIMIT_MB', default=1024, cast=int)
+PLAYBOOK_MAX_OPEN_FILES = config('PLAYBOOK_MAX_OPEN_FILES', default=256, cast=int)
+PLAYBOOK_IMPORT_BUDGET_MS = config('PLAYBOOK_IMPORT_BUDGET_MS', default=100, cast=int)
+# Handed to scripts for state shared across runs, e.g. provider rate limits
+PLAYBOOK_REDIS_URL = config('PLAYBOOK_REDIS_URL', default=CACHES['default']['LOCATION'])
+WORKFLOW_MAX_FAN_OUT = config('WORKFLOW_MAX_FAN_OUT', default=50, cast=int)
+PLAYBOOK_THROTTLE_RETRY_SECONDS = config('PLAYBOOK_THROTTLE_RETRY_SECONDS', default=5, cast=int)
+PLAYBOOK_THROTTLE_LEASE_MARGIN = config('PLAYBOOK_THROTTLE_LEASE_MARGIN', default=30, cast=int)
+PLAYBOOK_EXECUTION_COMPACT_DAYS = config('PLAYBOOK_EXECUTION_COMPACT_DAYS', default=30, cast=int)
+PLAYBOOK_EXECUTION_RETENTION_DAYS = config('PLAYBOOK_EXECUTION_RETENTION_DAYS', default=365, cast=int)
+PLAYBOOK_EXECUTION_COMPACT_CHUNK = config('PLAYBOOK_EXECUTION_COMPACT_CHUNK', default=500, cast=int)
+# Compacted fields are written here as gzipped JSON lines per day; empty drops them
+PLAYBOOK_EXECUTION_ARCHIVE_DIR = config(
+    'PLAYBOOK_EXECUTION_ARCHIVE_DIR', default=str(BASE_DIR / 'archive' / 'playbook_executions')
+)
 
 # Analytics
 ALERT_RETENTION_DAYS = config('ALERT_RETENTION_DAYS', default=90, cast=int)
+ALERT_MINUTE_ROLLUP_RETENTION_DAYS = config('ALERT_MINUTE_ROLLUP_RETENTION_DAYS', default=7, cast=int)
+TIMESERIES_MAX_POINTS = config('TIMESERIES_MAX_POINTS', default=1000, cast=int)
+HEAVY_HITTER_CAPACITY = config('HEAVY_HITTER_CAPACITY', default=100, cast=int)
+HEAVY_HITTER_HOURLY_RETENTION_DAYS = config('HEAVY_HITTER_HOURLY_RETENTION_DAYS', default=7, cast=int)
+HEAVY_HITTER_DAILY_RETENTION_DAYS = config('HEAVY_HITTER_DAILY_RETENTION_DAYS', default=90, cast=int)
+DISTINCT_COUNT_HOURLY_RETENTION_DAYS = config('DISTINCT_COUNT_HOURLY_RETENTION_DAYS', default=7, cast=int)
+DISTINCT_COUNT_DAILY_RETENTION_DAYS = config('DISTINCT_COUNT_DAILY_RETENTION_DAYS', default=400, cast=int)
+DASHBOARD_SNAPSHOT_MIN_INTERVAL = config('DASHBOARD_SNAPSHOT_MIN_INTERVAL', default=5, cast=int)
+DASHBOARD_SNAPSHOT_MAX_AGE = config('DASHBOARD_SNAPSHOT_MAX_AGE', default=60, cast=int)
+# Alert volume anomaly detection (see analytics.anomalies); seasonal days must fit in the minute rollups
+ALERT_ANOMALY_BUCKET_MINUTES = config('ALERT_ANOMALY_BUCKET_MINUTES', default=5, cast=int)
+ALERT_ANOMALY_EWMA_BUCKETS = config('ALERT_ANOMALY_EWMA_BUCKETS', default=24, cast=int)
+ALERT_ANOMALY_EWMA_ALPHA = config('ALERT_ANOMALY_EWMA_ALPHA', default=0.3, cast=float)
+ALERT_ANOMALY_SEASONAL_DAYS = config('ALERT_ANOMALY_SEASONAL_DAYS', default=6, cast=int)
+ALERT_ANOMALY_Z_THRESHOLD = config('ALERT_ANOMALY_Z_THRESHOLD', default=4.0, cast=float)
+ALERT_ANOMALY_MIN_COUNT = config('ALERT_ANOMALY_MIN_COUNT', default=10, cast=int)
+ALERT_ANOMALY_MIN_EXPECTED = config('ALERT_ANOMALY_MIN_EXPECTED', default=5, cast=int)
+ALERT_ANOMALY_COOLDOWN_MINUTES = config('ALERT_ANOMALY_COOLDOWN_MINUTES', default=60, cast=int)
+# How long a run waits for another worker's rollup flush before skipping, rather than score a partial bucket
+ALERT_ANOMALY_FLUSH_WAIT_SECONDS = config('ALERT_ANOMALY_FLUSH_WAIT_SECONDS', default=10, cast=int)
+# Daily Parquet snapshots of alerts (see analytics.snapshots); raw_log fields are dotted paths
+ALERT_SNAPSHOT_DIR = config('ALERT_SNAPSHOT_DIR', default=str(BASE_DIR / 'archive' / 'alert_snapshots'))
+ALERT_SNAPSHOT_BATCH_SIZE = config('ALERT_SNAPSHOT_BATCH_SIZE', default=10000, cast=int)
+ALERT_SNAPSHOT_RAW_LOG_FIELDS = config(
+    'ALERT_SNAPSHOT_RAW_LOG_FIELDS',
+    default='event_id,event_type,action,user,hostname,process_name,command_line,file_hash,url,user_agent',
+    cast=Csv()
+)
 
 # Logging
 LOGGING = {
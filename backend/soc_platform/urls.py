@@ -28,7 +28,10 @@ from rest_framework import permissions
 from alerts.views import AlertViewSet, AlertCommentViewSet
 from playbooks.views import PlaybookViewSet, PlaybookExecutionViewSet
 from incidents.views import IncidentViewSet
-from analytics.views import DailyMetricsViewSet, DashboardStatsView
+from analytics.views import (
+    DailyMetricsViewSet, DashboardStatsView, EnrichmentCacheStatsView, HeavyHittersView,
+    DistinctCountsView, TechniqueFrequencyView, TacticFrequencyView,
+)
 
 # API Router
 router = DefaultRouter()
@@ -58,6 +61,11 @@ urlpatterns = [
     # API
     path('api/', include(router.urls)),
     path('api/dashboard/', DashboardStatsView.as_view(), name='dashboard-stats'),
+    path('api/analytics/enrichment-cache/', EnrichmentCacheStatsView.as_view(), name='enrichment-cache-stats'),
+    path('api/analytics/top/', HeavyHittersView.as_view(), name='heavy-hitters'),
+    path('api/analytics/distinct/', DistinctCountsView.as_view(), name='distinct-counts'),
+    path('api/analytics/techniques/', TechniqueFrequencyView.as_view(), name='technique-frequency'),
+    path('api/analytics/tactics/', TacticFrequencyView.as_view(), name='tactic-frequency'),
     
     # Authentication
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
@@ -4,10 +4,13 @@ Playbook: Block Malicious IP Address (Simulation)
 NOTE: This is a simulation - in production, integrate with your firewall API
 """
 
+import os
 import sys
-import json
 from datetime import datetime
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from playbook_sdk import Action, Result, playbook  # noqa: E402
+
 
 def block_ip_firewall(ip_address):
     """Simulate blocking IP (in production, call firewall API)"""
@@ -26,37 +29,47 @@ def block_ip_firewall(ip_address):
         return False, f"Error: {str(e)}"
 
 
+def block_ips_firewall(ip_addresses):
+    """Simulate blocking many IPs with a single address-group update"""
+    try:
+        # SIMULATION ONLY
+        # In production, add every address to the block group in one call:
+        # - Palo Alto: address-group static members
+        # - Fortinet: firewall.addrgrp member list
+        
+        print(f"[SIMULATION] Blocking {len(ip_addresses)} IPs: {', '.join(ip_addresses)}", file=sys.stderr)
+        
+        return {ip: (True, f"Successfully blocked {ip} (SIMULATED)") for ip in ip_addresses}
+    except Exception as e:
+        return {ip: (False, f"Error: {str(e)}") for ip in ip_addresses}
+
+
+def main_batch(batch_data):
+    """Batch execution: block every coalesced target in one firewall call"""
+    results = block_ips_firewall(batch_data['targets'])
+    
+    return Result(
+        [Action('block_ip', success, target=ip, message=message) for ip, (success, message) in results.items()],
+        output=f"Batch {batch_data.get('batch_id')} blocked {len(results)} IPs at {datetime.now()}"
+    )
+
+
+@playbook
 def main(alert_data):
     """Main execution function"""
-    actions_taken = []
+    if 'targets' in alert_data:
+        return main_batch(alert_data)
     
     source_ip = alert_data.get('source_ip')
     
     if source_ip:
         success, message = block_ip_firewall(source_ip)
-        actions_taken.append({
-            'action': 'block_ip',
-            'target': source_ip,
-            'success': success,
-            'message': message,
-            'timestamp': datetime.now().isoformat()
-        })
+        action = Action('block_ip', success, target=source_ip, message=message)
     else:
-        actions_taken.append({
-            'action': 'block_ip',
-            'success': False,
-            'message': 'No source IP provided',
-            'timestamp': datetime.now().isoformat()
-        })
+        action = Action('block_ip', False, message='No source IP provided')
     
-    return {
-        'status': 'SUCCESS' if all(a['success'] for a in actions_taken) else 'PARTIAL',
-        'actions_taken': actions_taken,
-        'output': f"Playbook executed at {datetime.now()}"
-    }
+    return Result([action], output=f"Playbook executed at {datetime.now()}")
 
 
 if __name__ == '__main__':
-    alert_data = json.loads(sys.stdin.read())
-    result = main(alert_data)
-    print(json.dumps(result))
\ No newline at end of file
+    main.run()
@@ -2,107 +2,362 @@
 """
 Playbook: Enrich IoC with Threat Intelligence
 Integrates with: VirusTotal, AbuseIPDB
+
+Every IOC in the alert (or in each alert of a batch) is normalized and
+deduplicated, then looked up against every provider that supports its type
+concurrently, over one pooled keep-alive session per provider. Lookups are
+grouped into a provider's batch endpoint where it has one, and each
+provider has its own token bucket, shared by every run through Redis, so
+its quota is respected.
 """
 
 import sys
-import json
-import requests
+import base64
+import threading
+import time
 import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from datetime import datetime
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from playbook_sdk import Action, Result, lazy_import, playbook, shared_redis  # noqa: E402
+from ioc_utils import collect_iocs  # noqa: E402
+
+# Only imported once a provider actually opens a session
+requests = lazy_import('requests')
+
 VIRUSTOTAL_API_KEY = os.getenv('VIRUSTOTAL_API_KEY', '')
 ABUSEIPDB_API_KEY = os.getenv('ABUSEIPDB_API_KEY', '')
 
+# Base URLs are overridable so the playbook can be pointed at a local stub server
+VIRUSTOTAL_API_URL = os.getenv('VIRUSTOTAL_API_URL', 'https://www.virustotal.com/api/v3')
+VIRUSTOTAL_V2_API_URL = os.getenv('VIRUSTOTAL_V2_API_URL', 'https://www.virustotal.com/vtapi/v2')
+ABUSEIPDB_API_URL = os.getenv('ABUSEIPDB_API_URL', 'https://api.abuseipdb.com/api/v2')
+
+# Requests per minute (VirusTotal public API: 4/min)
+VIRUSTOTAL_RATE_LIMIT = float(os.getenv('VIRUSTOTAL_RATE_LIMIT', 4))
+ABUSEIPDB_RATE_LIMIT = float(os.getenv('ABUSEIPDB_RATE_LIMIT', 60))
+
+# Resources per batched report request (VirusTotal public API: 4)
+VIRUSTOTAL_BATCH_SIZE = int(os.getenv('VIRUSTOTAL_BATCH_SIZE', 4))
+
+MAX_WORKERS = int(os.getenv('ENRICHMENT_MAX_WORKERS', 8))
+REQUEST_TIMEOUT = float(os.getenv('ENRICHMENT_REQUEST_TIMEOUT', 10))
+# Give up on a lookup rather than wait longer than this for a rate-limit token
+MAX_RATE_LIMIT_WAIT = float(os.getenv('ENRICHMENT_MAX_RATE_LIMIT_WAIT', 60))
+
+# Atomically refill the provider's bucket and take a token if one is there.
+# Returns 0 on success, otherwise milliseconds until a token is available.
+TOKEN_BUCKET_SCRIPT = """
+local key = KEYS[1]
+local rate, capacity, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+
+local state = redis.call('HMGET', key, 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 - tokens) / rate)
+end
+redis.call('HSET', key, 'tokens', tostring(tokens), 'updated_at', now)
+redis.call('PEXPIRE', key, math.ceil(capacity / rate) + 60000)
+return wait
+"""
+
+
+class TokenBucket:
+    """
+    Token bucket sized to a provider's per-minute quota
+    
+    The bucket lives in the platform's Redis (see playbook_sdk.shared_redis),
+    so the quota holds across executions and workers, not just within one
+    run. Run outside the platform, with no Redis to share, it falls back to
+    a bucket in this process, which only limits the calls of this run.
+    """
+    
+    KEY = 'enrichment-rate:{provider}'
+    
+    def __init__(self, provider, rate_per_minute, capacity=None, redis=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or max(1.0, rate_per_minute)
+        self.key = self.KEY.format(provider=provider)
+        self.redis = redis if redis is not None else shared_redis()
+        self._take_shared = self.redis.register_script(TOKEN_BUCKET_SCRIPT) if self.redis is not None else None
+        
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self, max_wait=None):
+        """Take one token, sleeping until one is available; False if that takes over max_wait"""
+        deadline = time.monotonic() + (MAX_RATE_LIMIT_WAIT if max_wait is None else max_wait)
+        while True:
+            wait = self._take()
+            if not wait:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+    
+    def _take(self):
+        """Take a token, returns 0 or the seconds until one is available"""
+        if self._take_shared is not None:
+            try:
+                wait_ms = self._take_shared(
+                    keys=[self.key],
+                    args=[self.rate / 1000, self.capacity, int(time.time() * 1000)]
+                )
+                return wait_ms / 1000
+            except Exception:
+                # Redis is unreachable: keep to the quota within this run at least
+                self._take_shared = None
+        
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+
+class Provider:
+    """Threat intelligence provider with a pooled session and its own rate limit"""
+    
+    name = None
+    supported_types = ()
+    batch_sizes = {}
+    
+    def __init__(self, api_key, base_url, rate_per_minute):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.bucket = TokenBucket(self.name, rate_per_minute)
+        # More workers than the bucket holds tokens would only queue up waiting for them
+        self.max_workers = max(1, min(MAX_WORKERS, int(self.bucket.capacity)))
+        self.session = requests.Session()
+        self.session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=self.max_workers))
+        self.session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=self.max_workers))
+    
+    def supports(self, ioc_type):
+        return ioc_type in self.supported_types
+    
+    def batch_size(self, ioc_type):
+        """How many values of this type one request can resolve"""
+        return self.batch_sizes.get(ioc_type, 1)
+    
+    def lookup(self, ioc_type, values):
+        """Resolve same-typed values in one request, returns {value: (success, data)}
+        
+        success is None when the provider is not configured.
+        """
+        if not self.api_key:
+            return {value: (None, f"{self.name} API key not configured") for value in values}
+        if not self.bucket.acquire():
+            return {value: (False, f"{self.name} rate limit exceeded") for value in values}
+        
+        try:
+            if len(values) > 1:
+                return self.request_batch(ioc_type, values)
+            
+            response = self.request(ioc_type, values[0])
+            if response.status_code == 200:
+                return {values[0]: (True, self.parse(response.json()))}
+            return {values[0]: (False, f"API returned {response.status_code}")}
+        except Exception as e:
+            return {value: (False, str(e)) for value in values}
+    
+    def request(self, ioc_type, value):
+        raise NotImplementedError
+    
+    def request_batch(self, ioc_type, values):
+        raise NotImplementedError
+    
+    def parse(self, body):
+        raise NotImplementedError
+    
+    def score(self, data):
+        """Normalized 0-100 maliciousness score of a successful lookup"""
+        raise NotImplementedError
+
 
-def check_virustotal_ip(ip_address):
-    """Check IP reputation on VirusTotal"""
-    if not VIRUSTOTAL_API_KEY:
-        return None, "VirusTotal API key not configured"
-    
-    url = f"https://www.virustotal.com/api/v3/ip_addresses/{ip_address}"
-    headers = {"x-apikey": VIRUSTOTAL_API_KEY}
-    
-    try:
-        response = requests.get(url, headers=headers, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            stats = data['data']['attributes']['last_analysis_stats']
-            return True, {
-                'malicious': stats.get('malicious', 0),
-                'suspicious': stats.get('suspicious', 0),
-                'harmless': stats.get('harmless', 0),
-            }
-        return False, f"API returned {response.status_code}"
-    except Exception as e:
-        return False, str(e)
-
-
-def check_abuseipdb(ip_address):
-    """Check IP on AbuseIPDB"""
-    if not ABUSEIPDB_API_KEY:
-        return None, "AbuseIPDB API key not configured"
-    
-    url = "https://api.abuseipdb.com/api/v2/check"
-    headers = {"Key": ABUSEIPDB_API_KEY, "Accept": "application/json"}
-    params = {"ipAddress": ip_address, "maxAgeInDays": 90}
-    
-    try:
-        response = requests.get(url, headers=headers, params=params, timeout=10)
-        if response.status_code == 200:
-            data = response.json()['data']
-            return True, {
-                'abuse_confidence_score': data.get('abuseConfidenceScore'),
-                'total_reports': data.get('totalReports'),
-                'country': data.get('countryCode'),
-            }
-        return False, f"API returned {response.status_code}"
-    except Exception as e:
-        return False, str(e)
+class VirusTotal(Provider):
+    name = 'virustotal'
+    supported_types = ('IP', 'DOMAIN', 'URL', 'HASH')
+    # v3 has no multi-resource lookup; the v2 report endpoints take a list of resources
+    batch_sizes = {'HASH': VIRUSTOTAL_BATCH_SIZE, 'URL': VIRUSTOTAL_BATCH_SIZE}
+    
+    ENDPOINTS = {
+        'IP': 'ip_addresses',
+        'DOMAIN': 'domains',
+        'URL': 'urls',
+        'HASH': 'files',
+    }
+    
+    def request(self, ioc_type, value):
+        if ioc_type == 'URL':
+            # URL identifiers are unpadded url-safe base64 of the URL
+            value = base64.urlsafe_b64encode(value.encode()).decode().strip('=')
+        
+        return self.session.get(
+            f"{self.base_url}/{self.ENDPOINTS[ioc_type]}/{value}",
+            headers={"x-apikey": self.api_key},
+            timeout=REQUEST_TIMEOUT
+        )
+    
+    def request_batch(self, ioc_type, values):
+        endpoint, separator = ('file/report', ',') if ioc_type == 'HASH' else ('url/report', '\n')
+        response = self.session.get(
+            f"{VIRUSTOTAL_V2_API_URL.rstrip('/')}/{endpoint}",
+            params={"apikey": self.api_key, "resource": separator.join(values)},
+            timeout=REQUEST_TIMEOUT
+        )
+        if response.status_code != 200:
+            return {value: (False, f"API returned {response.status_code}") for value in values}
+        
+        reports = response.json()
+        if isinstance(reports, dict):
+            reports = [reports]
+        
+        # Reports come back in request order
+        results = {}
+        for value, report in zip(values, reports):
+            if report.get('response_code') != 1:
+                results[value] = (False, "Not found")
+                continue
+            positives, total = report.get('positives', 0), report.get('total', 0)
+            results[value] = (True, {
+                'malicious': positives,
+                'suspicious': 0,
+                'harmless': max(0, total - positives),
+            })
+        return results
+    
+    def parse(self, body):
+        stats = body['data']['attributes']['last_analysis_stats']
+        return {
+            'malicious': stats.get('malicious', 0),
+            'suspicious': stats.get('suspicious', 0),
+            'harmless': stats.get('harmless', 0),
+        }
+    
+    def score(self, data):
+        flagged = data['malicious'] + data['suspicious']
+        return round(100 * flagged / max(1, flagged + data['harmless']))
 
 
+class AbuseIPDB(Provider):
+    name = 'abuseipdb'
+    supported_types = ('IP',)
+    
+    def request(self, ioc_type, value):
+        return self.session.get(
+            f"{self.base_url}/check",
+            headers={"Key": self.api_key, "Accept": "application/json"},
+            params={"ipAddress": value, "maxAgeInDays": 90},
+            timeout=REQUEST_TIMEOUT
+        )
+    
+    def parse(self, body):
+        data = body['data']
+        return {
+            'abuse_confidence_score': data.get('abuseConfidenceScore'),
+            'total_reports': data.get('totalReports'),
+            'country': data.get('countryCode'),
+        }
+    
+    def score(self, data):
+        return data['abuse_confidence_score'] or 0
+
+
+def get_providers():
+    return [
+        VirusTotal(VIRUSTOTAL_API_KEY, VIRUSTOTAL_API_URL, VIRUSTOTAL_RATE_LIMIT),
+        AbuseIPDB(ABUSEIPDB_API_KEY, ABUSEIPDB_API_URL, ABUSEIPDB_RATE_LIMIT),
+    ]
+
+
+@playbook
 def main(alert_data):
-    """Main execution function"""
+    """Main execution function, accepts one alert or a batch as {'alerts': [...]}"""
     enrichment_results = {}
     actions = []
     
-    source_ip = alert_data.get('source_ip')
+    alerts = alert_data['alerts'] if 'alerts' in alert_data else [alert_data]
+    providers = get_providers()
     
-    if source_ip:
-        # VirusTotal check
-        vt_success, vt_data = check_virustotal_ip(source_ip)
-        enrichment_results['virustotal'] = {
-            'success': vt_success,
-            'data': vt_data
+    # Dedupe indicators within each alert and across the whole batch
+    alert_iocs = [(alert.get('alert_id'), collect_iocs(alert)) for alert in alerts]
+    iocs = list(dict.fromkeys(ioc for _, pairs in alert_iocs for ioc in pairs))
+    
+    # Results the platform's enrichment cache already holds are not looked up again
+    known = alert_data.get('enrichment_cache') or {}
+    pending = {}
+    for ioc_type, value in iocs:
+        enrichment_results[value] = {'type': ioc_type}
+        for provider in providers:
+            if provider.name in known.get(value, {}):
+                enrichment_results[value][provider.name] = known[value][provider.name]
+            elif provider.supports(ioc_type):
+                pending.setdefault((provider, ioc_type), []).append(value)
+    
+    # Group values into as few requests as each provider's batch endpoints allow
+    requests_to_send = []
+    for (provider, ioc_type), values in pending.items():
+        size = provider.batch_size(ioc_type)
+        for start in range(0, len(values), size):
+            requests_to_send.append((provider, ioc_type, values[start:start + size]))
+    
+    # Providers are queried concurrently, so latency is that of the slowest one.
+    # Each has its own workers, so lookups waiting for one provider's quota
+    # don't hold up those against another
+    with ExitStack() as stack:
+        pools = {
+            provider.name: stack.enter_context(ThreadPoolExecutor(max_workers=provider.max_workers))
+            for provider in providers
         }
-        actions.append({
-            'action': 'virustotal_lookup',
-            'target': source_ip,
-            'success': vt_success,
-            'timestamp': datetime.now().isoformat()
-        })
+        responses = [
+            pools[provider.name].submit(provider.lookup, ioc_type, values)
+            for provider, ioc_type, values in requests_to_send
+        ]
         
-        # AbuseIPDB check
-        abuse_success, abuse_data = check_abuseipdb(source_ip)
-        enrichment_results['abuseipdb'] = {
-            'success': abuse_success,
-            'data': abuse_data
-        }
-        actions.append({
-            'action': 'abuseipdb_lookup',
-            'target': source_ip,
-            'success': abuse_success,
-            'timestamp': datetime.now().isoformat()
-        })
-    
-    return {
-        'status': 'SUCCESS',
-        'actions_taken': actions,
-        'enrichment': enrichment_results,
-        'output': f"IoC enrichment completed at {datetime.now()}"
-    }
+        for (provider, _, _), response in zip(requests_to_send, responses):
+            for value, (success, data) in response.result().items():
+                enrichment_results[value][provider.name] = {
+                    'success': success,
+                    'data': data,
+                    'score': provider.score(data) if success else None
+                }
+    
+    for alert_id, pairs in alert_iocs:
+        for _, value in pairs:
+            for provider_name, result in enrichment_results[value].items():
+                if provider_name == 'type':
+                    continue
+                actions.append(Action(
+                    f'{provider_name}_lookup',
+                    result['success'],
+                    target=value,
+                    alert_id=alert_id,
+                    details={'cached': bool(result.get('cached'))}
+                ))
+    
+    # Individual lookups may fail; the enrichment itself still succeeded
+    return Result(
+        actions,
+        status='SUCCESS',
+        extra={'enrichment': enrichment_results},
+        output=(
+            f"IoC enrichment of {len(iocs)} indicators from {len(alerts)} alerts "
+            f"in {len(requests_to_send)} requests completed at {datetime.now()}"
+        )
+    )
 
 
 if __name__ == '__main__':
-    alert_data = json.loads(sys.stdin.read())
-    result = main(alert_data)
-    print(json.dumps(result))
\ No newline at end of file
+    main.run()
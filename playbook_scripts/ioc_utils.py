@@ -0,0 +1,101 @@
+"""
+Indicator of compromise normalization shared by the playbook scripts and
+the platform
+
+Indicators are refanged (hxxp://, example[.]com) and canonicalized, so one
+indicator written several ways is looked up, and cached, once. The
+enrichment script reports results under these values and the platform's
+enrichment cache (analytics.enrichment) keys them the same way, which is
+why both import this module rather than keeping their own copy.
+"""
+
+import ipaddress
+import re
+from urllib.parse import urlsplit, urlunsplit
+
+IOC_TYPES = ('IP', 'DOMAIN', 'URL', 'HASH', 'EMAIL')
+
+HASH_PATTERN = re.compile(r'^[a-fA-F0-9]{32}$|^[a-fA-F0-9]{40}$|^[a-fA-F0-9]{64}$')
+EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+DOMAIN_PATTERN = re.compile(r'^(?=.{1,253}$)(?:[a-z0-9_](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z][a-z0-9-]{0,62}$')
+
+# Common defanging conventions: hxxp://, example[.]com, user[@]example.com
+DEFANG_PATTERNS = [
+    (re.compile(r'^hxxp', re.IGNORECASE), 'http'),
+    (re.compile(r'\[\.\]|\(\.\)|\[dot\]', re.IGNORECASE), '.'),
+    (re.compile(r'\[:\]'), ':'),
+    (re.compile(r'\[@\]|\[at\]', re.IGNORECASE), '@'),
+]
+
+
+def detect_ioc_type(value):
+    """Classify an indicator as IP, HASH, URL, EMAIL or DOMAIN"""
+    try:
+        ipaddress.ip_address(value)
+        return 'IP'
+    except ValueError:
+        pass
+    
+    if HASH_PATTERN.match(value):
+        return 'HASH'
+    if '://' in value:
+        return 'URL'
+    if '@' in value:
+        return 'EMAIL'
+    return 'DOMAIN'
+
+
+def normalize_ioc(value, declared_type=None):
+    """Refang and canonicalize an indicator, returns (type, value) or None if it is not usable"""
+    value = value.strip().strip('\'"<>')
+    for pattern, replacement in DEFANG_PATTERNS:
+        value = pattern.sub(replacement, value)
+    
+    declared_type = (declared_type or '').upper()
+    ioc_type = declared_type if declared_type in IOC_TYPES else detect_ioc_type(value)
+    
+    if ioc_type == 'IP':
+        try:
+            return 'IP', str(ipaddress.ip_address(value))
+        except ValueError:
+            return None
+    
+    if ioc_type == 'HASH':
+        return ('HASH', value.lower()) if HASH_PATTERN.match(value) else None
+    
+    if ioc_type == 'URL':
+        parts = urlsplit(value)
+        if not parts.scheme or not parts.hostname:
+            return None
+        # Scheme and host are case-insensitive, the path is not
+        return 'URL', urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/', parts.query, ''))
+    
+    if ioc_type == 'EMAIL':
+        value = value.lower()
+        return ('EMAIL', value) if EMAIL_PATTERN.match(value) else None
+    
+    try:
+        domain = value.lower().rstrip('.').encode('idna').decode()
+    except UnicodeError:
+        return None
+    return ('DOMAIN', domain) if DOMAIN_PATTERN.match(domain) else None
+
+
+def collect_iocs(alert_data):
+    """Normalized, deduplicated (type, value) pairs for the alert's IPs and indicators_of_compromise"""
+    candidates = [(alert_data.get('source_ip'), 'IP'), (alert_data.get('destination_ip'), 'IP')]
+    
+    for indicator in alert_data.get('indicators_of_compromise') or []:
+        if isinstance(indicator, dict):
+            candidates.append((indicator.get('value'), indicator.get('type')))
+        else:
+            candidates.append((indicator, None))
+    
+    iocs = {}
+    for value, declared_type in candidates:
+        if isinstance(value, str) and value.strip():
+            normalized = normalize_ioc(value, declared_type)
+            if normalized:
+                iocs.setdefault(normalized, None)
+    
+    return list(iocs)
@@ -4,13 +4,17 @@ Playbook: Send Email Notification
 """
 
 import sys
-import json
 from datetime import datetime
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 import os
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from playbook_sdk import Action, Result, lazy_import, playbook  # noqa: E402
+
+# Not needed when credentials are missing, so only imported on first use
+smtplib = lazy_import('smtplib')
+mime_text = lazy_import('email.mime.text')
+mime_multipart = lazy_import('email.mime.multipart')
+
 
 def send_email_notification(alert_data):
     """Send email notification about alert"""
@@ -25,7 +29,7 @@ def send_email_notification(alert_data):
             return False, "Email credentials not configured"
         
         # Create message
-        msg = MIMEMultipart('alternative')
+        msg = mime_multipart.MIMEMultipart('alternative')
         msg['Subject'] = f"[{alert_data['severity']}] SOC Alert: {alert_data['title']}"
         msg['From'] = EMAIL_USER
         msg['To'] = ADMIN_EMAIL
@@ -47,7 +51,7 @@ def send_email_notification(alert_data):
         </html>
         """
         
-        part = MIMEText(html, 'html')
+        part = mime_text.MIMEText(html, 'html')
         msg.attach(part)
         
         # Send email
@@ -61,23 +65,17 @@ def send_email_notification(alert_data):
         return False, f"Failed to send email: {str(e)}"
 
 
+@playbook
 def main(alert_data):
     """Main execution function"""
     success, message = send_email_notification(alert_data)
     
-    return {
-        'status': 'SUCCESS' if success else 'FAILED',
-        'actions_taken': [{
-            'action': 'send_email',
-            'success': success,
-            'message': message,
-            'timestamp': datetime.now().isoformat()
-        }],
-        'output': message
-    }
+    return Result(
+        [Action('send_email', success, message=message)],
+        status='SUCCESS' if success else 'FAILED',
+        output=message
+    )
 
 
 if __name__ == '__main__':
-    alert_data = json.loads(sys.stdin.read())
-    result = main(alert_data)
-    print(json.dumps(result))
\ No newline at end of file
+    main.run()
\ No newline at end of file
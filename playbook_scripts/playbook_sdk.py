@@ -0,0 +1,183 @@
+"""
+Playbook SDK: shared runtime for playbook scripts
+
+Scripts read the alert as JSON on stdin and print a result as JSON on
+stdout. The SDK owns that protocol so each script only has to describe its
+actions:
+
+    @playbook
+    def main(alert_data):
+        return Result([Action('block_ip', True, target=ip)], output='...')
+
+    if __name__ == '__main__':
+        main.run()
+
+The decorated function can also be imported and called in-process, where
+it takes the alert dict and returns the result dict. Heavy dependencies
+should be pulled in with lazy_import() so paths that never use them don't
+pay for the import at startup.
+"""
+
+import importlib.util
+import os
+import sys
+from datetime import datetime
+from functools import wraps
+
+import json
+
+# orjson is much faster on large (batch) payloads but costs more to import
+# than the stdlib codec saves on a single alert, so it is only used past this
+ORJSON_THRESHOLD = int(os.getenv('PLAYBOOK_ORJSON_THRESHOLD', 64 * 1024))
+
+
+def _orjson():
+    try:
+        import orjson
+        return orjson
+    except ImportError:
+        return None
+
+
+def loads(data):
+    if len(data) >= ORJSON_THRESHOLD:
+        orjson = _orjson()
+        if orjson:
+            return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj, large=False):
+    if large:
+        orjson = _orjson()
+        if orjson:
+            return orjson.dumps(obj, default=str).decode()
+    return json.dumps(obj, default=str)
+
+
+def lazy_import(name):
+    """Module proxy that only imports `name` when an attribute is first used"""
+    if name in sys.modules:
+        return sys.modules[name]
+    
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named '{name}'")
+    
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def now():
+    return datetime.now().isoformat()
+
+
+_redis = None
+
+
+def shared_redis():
+    """Client for the platform's Redis, for state shared across runs and workers
+    
+    The executor passes its URL in PLAYBOOK_REDIS_URL. Returns None when the
+    script runs outside the platform or redis-py is not installed.
+    """
+    global _redis
+    url = os.getenv('PLAYBOOK_REDIS_URL')
+    if _redis is None and url:
+        try:
+            import redis
+        except ImportError:
+            return None
+        _redis = redis.Redis.from_url(url, socket_timeout=5)
+    return _redis
+
+
+# Plain classes rather than dataclasses: importing dataclasses pulls in inspect
+class Action:
+    """One entry of actions_taken"""
+    
+    __slots__ = ('action', 'success', 'target', 'message', 'alert_id', 'details', 'timestamp')
+    
+    def __init__(self, action, success, target=None, message=None, alert_id=None, details=None, timestamp=None):
+        self.action = action
+        self.success = success
+        self.target = target
+        self.message = message
+        self.alert_id = alert_id
+        self.details = details or {}
+        self.timestamp = timestamp or now()
+    
+    def to_dict(self):
+        data = {'action': self.action}
+        for key in ('alert_id', 'target'):
+            if getattr(self, key) is not None:
+                data[key] = getattr(self, key)
+        data['success'] = self.success
+        if self.message is not None:
+            data['message'] = self.message
+        data.update(self.details)
+        data['timestamp'] = self.timestamp
+        return data
+
+
+class Result:
+    """What a playbook returns: its actions, a summary and any extra payload (e.g. enrichment)"""
+    
+    __slots__ = ('actions', 'output', 'status', 'extra')
+    
+    def __init__(self, actions, output='', status=None, extra=None):
+        self.actions = actions
+        self.output = output
+        self.status = status
+        self.extra = extra or {}
+    
+    def to_dict(self):
+        actions = [action.to_dict() if isinstance(action, Action) else action for action in self.actions]
+        status = self.status or ('SUCCESS' if all(action['success'] for action in actions) else 'PARTIAL')
+        return dict(self.extra, status=status, actions_taken=actions, output=self.output)
+
+
+def playbook(func):
+    """Make `func(alert_data) -> Result` a playbook entry point
+    
+    Calling the decorated function returns the result dict; `.run()` speaks
+    the stdin/stdout protocol and is what `__main__` should call.
+    """
+    @wraps(func)
+    def entry_point(alert_data):
+        result = func(alert_data)
+        return result.to_dict() if isinstance(result, Result) else result
+    
+    def run(stdin=None, stdout=None):
+        stdin, stdout = stdin or sys.stdin, stdout or sys.stdout
+        data = stdin.read()
+        try:
+            result = entry_point(loads(data))
+        except Exception:
+            import traceback
+            traceback.print_exc()
+            sys.exit(1)
+        # A large input (a batch) usually means a large result
+        stdout.write(dumps(result, large=len(data) >= ORJSON_THRESHOLD))
+        stdout.flush()
+    
+    entry_point.run = run
+    entry_point.is_playbook = True
+    return entry_point
+
+
+def load(script_path):
+    """Import a playbook script in-process and return its @playbook entry point"""
+    name = 'playbook_' + os.path.splitext(os.path.basename(script_path))[0]
+    spec = importlib.util.spec_from_file_location(name, script_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    
+    for value in vars(module).values():
+        if getattr(value, 'is_playbook', False):
+            return value
+    raise ImportError(f"{script_path} has no @playbook entry point")